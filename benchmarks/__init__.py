@@ -0,0 +1,4 @@
+"""Micro-benchmarks for formflow (not part of the pytest suite).
+
+Aufruf aus dem Projektverzeichnis, siehe ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,65 @@
+"""Command line entry point: ``python -m benchmarks``.
+
+Beispiele (aus dem Projektverzeichnis, ``PYTHONPATH=src``):
+    python -m benchmarks --list
+    python -m benchmarks -o baseline.json                  # Baseline erzeugen
+    python -m benchmarks --compare baseline.json            # gegen Baseline prüfen
+    python -m benchmarks -k list_drafts -k store_pdf        # nur ausgewählte Fälle
+"""
+import logging
+import sys
+
+import click
+
+from . import runner
+from .cases import CASES
+
+
+@click.command()
+@click.option('-k', 'patterns', multiple=True, help='Nur Fälle, deren Name diesen Text enthält (mehrfach möglich).')
+@click.option('--rounds', default=5, show_default=True, type=click.IntRange(min=1), help='Messrunden pro Fall.')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Ergebnis als JSON-Baseline speichern.')
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False),
+              help='Ergebnis mit dieser Baseline vergleichen; Exit-Code 1 bei Regressionen.')
+@click.option('--threshold', default=0.1, show_default=True, type=click.FloatRange(min=0),
+              help='Erlaubte Verlangsamung des Medians als Anteil (0.1 = 10 %).')
+@click.option('--list', 'list_only', is_flag=True, help='Nur die verfügbaren Fälle auflisten.')
+def main(patterns, rounds, output, baseline_path, threshold, list_only):
+    """Misst PDF-Erzeugung, Formulardaten, Entwürfe und lokale Ablage."""
+    cases = {name: case for name, case in CASES.items() if not patterns or any(p in name for p in patterns)}
+    if list_only:
+        click.echo('\n'.join(cases))
+        return
+    if not cases:
+        raise click.UsageError('Kein Benchmark-Fall passt zu -k.')
+
+    # Info-Logs der Services (z. B. "SMB ist deaktiviert") würden die Ausgabe fluten
+    logging.basicConfig(level=logging.WARNING)
+
+    def progress(name, result):
+        click.echo(f"{name:<40} {runner.format_seconds(result['median']):>12}  "
+                   f"(min {runner.format_seconds(result['min'])}, {result['rounds']}×{result['iterations']})")
+
+    document = runner.run_cases(cases, rounds, progress)
+    if output:
+        runner.save(document, output)
+        click.echo(f"Baseline gespeichert: {output}")
+
+    if baseline_path:
+        baseline = runner.load(baseline_path)
+        if baseline.get('environment') != document['environment']:
+            click.echo('Warnung: Baseline stammt aus einer anderen Umgebung, Vergleich nur eingeschränkt aussagekräftig.')
+        rows = runner.compare(baseline, document, threshold)
+        click.echo('')
+        for row in rows:
+            ratio = f"{row['ratio']:.2f}×" if row['ratio'] is not None else ''
+            click.echo(f"{row['name']:<40} {runner.format_seconds(row['baseline']):>12} → "
+                       f"{runner.format_seconds(row['current']):>12} {ratio:>7}  {row['status']}")
+        regressions = [row for row in rows if row['status'] == 'regression']
+        if regressions:
+            click.echo(f"{len(regressions)} Regression(en) über {threshold:.0%}.", err=True)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Benchmark cases: generated forms and data, one entry per measured scenario.
+
+Jeder Fall ist eine Funktion ``(workdir) -> (setup, run)``: ``setup()`` bereitet
+eine Iteration vor und wird nicht mitgemessen, ``run(prepared)`` ist der
+gemessene Aufruf.  Alle Daten sind deterministisch (fester Seed).
+"""
+import os
+import random
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from werkzeug.datastructures import MultiDict
+
+from formflow.config import AppSettings
+from formflow.services.draft_service import collect_form_data, list_drafts, save_draft
+from formflow.services.pdf_generator import PdfGenerator
+from formflow.services.storage import PdfStorage
+
+CUSTOM_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+Case = Callable[[str], Tuple[Callable[[], Any], Callable[[Any], Any]]]
+
+_WORDS = ('Notebook', 'Netzteil', 'Übergabe', 'Zustand', 'Seriennummer', 'Abteilung', 'Zubehör',
+          'Rückgabe', 'Mitarbeiter', 'Standort', 'Lizenz', 'Garantie', 'Tasche', 'Maus', 'Docking')
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _signature(rng: random.Random) -> str:
+    """A vector signature (sig1 encoding) with three strokes of 40 points each."""
+    strokes = []
+    for stroke in range(3):
+        x = 20 + stroke * 120
+        points = []
+        for _ in range(40):
+            x += rng.uniform(1, 4)
+            points.append(f"{x:.1f},{rng.uniform(30, 120):.1f}")
+        strokes.append(' '.join(points))
+    return 'sig1:400x150:' + ';'.join(strokes)
+
+
+def make_form(fields: int, signatures: int = 0, multiselect: bool = False, long_text: bool = False,
+              template: Optional[str] = None, seed: int = 1) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Returns (form_def, form_data) with *fields* data fields plus *signatures* signature fields."""
+    rng = random.Random(seed)
+    options = [f"Option {i}" for i in range(12)]
+    field_defs: List[Dict[str, Any]] = []
+    form_data: Dict[str, Any] = {}
+    for i in range(fields):
+        name = f"field_{i}"
+        kind = i % 4
+        if multiselect and kind == 3:
+            field_defs.append({'type': 'select', 'name': name, 'label': f"Auswahl {i}",
+                               'multiple': True, 'options': options})
+            form_data[name] = rng.sample(options, 6)
+        elif long_text and kind == 1:
+            field_defs.append({'type': 'textarea', 'name': name, 'label': f"Bemerkung {i}"})
+            form_data[name] = _text(rng, 400)
+        elif kind == 2:
+            field_defs.append({'type': 'date', 'name': name, 'label': f"Datum {i}"})
+            form_data[name] = f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        else:
+            field_defs.append({'type': 'text', 'name': name, 'label': f"Feld {i}"})
+            form_data[name] = _text(rng, 3)
+    for i in range(signatures):
+        name = f"signature_{i}"
+        field_defs.append({'type': 'signature', 'name': name, 'label': f"Unterschrift {i}",
+                           'signature_label': "Unterzeichnet von {field_0} am {date_today}"})
+        form_data[name] = _signature(rng)
+    form_def: Dict[str, Any] = {'form_id': 'benchmark', 'title': 'Benchmark-Formular', 'fields': field_defs}
+    if template:
+        form_def['pdf_template'] = template
+    return form_def, form_data
+
+
+def _generate_case(templates_dir: Optional[str] = None, **form_args: Any) -> Case:
+    def case(workdir: str):
+        generator = PdfGenerator(templates_dir=templates_dir) if templates_dir else PdfGenerator()
+        form_def, form_data = make_form(**form_args)
+        config = AppSettings().model_dump()
+        output = os.path.join(workdir, 'benchmark.pdf')
+        return (lambda: None), (lambda _: generator.generate(form_def, form_data, output, config))
+    return case
+
+
+def _collect_case(fields: int) -> Case:
+    def case(workdir: str):
+        form_def, form_data = make_form(fields, multiselect=True)
+        request_form = MultiDict()
+        for name, value in form_data.items():
+            for item in (value if isinstance(value, list) else [value]):
+                request_form.add(name, item)
+        return (lambda: None), (lambda _: collect_form_data(form_def, request_form))
+    return case
+
+
+def _list_drafts_case(drafts: int) -> Case:
+    def case(workdir: str):
+        drafts_dir = os.path.join(workdir, 'drafts')
+        os.makedirs(drafts_dir, exist_ok=True)
+        form_def, form_data = make_form(10)
+        for field in form_def['fields'][:2]:
+            field['in_draft_title'] = True
+        for _ in range(drafts):
+            save_draft(drafts_dir, 'benchmark', form_data)
+        forms = {'benchmark': form_def}
+        return (lambda: None), (lambda _: list_drafts(drafts_dir, forms))
+    return case
+
+
+def _store_pdf_case(size: int) -> Case:
+    def case(workdir: str):
+        storage = PdfStorage()
+        config = AppSettings().model_dump()  # SMB deaktiviert: lokale Ablage
+        payload = os.urandom(size)
+        final_path = os.path.join(workdir, 'benchmark.pdf')
+
+        def setup() -> None:
+            # Ergebnis der vorherigen Iteration entfernen
+            if os.path.exists(final_path):
+                os.remove(final_path)
+
+        def run(_: None) -> None:
+            storage.store_pdf_bytes(payload, final_path, ['benchmark'], config)
+
+        return setup, run
+    return case
+
+
+def _store_pdf_smb_case(size: int) -> Case:
+    def case(workdir: str):
+        storage = PdfStorage()  # ohne Outbox: misst den Upload selbst
+        config = AppSettings().model_dump()  # Server und Zugangsdaten aus APP_SMB__*
+        payload = os.urandom(size)
+        fallback_path = os.path.join(workdir, 'benchmark.pdf')
+
+        def run(_: None) -> None:
+            result = storage.store_pdf_bytes(payload, fallback_path, ['benchmark'], config)
+            if result['stored_via'] != 'smb':
+                raise RuntimeError(f"SMB-Upload fehlgeschlagen: {result.get('warning')}")
+
+        return (lambda: None), run
+    return case
+
+
+CASES: Dict[str, Case] = {}
+for _fields in (5, 50, 500):
+    CASES[f"generate[fields={_fields}]"] = _generate_case(fields=_fields)
+for _signatures in range(5):
+    CASES[f"generate[signatures={_signatures}]"] = _generate_case(fields=5, signatures=_signatures)
+CASES["generate[multiselect]"] = _generate_case(fields=50, multiselect=True)
+CASES["generate[long_text]"] = _generate_case(fields=20, long_text=True)
+CASES["generate[custom_template]"] = _generate_case(
+    templates_dir=CUSTOM_TEMPLATES_DIR, fields=50, signatures=2, multiselect=True, template='custom_pdf.html'
+)
+for _fields in (5, 50, 500):
+    CASES[f"collect_form_data[fields={_fields}]"] = _collect_case(_fields)
+for _drafts in (10, 1_000, 10_000):
+    CASES[f"list_drafts[drafts={_drafts}]"] = _list_drafts_case(_drafts)
+CASES["store_pdf[local]"] = _store_pdf_case(200_000)
+if AppSettings().smb.enabled:
+    CASES["store_pdf[smb,200kb]"] = _store_pdf_smb_case(200_000)
+    CASES["store_pdf[smb,5mb]"] = _store_pdf_smb_case(5_000_000)
@@ -0,0 +1,125 @@
+"""Measurement, JSON baselines and regression comparison for the benchmark cases."""
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from .cases import Case
+
+# Eine Messrunde soll mindestens so lange dauern, damit Timer-Auflösung und
+# Einzelausreißer nicht ins Gewicht fallen; Iterationen werden daran kalibriert.
+MIN_ROUND_SECONDS = 0.2
+MAX_ITERATIONS = 10_000
+
+
+def measure(case: Case, rounds: int = 5, min_round_seconds: float = MIN_ROUND_SECONDS) -> Dict[str, Any]:
+    """Runs *case* in a temporary directory; returns seconds per iteration (min/median/mean/stdev)."""
+    with tempfile.TemporaryDirectory(prefix='formflow-bench-') as workdir:
+        setup, run = case(workdir)
+        # Aufwärmen (Template-Kompilierung, Imports, Font-Konfiguration) und Kalibrieren
+        started = time.perf_counter()
+        run(setup())
+        first = time.perf_counter() - started
+        iterations = max(1, min(MAX_ITERATIONS, int(min_round_seconds / first) if first > 0 else MAX_ITERATIONS))
+
+        samples: List[float] = []
+        for _ in range(rounds):
+            elapsed = 0.0
+            for _ in range(iterations):
+                prepared = setup()
+                started = time.perf_counter()
+                run(prepared)
+                elapsed += time.perf_counter() - started
+            samples.append(elapsed / iterations)
+
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.mean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'rounds': rounds,
+        'iterations': iterations,
+    }
+
+
+def run_cases(cases: Dict[str, Case], rounds: int = 5,
+              progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Measures all *cases* and returns a baseline document."""
+    results = {}
+    for name, case in cases.items():
+        results[name] = measure(case, rounds)
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'results': results,
+    }
+
+
+def environment() -> Dict[str, Optional[str]]:
+    """Describes the machine so baselines from different hosts are not compared by accident."""
+    try:
+        from importlib.metadata import version  # noqa: PLC0415
+        weasyprint_version: Optional[str] = version('weasyprint')
+    except Exception:
+        weasyprint_version = None
+    return {
+        'python': platform.python_version(),
+        'implementation': sys.implementation.name,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'weasyprint': weasyprint_version,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """Compares the medians of *current* against *baseline*.
+
+    Returns one row per case with ``ratio`` (current / baseline) and ``status``:
+    ``regression`` above ``1 + threshold``, ``improvement`` below ``1 - threshold``,
+    otherwise ``ok``; cases missing on one side are ``new`` or ``missing``.
+    """
+    rows = []
+    old_results = baseline.get('results', {})
+    new_results = current.get('results', {})
+    for name in list(old_results) + [n for n in new_results if n not in old_results]:
+        old, new = old_results.get(name), new_results.get(name)
+        if old is None or new is None:
+            rows.append({'name': name, 'baseline': old and old['median'], 'current': new and new['median'],
+                         'ratio': None, 'status': 'new' if old is None else 'missing'})
+            continue
+        ratio = new['median'] / old['median'] if old['median'] > 0 else float('inf')
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 - threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'baseline': old['median'], 'current': new['median'], 'ratio': ratio, 'status': status})
+    return rows
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save(document: Dict[str, Any], path: str) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '–'
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
@@ -0,0 +1,101 @@
+"""Worker memory with and without ``preload_app``: ``python -m benchmarks.worker_memory``.
+
+Startet Gunicorn nacheinander mit ``GUNICORN_PRELOAD=true`` und ``false`` (gleiche
+Worker-Zahl), schickt einige Requests und liest danach ``Pss`` und
+``Private_Dirty`` aus ``/proc/<pid>/smaps_rollup`` von Master und Workern (nur Linux).
+Aus dem Projektverzeichnis aufrufen, z. B.::
+
+    PYTHONPATH=src python -m benchmarks.worker_memory --workers 4 --path /
+"""
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Tuple
+
+import click
+
+_FIELDS = ('Rss', 'Pss', 'Private_Dirty')
+
+
+def read_smaps_rollup(pid: int) -> Dict[str, int]:
+    """Rss, Pss und Private_Dirty des Prozesses in kB."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in _FIELDS:
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def _children(pid: int) -> List[int]:
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children', 'r') as f:
+            children += [int(child) for child in f.read().split()]
+    return children
+
+
+def _get(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            response.read()
+    except urllib.error.HTTPError:
+        return True  # Server antwortet
+    except OSError:
+        return False
+    return True
+
+
+def measure(preload: bool, workers: int, port: int, path: str, requests: int,
+            settle: float) -> Tuple[Dict[str, int], List[Dict[str, int]]]:
+    """Startet Gunicorn, wartet auf alle Worker und liefert (Master, [Worker]) in kB."""
+    env = dict(os.environ, GUNICORN_PRELOAD='true' if preload else 'false', WEB_CONCURRENCY=str(workers))
+    with tempfile.TemporaryDirectory() as tmp:
+        env['APP_METRICS__MULTIPROCESS_DIR'] = os.path.join(tmp, 'metrics')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}',
+             '--control-socket', os.path.join(tmp, 'gunicorn.ctl'), 'app:app'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            url = f'http://127.0.0.1:{port}{path}'
+            deadline = time.monotonic() + 120
+            while not (_get(url) and len(_children(server.pid)) >= workers):
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise click.ClickException(f"Gunicorn (preload={preload}) ist nicht bereit geworden.")
+                time.sleep(0.5)
+            for _ in range(requests):
+                _get(url)
+            time.sleep(settle)
+            return read_smaps_rollup(server.pid), [read_smaps_rollup(pid) for pid in _children(server.pid)]
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+@click.command()
+@click.option('--workers', default=4, show_default=True, type=click.IntRange(min=1), help='WEB_CONCURRENCY.')
+@click.option('--port', default=5099, show_default=True, type=int)
+@click.option('--path', default='/', show_default=True, help='Pfad, der nach dem Start abgerufen wird.')
+@click.option('--requests', default=40, show_default=True, type=click.IntRange(min=0),
+              help='Anzahl Requests vor der Messung (verteilt sich auf die Worker).')
+@click.option('--settle', default=2.0, show_default=True, type=float, help='Wartezeit vor der Messung in Sekunden.')
+def main(workers, port, path, requests, settle):
+    """Vergleicht Pss/Private_Dirty der Gunicorn-Prozesse mit und ohne preload_app."""
+    click.echo(f"{'preload':<8} {'Master Pss':>11} {'Worker Pss':>11} {'Worker Private_Dirty':>21} {'Pss gesamt':>11}")
+    for preload in (True, False):
+        master, worker_values = measure(preload, workers, port, path, requests, settle)
+        worker_pss = sum(values['Pss'] for values in worker_values)
+        private_dirty = sum(values['Private_Dirty'] for values in worker_values) / len(worker_values)
+        click.echo(f"{str(preload).lower():<8} {master['Pss'] / 1024:>8.1f} MB {worker_pss / 1024:>8.1f} MB "
+                   f"{private_dirty / 1024:>11.1f} MB/Worker {(master['Pss'] + worker_pss) / 1024:>8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
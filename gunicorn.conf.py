@@ -0,0 +1,77 @@
+"""Gunicorn-Konfiguration für formflow (Verwendung: gunicorn -c gunicorn.conf.py app:app).
+
+Mit ``preload_app`` lädt der Master die Anwendung einmal vor dem Forken: WeasyPrint,
+Pango/fontconfig, die Formular-Registry und die kompilierten Templates liegen dann
+in Speicherseiten, die sich alle Worker per Copy-on-Write teilen. Jeder Worker
+baut nur den Zustand neu auf, der fork() nicht übersteht (Render-Pool,
+Hintergrund-Threads, SMB-Session).
+
+Umgebungsvariablen:
+    WEB_CONCURRENCY   Anzahl Worker-Prozesse (Standard: 1)
+    GUNICORN_PRELOAD  "false" schaltet preload_app ab (jeder Worker lädt alles selbst)
+    GUNICORN_MAX_REQUESTS  Worker zusätzlich nach N Requests ersetzen (Standard: 0 = aus)
+    APP_METRICS__MULTIPROCESS_DIR  Snapshots der Metriken je Worker (Standard: /tmp/formflow-metrics)
+"""
+import gc
+import glob
+import os
+
+bind = "0.0.0.0:5000"
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() != "false"
+
+# WeasyPrint-Rendering kann bei komplexen Templates >30s dauern.
+timeout = 120
+# Worker werden graceful ersetzt, sobald ihr RSS APP_MEMORY__MAX_RSS_MB überschreitet
+# (Hook post_request). Ein fester Neustart nach N Requests ist nur noch optional;
+# dank preload_app erbt der neue Worker den vorgewärmten Zustand des Masters.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "50"))
+
+# /metrics summiert die Snapshots aller Worker; muss vor dem Laden der App gesetzt sein.
+os.environ.setdefault("APP_METRICS__MULTIPROCESS_DIR", "/tmp/formflow-metrics")
+
+
+def on_starting(server):
+    """Master, vor dem Start der Worker: Konfiguration prüfen, Metrik-Snapshots eines früheren Laufs entfernen."""
+    from formflow.config import AppSettings  # noqa: PLC0415
+    from formflow.services.preview_store import require_shared_store  # noqa: PLC0415
+
+    # Vorschauen müssen für alle Worker sichtbar sein (Statusabfrage, /pdf/temp_*, /confirm)
+    require_shared_store(AppSettings().preview.model_dump(), server.cfg.workers)
+    # Snapshots, Sperrdateien und Aggregat: Zähler beginnen mit jedem Start bei null
+    for path in glob.glob(os.path.join(os.environ["APP_METRICS__MULTIPROCESS_DIR"], "metrics_*")):
+        os.remove(path)
+
+
+def _engine(process):
+    """FormEngine der geladenen App (Arbiter oder Worker)."""
+    return process.app.wsgi().extensions["formflow"]
+
+
+def when_ready(server):
+    """Master, nach dem Laden der App und vor dem ersten fork()."""
+    if not server.cfg.preload_app:
+        return
+    _engine(server).prepare_fork()
+    # Vom Master geladene Objekte aus der GC-Verwaltung nehmen, damit Garbage-
+    # Collections in den Workern die geteilten Seiten nicht anfassen und kopieren.
+    gc.freeze()
+    server.log.info("Anwendung im Master vorgewärmt, Worker teilen den Zustand per Copy-on-Write.")
+
+
+def post_fork(server, worker):
+    """Worker, direkt nach fork()."""
+    if not server.cfg.preload_app:
+        return
+    _engine(server).post_fork()
+
+
+def post_request(worker, req, environ, resp):
+    """Worker, nach jedem Request: bei Überschreiten der Speichergrenze graceful ersetzen."""
+    memory = _engine(worker).pdf_generator.memory
+    if memory is not None and worker.alive and memory.over_limit():
+        worker.log.warning("Speichergrenze überschritten, Worker wird nach diesem Request ersetzt. "
+                           f"Schwerste Renderings: {memory.heaviest()}")
+        # Wie bei max_requests: laufende Anfrage beenden, dann startet der Master einen neuen Worker
+        worker.alive = False
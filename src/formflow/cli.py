@@ -0,0 +1,92 @@
+import os
+import time
+from typing import Any, Dict
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .services.batch import BATCH_FORMATS, detect_format, iter_batch, open_zip, read_records
+from .services.render_pool import RenderPool
+
+formflow_cli = AppGroup('formflow', help="Formflow-Verwaltungsbefehle.")
+
+
+def _default_workers(render_config: Dict[str, Any]) -> int:
+    """Render-Prozesse ohne --workers: dem Prozess zugewiesene CPU-Kerne, höchstens ``render.max_concurrent``."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # z. B. macOS
+        cpus = os.cpu_count() or 1
+    limit = render_config.get('max_concurrent', 2)
+    return max(1, min(cpus, limit) if limit else cpus)
+
+
+@formflow_cli.command('render-batch')
+@click.argument('form_id')
+@click.argument('records_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(BATCH_FORMATS),
+              help="Eingabeformat; Standard: aus der Dateiendung (.csv, .jsonl).")
+@click.option('--workers', type=click.IntRange(min=1), default=None,
+              help="Anzahl paralleler Render-Prozesse, unabhängig von den Render-Slots der Web-Worker "
+                   "(Standard: Render-Pool bzw. CPU-Kerne, höchstens APP_RENDER__MAX_CONCURRENT).")
+@click.option('--zip', 'zip_path', type=click.Path(dir_okay=False),
+              help="PDFs in dieses ZIP-Archiv schreiben statt lokal/auf SMB zu speichern.")
+def render_batch_command(form_id: str, records_file: str, fmt: str, workers: int, zip_path: str) -> None:
+    """Erzeugt PDFs für alle Datensätze in RECORDS_FILE mit dem Formular FORM_ID."""
+    engine = current_app.extensions['formflow']
+    if form_id not in engine.forms:
+        raise click.UsageError(f"Formular '{form_id}' nicht gefunden.")
+
+    fmt = fmt or detect_format(records_file)
+    if fmt is None:
+        raise click.UsageError("Format nicht erkennbar, bitte --format angeben.")
+    with open(records_file, 'r', encoding='utf-8-sig', newline='') as f:
+        try:
+            records = read_records(f, fmt)
+        except ValueError as e:
+            raise click.ClickException(str(e)) from e
+
+    generator = engine.pdf_generator
+    config = engine.config
+    own_pool = None
+    if generator.render_pool is None or workers is not None:
+        # Eigener Pool für den Batch; ohne --workers so groß, wie Container-Kerne und Slots es zulassen
+        own_pool = RenderPool(workers=workers or _default_workers(config.get('render', {})))
+        shared_pool, generator.render_pool = generator.render_pool, own_pool
+    pool = generator.render_pool
+    shared_slots = generator.render_slots
+    if workers is not None:
+        # Ausdrücklich gewählte Parallelität: nicht über die mit Gunicorn geteilten Slots zulassen,
+        # sonst wäre --workers auf APP_RENDER__MAX_CONCURRENT begrenzt
+        generator.render_slots = None
+
+    click.echo(f"{len(records)} Datensätze für {form_id}, {pool.workers} Render-Prozesse.")
+    started = time.monotonic()
+    failed = 0
+    zip_target = open(zip_path, 'wb') if zip_path else None
+    archive = open_zip(zip_target) if zip_target else None
+    try:
+        with click.progressbar(length=len(records), label="Rendere PDFs") as bar:
+            for result in iter_batch(engine, form_id, records, config, pool.workers, zip_file=archive):
+                if 'error' in result:
+                    failed += 1
+                    click.echo(f"\nDatensatz {result['index'] + 1}: {result['error']}", err=True)
+                elif result.get('warning'):
+                    click.echo(f"\n{result['warning']}", err=True)
+                bar.update(1)
+    finally:
+        if archive is not None:
+            archive.close()
+            zip_target.close()
+        generator.render_slots = shared_slots
+        if own_pool is not None:
+            generator.render_pool = shared_pool
+            own_pool.close()
+
+    elapsed = time.monotonic() - started
+    rate = len(records) / elapsed if elapsed else 0.0
+    click.echo(f"Fertig: {len(records) - failed} erzeugt, {failed} fehlgeschlagen "
+               f"in {elapsed:.1f}s ({rate:.1f} PDFs/s).")
+    if failed:
+        raise SystemExit(1)
@@ -1,3 +1,5 @@
+from typing import List, Literal, Optional
+
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -9,6 +11,80 @@ class SmbConfig(BaseModel):
     folder: str = ""
     username: str = ""
     password: str = ""
+    port: int = Field(default=445, gt=0)
+    pool_size: int = Field(default=2, gt=0)  # Verbindungen je Worker, so viele Uploads laufen parallel
+    health_check_after: float = Field(default=30.0, ge=0)  # Nach so vielen Sekunden Leerlauf vor Nutzung per ECHO prüfen
+    timeout: float = Field(default=10.0, gt=0)  # Verbindungsaufbau, ECHO und Warten auf eine freie Verbindung
+
+class OutboxConfig(BaseModel):
+    """Durable spool for SMB uploads: /confirm returns at once, a background thread uploads."""
+    enabled: bool = True  # Nur wirksam bei aktivem SMB
+    spool_dir: str = "pdfs/outbox"  # Im pdfs-Volume, damit der Spool Container-Neustarts übersteht
+    batch_size: int = Field(default=10, gt=0)  # PDFs pro Durchlauf über dieselbe SMB-Session
+    poll_interval: float = Field(default=1.0, gt=0)  # Sekunden zwischen zwei Durchläufen
+    backoff_initial: float = Field(default=5.0, gt=0)  # Wartezeit nach dem ersten Fehlschlag, danach verdoppelt
+    backoff_max: float = Field(default=300.0, gt=0)
+    max_attempts: int = Field(default=5, gt=0)  # Fehlversuche je Datei, danach nach <spool_dir>/failed/ verschoben
+    reconcile_fallbacks: bool = True  # Lokale Fallback-PDFs (markiert in pdfs/fallback/) nachträglich hochladen
+    reconcile_legacy: bool = False  # Auch unmarkierte PDFs in pdfs/ hochladen und löschen (Fallbacks älterer Versionen)
+
+class StorageTargetConfig(BaseModel):
+    """One additional storage target; only the fields of its ``type`` are used."""
+    type: Literal["local", "smb", "webdav", "s3"]
+    name: str = ""  # Eindeutiger Name für Logs und Metriken, leer = Typ
+    required: bool = True  # False = im Hintergrund schreiben, Bestätigung wartet nicht darauf
+    timeout: float = Field(default=10.0, gt=0)
+    # local
+    directory: str = ""
+    # smb
+    server: str = ""
+    share: str = ""
+    folder: str = ""
+    port: int = Field(default=445, gt=0)
+    # smb, webdav
+    username: str = ""
+    password: str = ""
+    # webdav
+    url: str = ""  # URL der Ziel-Collection, z. B. https://cloud.example.com/remote.php/dav/files/formflow/PDFs
+    # s3
+    endpoint: str = ""  # z. B. https://s3.eu-central-1.amazonaws.com oder http://minio:9000
+    bucket: str = ""
+    region: str = "us-east-1"
+    access_key: str = ""
+    secret_key: str = ""
+    prefix: str = ""
+
+class StorageConfig(BaseModel):
+    """Additional storage targets written in parallel to the primary target (SMB or local pdfs/)."""
+    targets: List[StorageTargetConfig] = Field(default_factory=list)  # per Env als JSON-Liste
+    max_workers: int = Field(default=4, gt=0)  # Threads je Worker für das parallele Schreiben
+    wait_timeout: float = Field(default=30.0, gt=0)  # Sekunden, die /confirm höchstens auf erforderliche Ziele wartet
+
+class PreviewConfig(BaseModel):
+    """Store for preview PDFs until confirm: a tmpfs directory shared by all workers, or worker memory."""
+    backend: Literal["memory", "tmpfs"] = "tmpfs"  # memory nur mit einem Worker (WEB_CONCURRENCY=1)
+    directory: str = ""  # Nur für tmpfs; leer = /dev/shm/formflow-previews, ohne /dev/shm im temp-Verzeichnis
+    max_mb: int = Field(default=32, ge=0)  # Byte-Budget, darüber werden die am längsten ungenutzten entfernt; 0 = unbegrenzt
+    ttl: int = Field(default=3600, gt=0)  # Sekunden, nach denen eine nicht bestätigte Vorschau verfällt
+
+class ServingConfig(BaseModel):
+    """Delivery of PDFs under /pdf/: browser caching of final documents and optional reverse-proxy offloading."""
+    final_max_age: int = Field(default=0, ge=0)  # Sekunden ohne Revalidierung; 0 = immer per ETag revalidieren (Dateinamen können wiederverwendet werden)
+    offload: Literal["none", "x-accel-redirect", "x-sendfile"] = "none"  # Datei liefert der Reverse-Proxy aus
+    accel_prefix: str = "/protected-pdfs/"  # internal-Location in nginx, die auf das pdfs-Verzeichnis zeigt
+
+class JanitorConfig(BaseModel):
+    """Background cleanup of expired previews and temp PDFs (instead of a scan on every preview)."""
+    max_age: int = Field(default=3600, gt=0)  # Sekunden, nach denen verwaiste temp-PDFs gelöscht werden
+    interval: float = Field(default=60.0, gt=0)  # Sekunden zwischen zwei Durchläufen
+    scan_interval: float = Field(default=3600.0, gt=0)  # Vollständiger Scan von pdfs/temp_*.pdf und Vorschauverzeichnis
+
+class BatchConfig(BaseModel):
+    """Background jobs for /api/batch (status and ZIP on disk, shared by all workers)."""
+    directory: str = "batch_jobs"  # Status und ZIP-Ergebnisse je Job
+    ttl: int = Field(default=3600, gt=0)  # Sekunden, nach denen abgeschlossene Jobs gelöscht werden
+    max_runtime: int = Field(default=86400, gt=0)  # Sekunden, nach denen auch ein laufender Job gelöscht wird
+    max_wait: float = Field(default=300, gt=0)  # Sekunden, die ein Datensatz auf einen Render-Slot wartet, danach Fehler
 
 class CompanyConfig(BaseModel):
     """Company branding shown in headers, footers and PDF documents."""
@@ -24,6 +100,68 @@ class ColorsConfig(BaseModel):
     bg_light: str = ""
     bg_gray: str = ""
 
+class RenderConfig(BaseModel):
+    """PDF rendering: optional pool of pre-warmed WeasyPrint worker processes and render cache."""
+    pool_size: int = Field(default=0, ge=0)  # 0 = Rendering im Request-Thread
+    queue_size: int = Field(default=4, ge=0)
+    timeout: int = Field(default=110, gt=0)
+    async_preview: bool = True  # Vorschau sofort ausliefern, PDF im Hintergrund rendern
+    cache_dir: str = "render_cache"
+    cache_size_mb: int = Field(default=0, ge=0)  # 0 = Render-Cache deaktiviert (Standard, PDFs enthalten personenbezogene Daten)
+    cache_ttl: int = Field(default=3600, gt=0)  # Gecachte PDFs nach so vielen Sekunden löschen
+    preview_mode: Literal["pdf", "html"] = "pdf"  # html = Schnellvorschau, PDF erst beim Bestätigen
+    warm_up: bool = True  # Templates und WeasyPrint beim Start im Hintergrund vorwärmen
+    max_concurrent: int = Field(default=2, ge=0)  # Gleichzeitige Renderings über alle Worker, 0 = unbegrenzt
+    admission_queue: int = Field(default=4, ge=0)  # Wartende Renderings, darüber sofort HTTP 503
+    admission_wait: float = Field(default=10, gt=0)  # Maximale Wartezeit auf einen Slot in Sekunden
+    retry_after: int = Field(default=5, gt=0)  # Retry-After-Header der 503-Antwort in Sekunden
+    preview_slots: int = Field(default=1, ge=0)  # Slots, die /api/batch nicht belegt (bleiben Vorschauen vorbehalten)
+    slots_dir: str = "render_slots"  # Lock-Dateien der Slots, von allen Workern geteilt
+
+# Ausgabeprofile von WeasyPrint (weasyprint.pdf.VARIANTS der Version aus requirements.txt);
+# hier aufgezählt, damit die Konfiguration ohne Import von WeasyPrint geprüft werden kann
+PdfVariant = Literal[
+    "",
+    "pdf/a-1a", "pdf/a-1b", "pdf/a-2a", "pdf/a-2b", "pdf/a-2u", "pdf/a-3a", "pdf/a-3b", "pdf/a-3u",
+    "pdf/a-4e", "pdf/a-4f", "pdf/a-4u",
+    "pdf/ua-1", "pdf/ua-2",
+    "pdf/x-1a", "pdf/x-3", "pdf/x-4", "pdf/x-5g",
+    "debug",
+]
+
+class PdfConfig(BaseModel):
+    """WeasyPrint output options; individual forms may override them via ``pdf_options``."""
+    optimize_images: bool = False  # Bilder verlustfrei neu komprimieren
+    jpeg_quality: Optional[int] = Field(default=None, ge=0, le=95)  # None = JPEGs unverändert übernehmen
+    dpi: Optional[int] = Field(default=None, gt=0)  # Maximale Bildauflösung, None = unbegrenzt
+    full_fonts: bool = False  # False = nur verwendete Glyphen einbetten (Subsetting)
+    pdf_variant: PdfVariant = ""  # z. B. "pdf/a-3b" für Archivierung, leer = normales PDF
+
+class PdfOptions(BaseModel):
+    """Per-form ``pdf_options`` from the form YAML; only the given keys override ``PdfConfig``."""
+    optimize_images: Optional[bool] = None
+    jpeg_quality: Optional[int] = Field(default=None, ge=0, le=95)
+    dpi: Optional[int] = Field(default=None, gt=0)
+    full_fonts: Optional[bool] = None
+    pdf_variant: Optional[PdfVariant] = None
+
+class MemoryConfig(BaseModel):
+    """Per-render memory accounting and RSS ceiling for graceful worker restarts (gunicorn)."""
+    max_rss_mb: int = Field(default=400, ge=0)  # 0 = kein Neustart nach Speicherverbrauch
+    trace_allocations: bool = False  # tracemalloc-Peak je Rendering (kostet Rechenzeit)
+    log_heaviest: int = Field(default=5, ge=0)  # Anzahl protokollierter schwerster Renderings
+
+class MetricsConfig(BaseModel):
+    """Built-in metrics endpoint (/metrics, Prometheus text format)."""
+    enabled: bool = True
+    multiprocess_dir: str = ""  # Verzeichnis für Snapshots je Prozess; leer = nur dieser Prozess
+    flush_interval: float = 1.0  # Sekunden, nach denen Änderungen gesammelt in den Snapshot geschrieben werden
+
+class TracingConfig(BaseModel):
+    """Per-request tracing spans, reported as Server-Timing header and optionally as OTLP JSON lines."""
+    enabled: bool = False
+    export_file: str = ""  # z. B. traces.jsonl; leer = nur Server-Timing-Header
+
 class AppSettings(BaseSettings):
     """Main application settings model, loaded from environment variables."""
     model_config = SettingsConfigDict(
@@ -36,4 +174,15 @@ class AppSettings(BaseSettings):
 
     company: CompanyConfig = Field(default_factory=CompanyConfig)
     colors: ColorsConfig = Field(default_factory=ColorsConfig)
-    smb: SmbConfig = Field(default_factory=SmbConfig)
\ No newline at end of file
+    smb: SmbConfig = Field(default_factory=SmbConfig)
+    outbox: OutboxConfig = Field(default_factory=OutboxConfig)
+    storage: StorageConfig = Field(default_factory=StorageConfig)
+    preview: PreviewConfig = Field(default_factory=PreviewConfig)
+    janitor: JanitorConfig = Field(default_factory=JanitorConfig)
+    batch: BatchConfig = Field(default_factory=BatchConfig)
+    serving: ServingConfig = Field(default_factory=ServingConfig)
+    render: RenderConfig = Field(default_factory=RenderConfig)
+    pdf: PdfConfig = Field(default_factory=PdfConfig)
+    memory: MemoryConfig = Field(default_factory=MemoryConfig)
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+    tracing: TracingConfig = Field(default_factory=TracingConfig)
\ No newline at end of file
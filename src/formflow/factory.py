@@ -5,7 +5,9 @@ from flask import Flask
 from pydantic import ValidationError
 
 from ._version import __version__
+from .cli import formflow_cli
 from .config import AppSettings
+from .services.asset_fetcher import get_asset_fetcher
 from .services.form_engine import FormEngine
 
 logger = logging.getLogger(__name__)
@@ -59,9 +61,15 @@ def create_app():
                 logger.warning("Logo konnte nicht kopiert werden: %s → %s", src_logo, dst_logo, exc_info=True)
         else:
             logger.debug("Kein Logo gefunden unter %s, Standardlogo wird verwendet.", src_logo)
+        # Logo einmalig in den Speicher laden, statt es bei jedem PDF-Rendering von Disk zu lesen
+        if os.path.isfile(dst_logo):
+            get_asset_fetcher().preload(dst_logo)
 
     # Formular-Engine initialisieren und Konfiguration übergeben
     form_engine = FormEngine(forms_dir=forms_dir, pdf_templates_dir=pdf_templates_dir)
     form_engine.init_app(app)
+    # Templates und WeasyPrint im Hintergrund vorwärmen; /ready meldet das Ende
+    form_engine.start_warm_up()
+    app.cli.add_command(formflow_cli)
 
     return app
@@ -1,37 +1,108 @@
 import json
 import logging
 import os
+import re
 import uuid
 from datetime import date
 
-from flask import Blueprint, Flask, redirect, render_template, request, send_from_directory, url_for
+from flask import (
+    Blueprint, Flask, Response, jsonify, make_response, redirect, render_template, request, send_file,
+    url_for,
+)
 from werkzeug.utils import secure_filename
 
+from ..services import tracing
+from ..services.batch import BATCH_FORMATS, batch_workers, detect_format, iter_batch, read_records, text_stream
 from ..services.draft_service import collect_form_data, delete_draft, list_drafts, load_draft, save_draft, update_draft
+from ..services.metrics import metrics
+from ..services.pdf_serving import send_document, send_preview
+from ..services.render_pool import RenderPoolBusyError
+from ..services.signature_service import normalize_signatures
 
 logger = logging.getLogger(__name__)
 
+# Vorschau-PDFs werden unter /pdf/temp_<id>.pdf aus dem PreviewStore ausgeliefert
+_PREVIEW_FILENAME_RE = re.compile(r'^temp_([0-9A-Za-z_-]+)\.pdf$')
+
 
 def register_routes(app: Flask, engine) -> None:
     """Registriert die Flask-Routen für die FormEngine als Blueprint."""
     bp = Blueprint('main', __name__)
 
+    @bp.before_request
+    def start_trace():
+        if engine.config.get('tracing', {}).get('enabled'):
+            tracing.start_trace(request.endpoint or request.path, request.headers.get('traceparent'),
+                                **{'http.method': request.method, 'http.target': request.path})
+
+    @bp.after_request
+    def add_server_timing(response):
+        trace = tracing.end_trace(engine.config.get('tracing', {}).get('export_file', ''))
+        if trace is not None:
+            response.headers['Server-Timing'] = trace.server_timing()
+        return response
+
+    @bp.teardown_request
+    def end_trace(exc):
+        # Nach einer Exception läuft after_request nicht; Trace trotzdem abschließen
+        tracing.end_trace(engine.config.get('tracing', {}).get('export_file', ''))
+
+    def busy_response(exc: RenderPoolBusyError, draft_id: str = ''):
+        """503 mit Retry-After; die Seite sendet das Formular danach automatisch erneut ab."""
+        retry_after = getattr(exc, 'retry_after', None) or engine.config.get('render', {}).get('retry_after', 5)
+        fields = [(key, value) for key, value in request.form.items(multi=True) if key != 'draft_id']
+        response = make_response(render_template('busy.html',
+                                                 action=request.path,
+                                                 fields=fields,
+                                                 draft_id=draft_id or request.form.get('draft_id', ''),
+                                                 retry_after=retry_after,
+                                                 app_config=engine.config), 503)
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
     @bp.route('/')
     def index():
         """Startseite - Weiterleitung zur Formularliste"""
         return redirect(url_for('main.list_forms'))
 
+    @bp.route('/ready')
+    def ready():
+        """Readiness-Probe: 503, solange der Warm-up dieses Workers läuft"""
+        warmup = engine.warmup
+        if warmup is not None and not warmup.ready:
+            return jsonify(status='warming_up'), 503
+        if warmup is not None and warmup.error:
+            return jsonify(status='ready', warm_up_error=warmup.error)
+        return jsonify(status='ready')
+
+    @bp.route('/metrics')
+    def metrics_endpoint():
+        """Metriken im Prometheus-Text-Format (über alle Gunicorn-Worker aggregiert)"""
+        if not engine.config.get('metrics', {}).get('enabled', True):
+            return "Metriken deaktiviert", 404
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
     @bp.route('/pdf/<filename>')
     def serve_pdf(filename):
-        """Stellt PDF-Dateien zur Verfügung"""
+        """Stellt PDF-Dateien zur Verfügung (Vorschauen aus dem Speicher, sonst aus pdfs/)
+
+        Mit Range-Requests (PDF.js lädt die ersten Seiten vorab) und starken ETags/304.
+        """
         safe_filename = secure_filename(filename)
-        return send_from_directory(os.path.abspath('pdfs'), safe_filename)
+        preview_match = _PREVIEW_FILENAME_RE.match(safe_filename)
+        if preview_match:
+            pdf_bytes = engine.preview_store.get(preview_match.group(1))
+            if pdf_bytes is not None:
+                return send_preview(pdf_bytes, safe_filename)
+        return send_document(os.path.abspath('pdfs'), safe_filename, engine.config.get('serving', {}))
 
     @bp.route('/forms')
     def list_forms():
         """Zeigt eine Liste aller verfügbaren Formulare an"""
-        drafts = list_drafts('drafts', engine.forms)
-        return render_template('form_list.html', forms=engine.forms, drafts=drafts, app_config=engine.config)
+        with tracing.span('draft_list'):
+            drafts = list_drafts('drafts', engine.forms)
+        with tracing.span('template'):
+            return render_template('form_list.html', forms=engine.forms, drafts=drafts, app_config=engine.config)
 
     @bp.route('/form/<form_id>', methods=['GET', 'POST'])
     def show_form(form_id: str):
@@ -59,8 +130,6 @@ def register_routes(app: Flask, engine) -> None:
     @bp.route('/preview/<form_id>', methods=['POST'])
     def preview_form(form_id: str):
         """Generiert eine Vorschau des ausgefüllten Formulars"""
-        # Lazily bereinige verwaiste temp-Dateien (z.B. nach Browser-Abbruch)
-        engine._cleanup_temp_files()
         if form_id not in engine.forms:
             return "Formular nicht gefunden", 404
 
@@ -78,24 +147,94 @@ def register_routes(app: Flask, engine) -> None:
             else:
                 form_data[field_name] = request.form.get(field_name, '')
 
+        # Raster-Unterschriften vor Entwurf und PDF verkleinern
+        with tracing.span('signatures'):
+            form_data = normalize_signatures(form_def, form_data)
+
         # Entwurf automatisch speichern/aktualisieren
         draft_id = request.form.get('draft_id', '')
-        if draft_id:
-            update_draft('drafts', draft_id, form_id, form_data)
-        else:
-            draft_id = save_draft('drafts', form_id, form_data)
+        with tracing.span('draft_save'):
+            if draft_id:
+                update_draft('drafts', draft_id, form_id, form_data)
+            else:
+                draft_id = save_draft('drafts', form_id, form_data)
 
-        # PDF generieren
         file_id = uuid.uuid4().hex
-        temp_filename = f"pdfs/temp_{file_id}.pdf"
-        engine.pdf_generator.generate(form_def, form_data, temp_filename, engine.config)
-
-        return render_template('preview.html',
-                               uuid=file_id,
-                               form_id=form_id,
-                               draft_id=draft_id,
-                               form_data=form_data,
-                               app_config=engine.config)
+
+        # Schnellvorschau: PDF-Template als HTML anzeigen, WeasyPrint erst beim Bestätigen
+        if engine._preview_mode(form_def) == 'html':
+            with tracing.span('html_preview'):
+                preview_html = engine.pdf_generator.render_html(form_def, form_data, engine.config, document_id=file_id)
+            with tracing.span('template'):
+                return render_template('preview.html',
+                                       uuid=file_id,
+                                       form_id=form_id,
+                                       draft_id=draft_id,
+                                       form_data=form_data,
+                                       preview_html=preview_html,
+                                       app_config=engine.config)
+
+        # PDF in den Speicher generieren – asynchron im Hintergrund oder direkt im Request
+        if engine.render_jobs is not None:
+            # Slot bzw. Warteplatz schon im Request reservieren: ist alles belegt, sofort 503
+            admission = None
+            render_slots = engine.pdf_generator.render_slots
+            if render_slots is not None:
+                try:
+                    admission = render_slots.admit(engine.config.get('render', {}).get('timeout', 110))
+                except RenderPoolBusyError as exc:
+                    logger.warning(f"Render-Warteschlange voll, Vorschau für {form_id} abgelehnt.")
+                    return busy_response(exc, draft_id)
+            try:
+                engine.render_jobs.submit(file_id, engine._render_preview,
+                                          file_id, form_def, form_data, engine.config, admission)
+            except BaseException:
+                if admission is not None:
+                    admission.release()
+                raise
+        else:
+            try:
+                with tracing.span('render'):
+                    engine._render_preview(file_id, form_def, form_data, engine.config)
+            except RenderPoolBusyError as exc:
+                logger.warning(f"PDF-Generator ausgelastet, Vorschau für {form_id} abgelehnt.")
+                return busy_response(exc, draft_id)
+
+        with tracing.span('template'):
+            return render_template('preview.html',
+                                   uuid=file_id,
+                                   form_id=form_id,
+                                   draft_id=draft_id,
+                                   form_data=form_data,
+                                   render_async=engine.render_jobs is not None,
+                                   app_config=engine.config)
+
+    @bp.route('/preview/status/<file_id>')
+    def preview_status(file_id: str):
+        """Liefert den Render-Status einer asynchronen Vorschau als JSON"""
+        file_id = secure_filename(file_id)
+        pdf_url = url_for('main.serve_pdf', filename=f"temp_{file_id}.pdf")
+        if file_id in engine.preview_store:
+            return jsonify(status='done', pdf_url=pdf_url)
+        if engine.render_jobs is None:
+            return jsonify(status='unknown'), 404
+        status = engine.render_jobs.status(file_id)
+        if status == engine.render_jobs.ERROR:
+            error = engine.render_jobs.error(file_id)
+            if isinstance(error, RenderPoolBusyError):
+                # Die Vorschau-Seite sendet das Formular nach Retry-After erneut ab
+                retry_after = getattr(error, 'retry_after', None) or engine.config.get('render', {}).get('retry_after', 5)
+                response = jsonify(status='busy', retry_after=retry_after,
+                                   message="Der PDF-Generator ist ausgelastet. Bitte in Kürze erneut versuchen.")
+                response.status_code = 503
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+            return jsonify(status='error', message="Das PDF konnte nicht erstellt werden.")
+        if status in (engine.render_jobs.DONE, engine.render_jobs.UNKNOWN):
+            # Job fertig, Vorschau aber nicht (mehr) vorhanden, z.B. nach "Zurück zum Bearbeiten",
+            # oder Job in diesem Prozess nicht bekannt
+            return jsonify(status='unknown'), 404
+        return jsonify(status=status)
 
     @bp.route('/confirm/<form_id>/<file_id>', methods=['POST'])
     def confirm_form(form_id: str, file_id: str):
@@ -107,21 +246,42 @@ def register_routes(app: Flask, engine) -> None:
 
         # Erzeuge Dateiname und speichere das PDF (lokal oder SMB)
         filename_parts = engine._generate_filename_parts(form_id, form_def, request.form)
-        temp_filename = f"pdfs/temp_{file_id}.pdf"
         final_filename = f"pdfs/{'_'.join(filename_parts)}.pdf"
 
-        if not os.path.exists(temp_filename):
-            return "Fehler: Temporäre Datei nicht gefunden.", 400
+        # Falls das Vorschau-PDF noch im Hintergrund gerendert wird, darauf warten
+        if engine.render_jobs is not None and file_id not in engine.preview_store:
+            with tracing.span('render_wait'):
+                engine.render_jobs.wait(file_id, engine.config.get('render', {}).get('timeout', 110))
+
+        pdf_bytes = engine.preview_store.get(file_id)
+        if pdf_bytes is None:
+            # Nach einer HTML-Schnellvorschau wird das PDF erst jetzt aus den bestätigten Daten erzeugt.
+            # Ebenso, wenn die Vorschau fehlt: Job in einem anderen Worker noch nicht fertig,
+            # Hintergrund-Rendering fehlgeschlagen oder Vorschau abgelaufen
+            if engine._preview_mode(form_def) != 'html':
+                logger.info(f"Vorschau {file_id} nicht verfügbar, PDF für {form_id} wird aus den Formulardaten erzeugt.")
+            form_data = normalize_signatures(form_def, collect_form_data(form_def, request.form))
+            try:
+                with tracing.span('render'):
+                    pdf_bytes = engine.pdf_generator.render(form_def, form_data, engine.config,
+                                                               document_id=file_id)
+            except RenderPoolBusyError as exc:
+                logger.warning(f"PDF-Generator ausgelastet, Bestätigung für {form_id} abgelehnt.")
+                return busy_response(exc)
 
         try:
-            result = engine._store_pdf(temp_filename, final_filename, filename_parts)
+            with tracing.span('store'):
+                result = engine._store_pdf_bytes(pdf_bytes, final_filename, filename_parts)
+            engine.preview_store.discard(file_id)
             draft_id = request.form.get('draft_id', '')
             if draft_id:
-                delete_draft('drafts', draft_id)
-            return render_template('success.html',
-                                   app_config=engine.config,
-                                   warning=result.get('warning'),
-                                   filename=result.get('filename'))
+                with tracing.span('draft_delete'):
+                    delete_draft('drafts', draft_id)
+            with tracing.span('template'):
+                return render_template('success.html',
+                                       app_config=engine.config,
+                                       warning=result.get('warning'),
+                                       filename=result.get('filename'))
         except Exception:
             logger.exception("Fehler beim Speichern des PDFs")
             return "Interner Serverfehler beim Speichern des PDFs.", 500
@@ -132,9 +292,7 @@ def register_routes(app: Flask, engine) -> None:
         if form_id not in engine.forms:
             return "Formular nicht gefunden", 404
 
-        temp_filename = f"pdfs/temp_{file_id}.pdf"
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
+        engine.preview_store.discard(file_id)
 
         form_def = engine.forms[form_id]
 
@@ -157,19 +315,22 @@ def register_routes(app: Flask, engine) -> None:
             return "Formular nicht gefunden", 404
 
         form_def = engine.forms[form_id]
-        form_data = collect_form_data(form_def, request.form)
+        with tracing.span('signatures'):
+            form_data = normalize_signatures(form_def, collect_form_data(form_def, request.form))
         draft_id = request.form.get('draft_id', '')
-        if draft_id:
-            update_draft('drafts', draft_id, form_id, form_data)
-        else:
-            save_draft('drafts', form_id, form_data)
+        with tracing.span('draft_save'):
+            if draft_id:
+                update_draft('drafts', draft_id, form_id, form_data)
+            else:
+                save_draft('drafts', form_id, form_data)
         return redirect(url_for('main.list_forms'))
 
     @bp.route('/draft/<form_id>/<draft_id>/load', methods=['GET'])
     def load_draft_route(form_id: str, draft_id: str):
         """Lädt einen Entwurf und öffnet das Formular vorausgefüllt"""
         try:
-            draft = load_draft('drafts', draft_id)
+            with tracing.span('draft_load'):
+                draft = load_draft('drafts', draft_id)
         except (FileNotFoundError, json.JSONDecodeError):
             logger.warning(f"Entwurf {draft_id} konnte nicht geladen werden.")
             return redirect(url_for('main.list_forms'))
@@ -184,17 +345,82 @@ def register_routes(app: Flask, engine) -> None:
             if field.get('type') == 'date' and field.get('default') == 'today':
                 field['default_value'] = date.today().isoformat()
 
-        return render_template('dynamic_form.html',
-                               form=form_def,
-                               data=data,
-                               draft_id=draft_id,
-                               date_today=date.today().isoformat(),
-                               app_config=engine.config)
+        with tracing.span('template'):
+            return render_template('dynamic_form.html',
+                                   form=form_def,
+                                   data=data,
+                                   draft_id=draft_id,
+                                   date_today=date.today().isoformat(),
+                                   app_config=engine.config)
 
     @bp.route('/draft/<draft_id>/delete', methods=['POST'])
     def delete_draft_route(draft_id: str):
         """Löscht einen Entwurf"""
-        delete_draft('drafts', draft_id)
+        with tracing.span('draft_delete'):
+            delete_draft('drafts', draft_id)
         return redirect(url_for('main.list_forms'))
 
+    @bp.route('/api/batch/<form_id>', methods=['POST'])
+    def render_batch(form_id: str):
+        """Startet die PDF-Erzeugung für viele Datensätze (CSV oder JSON Lines) als Hintergrund-Job.
+
+        Die Datensätze kommen als Datei-Upload (Feld ``records``) oder als Request-Body.
+        Standardmäßig werden die PDFs wie bei /confirm gespeichert; mit ``?zip=1`` wird
+        stattdessen ein ZIP-Archiv erzeugt. Antwortet sofort mit 202 und der Job-ID;
+        Fortschritt und Ergebnis liefern /api/batch/jobs/<job_id>(/download).
+        Für sehr große Batches ist ``flask render-batch`` gedacht.
+        """
+        if form_id not in engine.forms:
+            return jsonify(error="Formular nicht gefunden"), 404
+
+        upload = request.files.get('records')
+        data = upload.read() if upload else request.get_data()
+        fmt = request.args.get('format') or detect_format(upload.filename if upload else '')
+        if fmt is None:
+            fmt = 'csv' if 'csv' in (request.mimetype or '') else 'jsonl'
+        if fmt not in BATCH_FORMATS:
+            return jsonify(error=f"Unbekanntes Format, erlaubt: {', '.join(BATCH_FORMATS)}"), 400
+        try:
+            records = read_records(text_stream(data), fmt)
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify(error=f"Datensätze konnten nicht gelesen werden: {e}"), 400
+
+        config = engine.config
+        workers = batch_workers(engine.pdf_generator.render_pool)
+        as_zip = bool(request.args.get('zip'))
+        job_id = engine.batch_jobs.start(
+            form_id, len(records),
+            lambda archive: iter_batch(engine, form_id, records, config, workers, zip_file=archive),
+            as_zip=as_zip,
+        )
+        logger.info(f"Batch {job_id} für {form_id}: {len(records)} Datensätze, {workers} parallel.")
+
+        status_url = url_for('main.batch_status', job_id=job_id)
+        body = {'job_id': job_id, 'status_url': status_url}
+        if as_zip:
+            body['download_url'] = url_for('main.batch_download', job_id=job_id)
+        response = jsonify(body)
+        response.status_code = 202
+        response.headers['Location'] = status_url
+        return response
+
+    @bp.route('/api/batch/jobs/<job_id>')
+    def batch_status(job_id: str):
+        """Fortschritt eines Batch-Jobs (running/done/aborted, done/total, Fehler je Datensatz)."""
+        status = engine.batch_jobs.status(job_id)
+        if status is None:
+            return jsonify(error="Batch nicht gefunden"), 404
+        return jsonify(status)
+
+    @bp.route('/api/batch/jobs/<job_id>/download')
+    def batch_download(job_id: str):
+        """Liefert das ZIP-Archiv eines abgeschlossenen Batch-Jobs (nur mit ?zip=1 gestartet)."""
+        status = engine.batch_jobs.status(job_id)
+        if status is None or not status['zip']:
+            return jsonify(error="Batch nicht gefunden"), 404
+        if status['status'] != engine.batch_jobs.DONE:
+            return jsonify(error="Batch noch nicht abgeschlossen", status=status['status']), 409
+        return send_file(engine.batch_jobs.zip_path(job_id), mimetype='application/zip',
+                         as_attachment=True, download_name=f"{status['form_id']}_batch.zip")
+
     app.register_blueprint(bp)
@@ -0,0 +1,111 @@
+import base64
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote, unquote_to_bytes
+
+logger = logging.getLogger(__name__)
+
+# PDF-Templates referenzieren Logo und statische Dateien als file:///app/static/<datei>
+_DEFAULT_STATIC_DIR = '/app/static'
+_MAX_DATA_URLS = 64
+
+
+class AssetFetcher:
+    """WeasyPrint URL fetcher that serves static assets and data URLs from memory.
+
+    Files below ``static_dir`` are read from disk once and kept as bytes for the
+    lifetime of the process.  ``data:`` URLs (signatures) are decoded once and
+    cached by the hash of the URL, so re-rendering the same signature skips the
+    base64 work.  All other URLs fall back to WeasyPrint's default ``URLFetcher``.
+
+    WeasyPrint only calls the fetcher, so this class does not subclass
+    ``URLFetcher``; weasyprint itself is imported on the first fetch.
+    """
+
+    def __init__(self, static_dir: str = _DEFAULT_STATIC_DIR, max_data_urls: int = _MAX_DATA_URLS) -> None:
+        self.static_dir = os.path.abspath(static_dir)
+        self._max_data_urls = max_data_urls
+        self._assets: Dict[str, Tuple[bytes, str]] = {}
+        self._data_urls: "OrderedDict[bytes, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._default_fetcher = None
+
+    def __call__(self, url: str):
+        return self.fetch(url)
+
+    def preload(self, path: str) -> bool:
+        """Reads a file below ``static_dir`` into the cache; returns False if not possible."""
+        path = os.path.abspath(path)
+        if not self._is_static(path):
+            logger.warning(f"Asset {path} liegt nicht unter {self.static_dir} und wird nicht gecacht.")
+            return False
+        return self._load(path) is not None
+
+    def fetch(self, url: str, headers: Optional[dict] = None):
+        from weasyprint.urls import URLFetcher, URLFetcherResponse  # noqa: PLC0415
+
+        if url.startswith('data:'):
+            body, mime_type = self._decode_data_url(url)
+            return URLFetcherResponse(url, body, {'Content-Type': mime_type})
+        if url.startswith('file://'):
+            path = os.path.normpath(unquote(url[len('file://'):].split('?')[0]))
+            if self._is_static(path):
+                asset = self._assets.get(path) or self._load(path)
+                if asset is not None:
+                    return URLFetcherResponse(url, asset[0], {'Content-Type': asset[1]})
+        if self._default_fetcher is None:
+            self._default_fetcher = URLFetcher()
+        return self._default_fetcher.fetch(url, headers)
+
+    def _is_static(self, path: str) -> bool:
+        return path.startswith(self.static_dir + os.sep)
+
+    def _load(self, path: str) -> Optional[Tuple[bytes, str]]:
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        mime_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        with self._lock:
+            self._assets[path] = (body, mime_type)
+        logger.debug(f"Asset im Speicher gecacht: {path} ({len(body)} Bytes)")
+        return body, mime_type
+
+    def _decode_data_url(self, url: str) -> Tuple[bytes, str]:
+        key = hashlib.sha256(url.encode('utf-8')).digest()
+        with self._lock:
+            cached = self._data_urls.get(key)
+            if cached is not None:
+                self._data_urls.move_to_end(key)
+                return cached
+
+        header, _, payload = url[len('data:'):].partition(',')
+        params = header.split(';')
+        mime_type = params[0] or 'text/plain'
+        if params[-1] == 'base64':
+            body = base64.b64decode(payload)
+        else:
+            body = unquote_to_bytes(payload)
+
+        with self._lock:
+            self._data_urls[key] = (body, mime_type)
+            while len(self._data_urls) > self._max_data_urls:
+                self._data_urls.popitem(last=False)
+        return body, mime_type
+
+
+_asset_fetcher: Optional[AssetFetcher] = None
+
+
+def get_asset_fetcher() -> AssetFetcher:
+    """Returns the process-wide AssetFetcher (Web-Worker bzw. Render-Pool-Prozess)."""
+    global _asset_fetcher
+    if _asset_fetcher is None:
+        _asset_fetcher = AssetFetcher()
+    return _asset_fetcher
@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional
+
+from .render_pool import RenderPool, RenderPoolBusyError, RenderTimeoutError
+from .signature_service import normalize_signatures
+
+logger = logging.getLogger(__name__)
+
+BATCH_FORMATS = ('csv', 'jsonl')
+# Trennzeichen für Mehrfachauswahl-Felder in CSV-Zellen
+_CSV_LIST_SEPARATOR = ';'
+_BUSY_RETRY_SECONDS = 0.5
+
+
+def detect_format(filename: str) -> Optional[str]:
+    """Leitet das Eingabeformat aus der Dateiendung ab ('csv', 'jsonl' oder None)."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return None
+
+
+def read_records(stream: IO[str], fmt: str) -> List[Dict[str, Any]]:
+    """Liest Datensätze aus CSV (Kopfzeile = Feldnamen) oder JSON Lines (ein Objekt pro Zeile).
+
+    Raises:
+        ValueError: bei unbekanntem Format oder ungültiger JSON-Zeile.
+    """
+    if fmt == 'csv':
+        return [dict(row) for row in csv.DictReader(stream)]
+    if fmt == 'jsonl':
+        records = []
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Zeile {line_no}: ungültiges JSON ({e.msg})") from e
+            if not isinstance(record, dict):
+                raise ValueError(f"Zeile {line_no}: erwartet wird ein JSON-Objekt")
+            records.append(record)
+        return records
+    raise ValueError(f"Unbekanntes Format '{fmt}', erlaubt: {', '.join(BATCH_FORMATS)}")
+
+
+def record_to_form_data(form_def: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    """Bildet einen Datensatz wie collect_form_data() auf die Felder des Formulars ab."""
+    form_data: Dict[str, Any] = {}
+    for field in form_def.get('fields', []):
+        field_name = field.get('name')
+        if not field_name:
+            continue
+        value = record.get(field_name)
+        if value is None:
+            value = ''
+        if field.get('type') == 'select' and field.get('multiple'):
+            if isinstance(value, str):
+                value = [v.strip() for v in value.split(_CSV_LIST_SEPARATOR) if v.strip()]
+            form_data[field_name] = [str(v) for v in value]
+        else:
+            form_data[field_name] = value if isinstance(value, str) else str(value)
+    return normalize_signatures(form_def, form_data)
+
+
+def _render_with_retry(engine, form_def: Dict[str, Any], form_data: Dict[str, Any], config: Dict[str, Any]) -> bytes:
+    """Rendert ein PDF mit Batch-Priorität; ist kein Slot frei, wird bis ``batch.max_wait`` gewartet.
+
+    Mit ``render_slots`` belegt der Batch nur nicht reservierte Slots und keine
+    Warteplätze (siehe ``RenderSlots.try_admit_background``), Vorschauen haben Vorrang.
+
+    Raises:
+        RenderPoolBusyError: Nach ``batch.max_wait`` Sekunden weiterhin kein Slot frei.
+    """
+    generator = engine.pdf_generator
+    max_wait = config.get('batch', {}).get('max_wait', 300)
+    deadline = time.monotonic() + max_wait
+    while True:
+        admission = None
+        if generator.render_slots is not None:
+            admission = generator.render_slots.try_admit_background()
+        if generator.render_slots is None or admission is not None:
+            try:
+                return generator.render(form_def, form_data, config, admission)
+            except RenderTimeoutError:
+                raise
+            except RenderPoolBusyError:
+                pass
+        if time.monotonic() >= deadline:
+            raise RenderPoolBusyError(f"Kein Render-Slot innerhalb von {max_wait:g}s frei geworden.")
+        time.sleep(_BUSY_RETRY_SECONDS)
+
+
+def iter_batch(
+    engine,
+    form_id: str,
+    records: Iterable[Dict[str, Any]],
+    config: Dict[str, Any],
+    workers: int = 1,
+    zip_file: Optional[zipfile.ZipFile] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Rendert alle Datensätze für *form_id* parallel und speichert sie.
+
+    Gerendert wird in *workers* Threads über ``engine.pdf_generator`` (mit
+    Render-Pool: echte Parallelität über mehrere Prozesse/Kerne). Gespeichert
+    wird im aufrufenden Thread, entweder über PdfStorage (lokal/SMB) oder – wenn
+    *zip_file* gesetzt ist – als Eintrag im ZIP-Archiv.
+
+    Yields:
+        Pro Datensatz (in Fertigstellungsreihenfolge) ein dict mit 'index',
+        'filename', 'stored_via', optional 'warning' bzw. 'error'.
+    """
+    form_def = engine.forms[form_id]
+    workers = max(workers, 1)
+    used_names: set = set()
+    pending: Dict[Any, tuple] = {}
+    record_iter = enumerate(records)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-render') as executor:
+        def submit_next() -> bool:
+            for index, record in record_iter:
+                try:
+                    form_data = record_to_form_data(form_def, record)
+                except Exception as e:
+                    # Ein fehlerhafter Datensatz bricht den Batch nicht ab
+                    failed: Future = Future()
+                    failed.set_exception(e)
+                    pending[failed] = (index, None)
+                    return True
+                filename_parts = engine._generate_filename_parts(form_id, form_def, form_data)
+                name = '_'.join(filename_parts)
+                # Gleiche Feldwerte in derselben Minute ergäben denselben Dateinamen
+                if name in used_names:
+                    filename_parts = filename_parts + [str(index + 1)]
+                    name = '_'.join(filename_parts)
+                used_names.add(name)
+                future = executor.submit(_render_with_retry, engine, form_def, form_data, config)
+                pending[future] = (index, filename_parts)
+                return True
+            return False
+
+        # Höchstens 2 × workers Dokumente gleichzeitig im Speicher halten
+        while len(pending) < workers * 2 and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, filename_parts = pending.pop(future)
+                yield _store_result(engine, index, filename_parts, future, config, zip_file)
+                submit_next()
+
+
+def _store_result(engine, index: int, filename_parts, future, config: Dict[str, Any], zip_file) -> Dict[str, Any]:
+    try:
+        pdf_bytes = future.result()
+        filename = f"{'_'.join(filename_parts)}.pdf"
+        if zip_file is not None:
+            zip_file.writestr(filename, pdf_bytes)
+            return {'index': index, 'filename': filename, 'stored_via': 'zip'}
+        result = engine._storage.store_pdf_bytes(pdf_bytes, f"pdfs/{filename}", filename_parts, config)
+        return {'index': index, **result}
+    except Exception as e:
+        logger.error(f"Batch-Datensatz {index + 1} fehlgeschlagen: {e}", exc_info=True)
+        return {'index': index, 'error': str(e)}
+
+
+def open_zip(target: IO[bytes]) -> zipfile.ZipFile:
+    """Öffnet ein ZIP-Archiv für Batch-PDFs (PDFs sind bereits komprimiert → ZIP_STORED)."""
+    return zipfile.ZipFile(target, mode='w', compression=zipfile.ZIP_STORED)
+
+
+def batch_workers(render_pool: Optional[RenderPool]) -> int:
+    """Parallelität für einen Batch: so viele Threads wie Render-Prozesse, ohne Pool nur einer."""
+    return render_pool.workers if render_pool is not None else 1
+
+
+def text_stream(data: bytes) -> io.StringIO:
+    """Dekodiert hochgeladene Batch-Daten (UTF-8, optional mit BOM aus Excel)."""
+    return io.StringIO(data.decode('utf-8-sig'), newline='')
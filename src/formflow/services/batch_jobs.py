@@ -0,0 +1,172 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional
+import zipfile
+
+from .batch import open_zip
+
+logger = logging.getLogger(__name__)
+
+# Liefert die Ergebnisse eines Batches; bekommt das ZIP-Archiv (oder None = ablegen wie /confirm)
+BatchRun = Callable[[Optional[zipfile.ZipFile]], Iterable[Dict[str, Any]]]
+
+
+class BatchJobs:
+    """Runs /api/batch jobs in background threads instead of inside the HTTP request.
+
+    A batch of a few hundred records takes longer than gunicorn's request timeout,
+    so the request only starts the job and answers 202.  The job state is a
+    ``status.json`` in ``directory/<job_id>/`` (and the ZIP next to it), so status
+    and download can be answered by any worker.  While a job runs, its worker holds
+    an ``flock`` on ``job.lock``; the kernel drops it when the worker dies (e.g. a
+    memory recycle), so such a job is reported as ``aborted`` even if its PID has
+    been reused.  Finished job directories are deleted by the janitor after
+    ``max_age_seconds``, running ones at the latest after ``max_runtime_seconds``.
+    """
+
+    RUNNING = 'running'
+    DONE = 'done'
+    ABORTED = 'aborted'
+
+    def __init__(self, directory: str, max_age_seconds: int = 3600, max_runtime_seconds: int = 86400) -> None:
+        # Absolut, da send_file() relative Pfade gegen das App-Verzeichnis auflöst
+        self.directory = os.path.abspath(directory)
+        self.max_age_seconds = max_age_seconds
+        self.max_runtime_seconds = max_runtime_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.directory, os.path.basename(job_id))
+
+    def _lock_path(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), 'job.lock')
+
+    def zip_path(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), 'result.zip')
+
+    def start(self, form_id: str, total: int, run: BatchRun, as_zip: bool = False) -> str:
+        """Startet einen Batch im Hintergrund und gibt die Job-ID zurück."""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id))
+        # Sperre vor dem ersten Status setzen, damit der Job nie als verwaist erscheint
+        lock_fd = os.open(self._lock_path(job_id), os.O_WRONLY | os.O_CREAT, 0o644)
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        status = {'job_id': job_id, 'form_id': form_id, 'status': self.RUNNING, 'zip': as_zip,
+                  'total': total, 'done': 0, 'failed': 0, 'errors': []}
+        self._write_status(job_id, status)
+        threading.Thread(target=self._run, args=(job_id, status, run, as_zip, lock_fd),
+                         name=f'batch-{job_id[:8]}', daemon=True).start()
+        return job_id
+
+    def _run(self, job_id: str, status: Dict[str, Any], run: BatchRun, as_zip: bool, lock_fd: int) -> None:
+        try:
+            self._execute(job_id, status, run, as_zip)
+        except OSError as e:
+            # Verzeichnis nach max_runtime vom Janitor gelöscht
+            logger.warning(f"Status von Batch {job_id} konnte nicht geschrieben werden: {e}")
+        finally:
+            os.close(lock_fd)  # gibt die Sperre frei: der Job läuft nicht mehr
+
+    def _execute(self, job_id: str, status: Dict[str, Any], run: BatchRun, as_zip: bool) -> None:
+        part_path = self.zip_path(job_id) + '.part'
+        try:
+            target = open(part_path, 'wb') if as_zip else None
+            archive = open_zip(target) if target is not None else None
+            try:
+                for result in run(archive):
+                    status['done'] += 1
+                    if 'error' in result:
+                        status['failed'] += 1
+                        status['errors'].append({'index': result['index'], 'error': result['error']})
+                    self._write_status(job_id, status)
+                if archive is not None and status['errors']:
+                    archive.writestr('fehler.txt', ''.join(
+                        f"Datensatz {e['index'] + 1}: {e['error']}\n" for e in status['errors']))
+            finally:
+                if archive is not None:
+                    archive.close()
+                    target.close()
+            if as_zip:
+                os.replace(part_path, self.zip_path(job_id))
+            status['status'] = self.DONE
+        except Exception as e:
+            logger.error(f"Batch {job_id} abgebrochen: {e}", exc_info=True)
+            status['status'] = self.ABORTED
+            status['message'] = str(e)
+        self._write_status(job_id, status)
+        logger.info(f"Batch {job_id} für {status['form_id']}: {status['done'] - status['failed']} erzeugt, "
+                    f"{status['failed']} fehlgeschlagen.")
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Liest den Status von *job_id*, oder None, wenn der Job unbekannt (oder abgelaufen) ist."""
+        try:
+            with open(os.path.join(self._job_dir(job_id), 'status.json'), encoding='utf-8') as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if status['status'] == self.RUNNING and not _lock_held(self._lock_path(job_id)):
+            # Der Worker wurde während des Batches beendet (Neustart, Absturz)
+            status['status'] = self.ABORTED
+            status['message'] = "Der Worker wurde während des Batches beendet."
+        return status
+
+    def cleanup(self, max_age_seconds: Optional[int] = None) -> None:
+        """Löscht beendete Jobs, deren letzte Statusänderung länger als *max_age_seconds* zurückliegt.
+
+        Laufende Jobs werden spätestens ``max_runtime_seconds`` nach ihrem Start gelöscht.
+        """
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        now = time.time()
+        try:
+            job_ids = os.listdir(self.directory)
+        except OSError:
+            return
+        for job_id in job_ids:
+            try:
+                age = now - os.path.getmtime(os.path.join(self._job_dir(job_id), 'status.json'))
+                runtime = now - os.path.getmtime(self._lock_path(job_id))
+            except OSError:
+                continue
+            status = self.status(job_id)
+            if status is None:
+                continue
+            if status['status'] == self.RUNNING:
+                if runtime > self.max_runtime_seconds:
+                    shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+                    logger.warning(f"Batch {job_id} läuft seit über {self.max_runtime_seconds}s und wurde gelöscht.")
+            elif age > max_age:
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+                logger.info(f"Batch {job_id} abgelaufen und gelöscht.")
+
+    def _write_status(self, job_id: str, status: Dict[str, Any]) -> None:
+        path = os.path.join(self._job_dir(job_id), 'status.json')
+        with open(path + '.part', 'w', encoding='utf-8') as f:
+            json.dump(status, f, ensure_ascii=False)
+        os.replace(path + '.part', path)
+
+
+def _lock_held(path: str) -> bool:
+    """True, solange ein Job-Thread die Sperrdatei hält (fällt mit dem Prozess weg, unabhängig von der PID)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+def create_batch_jobs(batch_config: Dict[str, Any]) -> BatchJobs:
+    """Erstellt die Batch-Jobs gemäß ``batch``-Konfiguration."""
+    return BatchJobs(batch_config.get('directory', 'batch_jobs'), batch_config.get('ttl', 3600),
+                     batch_config.get('max_runtime', 86400))
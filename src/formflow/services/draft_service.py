@@ -7,6 +7,8 @@ from typing import Dict, Any
 
 from werkzeug.datastructures import MultiDict
 
+from .metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 def collect_form_data(form_def: Dict[str, Any], request_form: MultiDict) -> Dict[str, Any]:
@@ -31,6 +33,7 @@ def save_draft(drafts_dir: str, form_id: str, form_data: dict) -> str:
     return update_draft(drafts_dir, draft_id, form_id, form_data)
 
 
+@metrics.timed('formflow_draft_io_seconds', operation='update')
 def update_draft(drafts_dir: str, draft_id: str, form_id: str, form_data: dict) -> str:
     """Aktualisiert einen bestehenden Entwurf. Gibt die draft_id zurück."""
     draft = {
@@ -45,6 +48,7 @@ def update_draft(drafts_dir: str, draft_id: str, form_id: str, form_data: dict)
     return draft_id
 
 
+@metrics.timed('formflow_draft_io_seconds', operation='load')
 def load_draft(drafts_dir: str, draft_id: str) -> dict:
     """Lädt einen Entwurf aus einer JSON-Datei."""
     path = os.path.join(drafts_dir, f"draft_{draft_id}.json")
@@ -52,6 +56,7 @@ def load_draft(drafts_dir: str, draft_id: str) -> dict:
         return json.load(f)
 
 
+@metrics.timed('formflow_draft_io_seconds', operation='list')
 def list_drafts(drafts_dir: str, forms: dict) -> list:
     """Liest alle Entwürfe aus dem drafts/-Verzeichnis und gibt sie als Liste zurück."""
     drafts = []
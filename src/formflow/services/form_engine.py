@@ -7,9 +7,21 @@ from typing import Any, Dict, Optional
 import yaml
 from flask import Flask, current_app
 
+from ..config import PdfOptions
+from .batch_jobs import BatchJobs, create_batch_jobs
+from .janitor import Janitor, create_janitor
+from .memory import create_memory_accounting
+from .metrics import metrics
+from .outbox import create_outbox
 from .pdf_generator import PdfGenerator
+from .preview_store import PreviewStore, TmpfsPreviewStore, create_preview_store
+from .render_cache import create_render_cache
+from .render_jobs import create_render_jobs
+from .render_pool import create_render_pool
+from .render_slots import Admission, create_render_slots
 from ..routes.main import register_routes
 from .storage import PdfStorage
+from .warmup import WarmUp
 
 # Logger konfigurieren
 logger = logging.getLogger(__name__)
@@ -24,16 +36,18 @@ class FormEngine:
             templates_dir=pdf_templates_dir
         ) if pdf_templates_dir is not None else PdfGenerator()
         self._storage = PdfStorage()
+        # Vorschau-PDFs liegen bis zur Bestätigung im Speicher statt als temp-Datei in pdfs/
+        self.preview_store = PreviewStore()
+        # Hintergrund-Jobs für asynchrone Vorschauen; wird in init_app() gemäß Konfiguration gesetzt.
+        self.render_jobs = None
+        # Warm-up nach dem Start; None = kein Warm-up, Worker gilt sofort als bereit.
+        self.warmup: Optional[WarmUp] = None
+        # Räumt abgelaufene Vorschauen und temp-PDFs im Hintergrund auf (ab init_app)
+        self.janitor: Optional[Janitor] = None
+        # Hintergrund-Jobs für /api/batch; wird in init_app() gesetzt.
+        self.batch_jobs: Optional[BatchJobs] = None
         self._load_forms()
 
-    @property
-    def _smb_session_registered(self) -> bool:
-        return self._storage._smb_session_registered
-
-    @_smb_session_registered.setter
-    def _smb_session_registered(self, value: bool) -> None:
-        self._storage._smb_session_registered = value
-
     @property
     def config(self) -> Dict[str, Any]:
         if self._config is not None:
@@ -46,14 +60,110 @@ class FormEngine:
 
     def init_app(self, app: Flask):
         self.app = app
+        app.extensions['formflow'] = self
+        config = self._config if self._config is not None else app.config.get("formflow", {})
+        render_config = config.get('render', {})
+        metrics_config = config.get('metrics', {})
+        metrics.configure(metrics_config.get('multiprocess_dir', ''), metrics_config.get('flush_interval', 1.0))
+        self.pdf_generator.render_cache = create_render_cache(render_config)
+        self.pdf_generator.render_slots = create_render_slots(render_config)
+        self.pdf_generator.memory = create_memory_accounting(config.get('memory', {}))
+        self.preview_store = create_preview_store(config.get('preview', {}))
+        self.batch_jobs = create_batch_jobs(config.get('batch', {}))
+        self._start_render_services(render_config)
+        self._start_outbox(config)
+        self._storage.configure_targets(config.get('storage', {}))
         # Make sure the pdfs directory exists
         os.makedirs('pdfs', exist_ok=True)
         # Make sure the drafts directory exists
         os.makedirs('drafts', exist_ok=True)
-        # Bereinige verwaiste temp-Dateien von vorherigen Läufen beim Start
-        self._cleanup_temp_files()
+        # Bereinige verwaiste temp-Dateien von vorherigen Läufen beim Start, danach der Janitor
+        self._cleanup_temp_files(config.get('janitor', {}).get('max_age', 3600))
+        self._start_janitor(config)
         self._register_routes()
 
+    def _start_render_services(self, render_config: Dict[str, Any]) -> None:
+        """Startet Render-Pool und Hintergrund-Jobs (pro Prozess, nicht über fork() teilbar)."""
+        # Optionalen Render-Pool starten, damit der erste Preview nicht den Warm-up bezahlt
+        self.pdf_generator.render_pool = create_render_pool(render_config)
+        if self.pdf_generator.render_pool is not None:
+            self.pdf_generator.render_pool.start()
+        self.render_jobs = create_render_jobs(render_config)
+
+    def _start_outbox(self, config: Dict[str, Any]) -> None:
+        """Startet den Outbox-Uploader (pro Prozess; der Thread überlebt fork() nicht)."""
+        self._storage.outbox = create_outbox(config, self._storage)
+        if self._storage.outbox is not None:
+            self._storage.outbox.start()
+
+    def _start_janitor(self, config: Dict[str, Any]) -> None:
+        """Startet den Janitor-Thread (pro Prozess; der Thread überlebt fork() nicht)."""
+        tasks = [self._cleanup_render_cache, self._cleanup_batch_jobs]
+        if isinstance(self.preview_store, TmpfsPreviewStore):
+            # Eigene Vorschau-Dateien verfallen über den Heap des Janitors; das Verzeichnis wird nur
+            # beim vollständigen Scan durchsucht (Vorschauen anderer oder abgestürzter Worker)
+            scan = self._cleanup_temp_files
+        else:
+            # preview_store wird nach fork() ersetzt, daher erst beim Aufruf auflösen;
+            # Vorschauen verfallen nach ihrer eigenen TTL (preview.ttl)
+            tasks.append(lambda _max_age: self.preview_store.cleanup())
+            scan = self._storage.cleanup_temp_files
+        self.janitor = create_janitor(config.get('janitor', {}), scan=scan, tasks=tasks)
+        if isinstance(self.preview_store, TmpfsPreviewStore):
+            self.preview_store.janitor = self.janitor
+        self.janitor.start()
+
+    def _cleanup_render_cache(self, _max_age: int) -> None:
+        # Gecachte PDFs verfallen nach ihrer eigenen TTL (render.cache_ttl)
+        if self.pdf_generator.render_cache is not None:
+            self.pdf_generator.render_cache.cleanup()
+
+    def _cleanup_batch_jobs(self, _max_age: int) -> None:
+        # Abgeschlossene Batches verfallen nach ihrer eigenen TTL (batch.ttl)
+        if self.batch_jobs is not None:
+            self.batch_jobs.cleanup()
+
+    def prepare_fork(self) -> None:
+        """Im Gunicorn-Master vor dem Forken der Worker aufrufen (preload_app).
+
+        Wartet den Warm-up ab, damit WeasyPrint, fontconfig und kompilierte Templates
+        im Master geladen sind und von allen Workern per Copy-on-Write geteilt werden.
+        Prozesse und Threads überleben fork() nicht und werden daher hier beendet.
+        """
+        if self.warmup is not None:
+            self.warmup.wait()
+        if self.pdf_generator.render_pool is not None:
+            self.pdf_generator.render_pool.close()
+            self.pdf_generator.render_pool = None
+        if self.render_jobs is not None:
+            self.render_jobs.shutdown()
+            self.render_jobs = None
+        if self._storage.outbox is not None:
+            self._storage.outbox.stop()
+        self._storage.close_targets()
+        if self.janitor is not None:
+            self.janitor.stop()
+
+    def post_fork(self) -> None:
+        """Im frisch geforkten Worker aufrufen: nur nicht teilbaren Zustand neu aufbauen."""
+        config = self._config if self._config is not None else self.app.config.get("formflow", {})
+        # SMB-Verbindungen des Masters gehören zu dessen Sockets
+        self._storage.reset_smb()
+        # Speicher-Vorschauen des Masters gehören keinem Worker; ein tmpfs-Verzeichnis bleibt geteilt
+        self.preview_store = create_preview_store(config.get('preview', {}))
+        self._start_render_services(config.get('render', {}))
+        self._start_outbox(config)
+        self._storage.configure_targets(config.get('storage', {}))
+        self._start_janitor(config)
+
+    def start_warm_up(self) -> None:
+        """Startet den Hintergrund-Warm-up, sofern ``render.warm_up`` aktiv ist (nach init_app aufrufen)."""
+        config = self._config if self._config is not None else self.app.config.get("formflow", {})
+        if not config.get('render', {}).get('warm_up', True):
+            return
+        self.warmup = WarmUp()
+        self.warmup.start(self.app, self.pdf_generator, config)
+
     def _load_forms(self) -> None:
         """Lädt alle YAML-Formulardefinitionen aus dem forms-Verzeichnis"""
         if not os.path.exists(self.forms_dir):
@@ -70,6 +180,12 @@ class FormEngine:
                     with open(form_path, 'r') as file:
                         form_def = yaml.safe_load(file)
                         form_id = form_def.get('form_id', os.path.splitext(filename)[0])
+                        if form_def.get('pdf_options'):
+                            # Ungültige Ausgabeoptionen (z. B. Tippfehler im pdf_variant) früh ablehnen,
+                            # statt bei jedem Rendering in WeasyPrint zu scheitern
+                            options = PdfOptions.model_validate(form_def['pdf_options'])
+                            form_def['pdf_options'] = {**form_def['pdf_options'],
+                                                       **options.model_dump(exclude_unset=True)}
                         self.forms[form_id] = form_def
                         logger.info(f"Formular geladen: {form_id} aus {filename}")
                 except Exception as e:
@@ -83,9 +199,16 @@ class FormEngine:
 
     # --- Hilfsfunktionen --------------------------------------------------
     def _cleanup_temp_files(self, max_age_seconds: int = 3600) -> None:
-        """Delegates to PdfStorage.cleanup_temp_files()."""
+        """Drops expired previews and delegates to PdfStorage.cleanup_temp_files()."""
+        self.preview_store.cleanup()
         self._storage.cleanup_temp_files(max_age_seconds)
 
+    def _render_preview(self, file_id: str, form_def: Dict[str, Any], form_data: Dict[str, Any], config: Dict[str, Any],
+                        admission: Optional[Admission] = None) -> None:
+        """Rendert das Vorschau-PDF in den Speicher (direkt oder als Hintergrund-Job ohne App-Kontext)."""
+        pdf_bytes = self.pdf_generator.render(form_def, form_data, config, admission, document_id=file_id)
+        self.preview_store.put(file_id, pdf_bytes)
+
     def _sanitize_for_filename(self, value: str) -> str:
         """Bereinigt Text, sodass er in einem Dateinamen verwendet werden kann."""
         clean = value.replace(' ', '_')
@@ -103,6 +226,10 @@ class FormEngine:
                         parts.append(cleaned)
         return parts
 
-    def _store_pdf(self, temp_path: str, local_final: str, filename_parts: list[str]) -> dict:
-        """Delegates to PdfStorage.store_pdf()."""
-        return self._storage.store_pdf(temp_path, local_final, filename_parts, self.config)
+    def _preview_mode(self, form_def: Dict[str, Any]) -> str:
+        """'html' (Schnellvorschau) oder 'pdf'; das Formular-YAML hat Vorrang vor der globalen Einstellung."""
+        return form_def.get('preview_mode') or self.config.get('render', {}).get('preview_mode', 'pdf')
+
+    def _store_pdf_bytes(self, pdf_bytes: bytes, local_final: str, filename_parts: list[str]) -> dict:
+        """Delegates to PdfStorage.store_pdf_bytes()."""
+        return self._storage.store_pdf_bytes(pdf_bytes, local_final, filename_parts, self.config)
@@ -0,0 +1,134 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Janitor:
+    """Background thread that removes expired temporary files and previews.
+
+    Temporary files are registered with ``track()`` when they are created and kept
+    in an expiry heap, so a sweep only looks at entries that are actually due
+    instead of globbing a directory (e.g. the preview files of
+    ``TmpfsPreviewStore``, registered on every ``put()``).  Every
+    ``interval`` seconds the thread sweeps the heap and runs the cheap in-memory
+    ``tasks`` (e.g. ``PreviewStore.cleanup``).  The full directory scan ``scan``
+    (``PdfStorage.cleanup_temp_files``) only catches files this process never saw –
+    left behind by crashed workers or older versions – and therefore runs every
+    ``scan_interval`` seconds only.
+    """
+
+    def __init__(
+        self,
+        max_age_seconds: int = 3600,
+        interval: float = 60.0,
+        scan_interval: float = 3600.0,
+        scan: Optional[Callable[[int], None]] = None,
+        tasks: Optional[List[Callable[[int], None]]] = None,
+    ) -> None:
+        self.max_age_seconds = max_age_seconds
+        self.interval = interval
+        self.scan_interval = scan_interval
+        self.scan = scan
+        self.tasks = list(tasks or [])
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._counter = itertools.count()  # Reihenfolge bei gleichem Ablaufzeitpunkt
+        self._lock = threading.Lock()
+        self._next_scan = time.monotonic() + scan_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, path: str, max_age_seconds: Optional[int] = None) -> None:
+        """Merkt *path* zum Löschen vor, sobald die Datei älter als *max_age_seconds* ist."""
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        self._push(time.time() + max_age, path, max_age)
+
+    def _push(self, deadline: float, path: str, max_age: int) -> None:
+        with self._lock:
+            heapq.heappush(self._heap, (deadline, next(self._counter), path, max_age))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def sweep(self) -> int:
+        """Löscht alle fälligen vorgemerkten Dateien und gibt deren Anzahl zurück."""
+        now = time.time()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _deadline, _count, path, max_age = heapq.heappop(self._heap)
+                due.append((path, max_age))
+        removed = 0
+        for path, max_age in due:
+            try:
+                mtime = os.path.getmtime(path)
+                if now - mtime <= max_age:
+                    # Inzwischen neu geschrieben: erst nach Ablauf der neuen Frist löschen
+                    self._push(mtime + max_age + 1, path, max_age)
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # bereits gespeichert oder verworfen
+            except OSError as e:
+                logger.warning(f"Konnte temp-Datei nicht löschen {path}: {e}")
+                continue
+            logger.info(f"Verwaiste temp-Datei gelöscht: {path}")
+            removed += 1
+        if removed:
+            metrics.inc('formflow_temp_files_cleaned_total', removed)
+        return removed
+
+    def run_once(self) -> None:
+        """Ein Durchlauf: Heap abarbeiten, Aufgaben ausführen und ggf. das Verzeichnis scannen."""
+        self.sweep()
+        for task in self.tasks:
+            task(self.max_age_seconds)
+        if self.scan is not None and time.monotonic() >= self._next_scan:
+            self._next_scan = time.monotonic() + self.scan_interval
+            self.scan(self.max_age_seconds)
+
+    # --- Hintergrund-Thread -------------------------------------------------
+    def start(self) -> None:
+        """Startet den Janitor-Thread (idempotent)."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Beendet den Janitor-Thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Janitor: unerwarteter Fehler beim Aufräumen.")
+
+
+def create_janitor(
+    janitor_config: dict,
+    scan: Optional[Callable[[int], None]] = None,
+    tasks: Optional[List[Callable[[int], None]]] = None,
+) -> Janitor:
+    """Erstellt den Janitor gemäß ``janitor``-Konfiguration."""
+    return Janitor(
+        max_age_seconds=janitor_config.get('max_age', 3600),
+        interval=janitor_config.get('interval', 60.0),
+        scan_interval=janitor_config.get('scan_interval', 3600.0),
+        scan=scan,
+        tasks=tasks,
+    )
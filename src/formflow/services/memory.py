@@ -0,0 +1,99 @@
+import heapq
+import logging
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def current_rss() -> Optional[int]:
+    """Resident Set Size dieses Prozesses in Bytes (Linux), sonst None."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class MemoryAccounting:
+    """Measures RSS (and optionally tracemalloc) growth around each PDF render.
+
+    The heaviest renders of this worker are kept together with their form_id and
+    logged when they enter the top list.  ``over_limit()`` tells the gunicorn
+    ``post_request`` hook whether the worker has crossed ``max_rss_mb`` and should
+    be replaced gracefully.  Renders running concurrently in background threads
+    share one process, so their deltas can overlap.
+    """
+
+    def __init__(self, max_rss_mb: int = 0, trace_allocations: bool = False, keep_heaviest: int = 5) -> None:
+        self.max_rss = max_rss_mb * _MB
+        self.trace_allocations = trace_allocations
+        self.keep_heaviest = keep_heaviest
+        # Min-Heap aus (RSS-Zuwachs, form_id, tracemalloc-Peak) – die schwersten Renderings
+        self._heaviest: List[Tuple[int, str, Optional[int]]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, form_id: str) -> Iterator[None]:
+        """Misst den Speicherzuwachs eines Render-Vorgangs."""
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        rss_before = current_rss()
+        try:
+            yield
+        finally:
+            rss_after = current_rss()
+            peak = None
+            if self.trace_allocations and tracemalloc.is_tracing():
+                peak = max(0, tracemalloc.get_traced_memory()[1] - traced_before)
+            if rss_before is not None and rss_after is not None:
+                metrics.set_gauge('formflow_worker_rss_bytes', rss_after)
+                self._record(max(0, rss_after - rss_before), form_id, peak)
+
+    def _record(self, growth: int, form_id: str, peak: Optional[int]) -> None:
+        metrics.observe('formflow_pdf_render_rss_growth_bytes', growth)
+        if self.keep_heaviest <= 0:
+            return
+        entry = (growth, form_id, peak)
+        with self._lock:
+            if len(self._heaviest) < self.keep_heaviest:
+                heapq.heappush(self._heaviest, entry)
+            elif growth > self._heaviest[0][0]:
+                heapq.heapreplace(self._heaviest, entry)
+            else:
+                return
+        peak_text = f", tracemalloc-Peak {peak / _MB:.1f} MB" if peak is not None else ""
+        logger.info(f"Speicherintensives Rendering: Formular {form_id} +{growth / _MB:.1f} MB RSS{peak_text}")
+
+    def heaviest(self) -> List[Dict[str, Any]]:
+        """Die schwersten Renderings dieses Workers, absteigend nach RSS-Zuwachs."""
+        with self._lock:
+            entries = sorted(self._heaviest, reverse=True)
+        return [{'form_id': form_id, 'rss_growth': growth, 'traced_peak': peak} for growth, form_id, peak in entries]
+
+    def over_limit(self) -> bool:
+        """True, wenn die Speichergrenze gesetzt und überschritten ist."""
+        if not self.max_rss:
+            return False
+        rss = current_rss()
+        return rss is not None and rss > self.max_rss
+
+
+def create_memory_accounting(memory_config: dict) -> MemoryAccounting:
+    """Erstellt die Speicherüberwachung gemäß ``memory``-Konfiguration."""
+    return MemoryAccounting(
+        max_rss_mb=memory_config.get('max_rss_mb', 0),
+        trace_allocations=memory_config.get('trace_allocations', False),
+        keep_heaviest=memory_config.get('log_heaviest', 5),
+    )
@@ -0,0 +1,391 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_SIZE_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000)
+_MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+# Name -> (Typ, Hilfetext, Buckets). Nur hier deklarierte Metriken werden ausgegeben.
+METRICS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    'formflow_pdf_render_seconds': (
+        'histogram', 'Dauer der PDF-Erzeugung je Phase (jinja, layout, write).', _TIME_BUCKETS),
+    'formflow_pdf_size_bytes': ('histogram', 'Größe der erzeugten PDFs in Bytes.', _SIZE_BUCKETS),
+    'formflow_pdf_renders_in_flight': ('gauge', 'Aktuell laufende PDF-Erzeugungen.', ()),
+    'formflow_pdf_render_rss_growth_bytes': (
+        'histogram', 'RSS-Zuwachs des Workers während einer PDF-Erzeugung.', _MEMORY_BUCKETS),
+    'formflow_worker_rss_bytes': ('gauge', 'RSS der Worker nach der letzten PDF-Erzeugung (Summe).', ()),
+    'formflow_render_admission_wait_seconds': (
+        'histogram', 'Wartezeit auf einen freien Render-Slot.', _TIME_BUCKETS),
+    'formflow_render_rejected_total': (
+        'counter', 'Abgelehnte Renderings (queue_full, timeout), beantwortet mit HTTP 503.', ()),
+    'formflow_storage_seconds': (
+        'histogram', 'Dauer der PDF-Ablage je Backend (smb, local, fallback, outbox).', _TIME_BUCKETS),
+    'formflow_outbox_depth': ('gauge', 'PDFs in der Outbox, die noch auf den SMB-Upload warten.', ()),
+    'formflow_outbox_oldest_seconds': ('gauge', 'Alter des ältesten wartenden PDFs in der Outbox.', ()),
+    'formflow_outbox_uploads_total': ('counter', 'Upload-Versuche aus der Outbox je Ergebnis (ok, error).', ()),
+    'formflow_outbox_quarantined_total': (
+        'counter', 'PDFs, die nach wiederholten Fehlschlägen nach failed/ verschoben wurden.', ()),
+    'formflow_storage_target_seconds': (
+        'histogram', 'Dauer des Schreibens je zusätzlichem Speicherziel und Ergebnis (ok, error).', _TIME_BUCKETS),
+    'formflow_preview_store_bytes': ('gauge', 'Bytes der Vorschau-PDFs im Speicher (Summe der Worker).', ()),
+    'formflow_preview_evictions_total': (
+        'counter', 'Entfernte Vorschauen je Grund (budget: Byte-Budget, ttl: abgelaufen).', ()),
+    'formflow_smb_fallbacks_total': ('counter', 'Lokale Ablage nach fehlgeschlagenem SMB-Upload.', ()),
+    'formflow_temp_files_cleaned_total': ('counter', 'Gelöschte verwaiste temp-PDFs.', ()),
+    'formflow_draft_io_seconds': (
+        'histogram', 'Dauer der Entwurfs-Dateizugriffe je Operation (list, load, update).', _TIME_BUCKETS),
+}
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+# Summe der Zähler und Histogramme beendeter Prozesse; Sperrdatei für deren Übernahme
+AGGREGATE_FILE = 'metrics_aggregate.json'
+MERGE_LOCK_FILE = 'metrics_merge.lock'
+
+
+def _label_key(labels: Dict[str, Any]) -> _Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: _Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _accumulate(snapshot: Dict[str, list], counters: Dict[Tuple[str, _Labels], float],
+                gauges: Optional[Dict[Tuple[str, _Labels], float]], histograms: Dict[Tuple[str, _Labels], list]) -> None:
+    """Addiert *snapshot* auf; Gauges nur, wenn *gauges* übergeben wird (lebender Prozess)."""
+    for name, labels, value in snapshot['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    if gauges is not None:
+        for name, labels, value in snapshot['gauges']:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+    for name, labels, bucket_counts, total, count in snapshot['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        entry = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0, 0])
+        if len(entry[0]) != len(bucket_counts):
+            continue  # Buckets geändert (Deployment mit alten Snapshot-Dateien)
+        entry[0] = [a + b for a, b in zip(entry[0], bucket_counts)]
+        entry[1] += total
+        entry[2] += count
+
+
+def _as_snapshot(counters: Dict[Tuple[str, _Labels], float], gauges: Dict[Tuple[str, _Labels], float],
+                 histograms: Dict[Tuple[str, _Labels], list]) -> Dict[str, list]:
+    return {
+        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+        'gauges': [[name, labels, value] for (name, labels), value in gauges.items()],
+        'histograms': [
+            [name, labels, list(entry[0]), entry[1], entry[2]] for (name, labels), entry in histograms.items()
+        ],
+    }
+
+
+def _read_json(path: str) -> Optional[Dict[str, list]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Metrik-Datei {path} wird übersprungen: {e}")
+        return None
+
+
+def _write_json(path: str, data: Dict[str, list]) -> None:
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(path + '.part', path)
+
+
+def _lock_path(snapshot_path: str) -> str:
+    return snapshot_path[:-len('.json')] + '.lock'
+
+
+def _process_alive(snapshot_path: str) -> bool:
+    """Der schreibende Prozess hält die Sperrdatei seines Snapshots bis zu seinem Ende (auch bei kill -9)."""
+    try:
+        fd = os.open(_lock_path(snapshot_path), os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+class Metrics:
+    """Process-local metric registry rendered in the Prometheus text exposition format.
+
+    Without ``multiprocess_dir`` only this process is reported.  With it, every
+    process writes a snapshot ``metrics_<pid>_<token>.json`` at most every
+    ``flush_interval`` seconds after an update and when it exits; updates only
+    touch memory.  The random token keeps a reused PID from overwriting the file
+    of an earlier process, and a ``.lock`` file held for the process's lifetime
+    tells whether the writer is still alive.  ``render()`` adds up the snapshots of
+    all processes (gunicorn workers): counters and histograms of exited workers
+    are merged into ``metrics_aggregate.json`` and their files removed, so totals
+    never go backwards; gauges only count processes that are still alive.  After
+    ``fork()`` a process starts from zero, so values of the gunicorn master are
+    not counted twice.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._dir: Optional[str] = None
+        self._flush_interval = 1.0
+        self._lock_fd: Optional[int] = None
+        self._reset()
+        # Der Flush-Timer kann die Sperre beim fork() halten; das Kind beginnt mit frischem Zustand
+        os.register_at_fork(before=lambda: self._lock.acquire(), after_in_parent=lambda: self._lock.release(),
+                            after_in_child=self._after_fork)
+        atexit.register(self.flush)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._token = uuid.uuid4().hex[:8]
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # geerbte Sperre bleibt beim Elternprozess
+            self._lock_fd = None
+        self._counters: Dict[Tuple[str, _Labels], float] = {}
+        self._gauges: Dict[Tuple[str, _Labels], float] = {}
+        # (Name, Labels) -> [Anzahl je Bucket (nicht kumuliert, letzter = +Inf), Summe, Anzahl]
+        self._histograms: Dict[Tuple[str, _Labels], list] = {}
+
+    def configure(self, multiprocess_dir: str = '', flush_interval: float = 1.0) -> None:
+        """Aktiviert die prozessübergreifende Aggregation über *multiprocess_dir* ('' = aus)."""
+        with self._lock:
+            if self._lock_fd is not None and (multiprocess_dir or None) != self._dir:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+            self._dir = multiprocess_dir or None
+            self._flush_interval = flush_interval
+            if self._dir:
+                os.makedirs(self._dir, exist_ok=True)
+
+    def flush(self) -> None:
+        """Schreibt den Snapshot dieses Prozesses, falls sich seit dem letzten Schreiben etwas geändert hat."""
+        with self._lock:
+            self._check_pid()
+            self._timer = None
+            if self._dir and self._dirty:
+                self._write_snapshot_locked()
+
+    # --- Erfassen -----------------------------------------------------------
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Erhöht einen Zähler."""
+        with self._lock:
+            self._check_pid()
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._changed_locked()
+
+    def add_gauge(self, name: str, delta: float, **labels: Any) -> None:
+        """Verändert einen Gauge um *delta*."""
+        with self._lock:
+            self._check_pid()
+            key = (name, _label_key(labels))
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+            self._changed_locked()
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        """Setzt einen Gauge auf *value*."""
+        with self._lock:
+            self._check_pid()
+            self._gauges[(name, _label_key(labels))] = value
+            self._changed_locked()
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Trägt einen Messwert in ein Histogramm ein."""
+        buckets = METRICS[name][2]
+        with self._lock:
+            self._check_pid()
+            key = (name, _label_key(labels))
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+            self._changed_locked()
+
+    @contextmanager
+    def time(self, name: str, **labels: Any) -> Iterator[Dict[str, Any]]:
+        """Misst die Dauer des Blocks; Labels können im Block über das gelieferte Dict ergänzt werden."""
+        labels = dict(labels)
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels: Any) -> Callable:
+        """Decorator-Variante von time()."""
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.time(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def in_flight(self, name: str, **labels: Any) -> Iterator[None]:
+        """Zählt einen Gauge für die Dauer des Blocks hoch."""
+        self.add_gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add_gauge(name, -1, **labels)
+
+    # --- Ausgabe ------------------------------------------------------------
+    def render(self) -> str:
+        """Liefert alle Metriken (ggf. über alle Prozesse aggregiert) im Text-Format."""
+        with self._lock:
+            self._check_pid()
+            own = self._snapshot()
+            own_path = self._snapshot_path() if self._dir else None
+        snapshots = [(True, own)]
+        if own_path is not None:
+            snapshots += self._collect_snapshots(own_path)
+
+        counters: Dict[Tuple[str, _Labels], float] = {}
+        gauges: Dict[Tuple[str, _Labels], float] = {}
+        histograms: Dict[Tuple[str, _Labels], list] = {}
+        for alive, snapshot in snapshots:
+            _accumulate(snapshot, counters, gauges if alive else None, histograms)
+
+        lines: List[str] = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            values = counters if kind == 'counter' else gauges
+            if kind != 'histogram':
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            for (metric, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(list(buckets) + ['+Inf'], bucket_counts):
+                    cumulative += bucket_count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels, ("le", le))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    # --- Intern -------------------------------------------------------------
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _snapshot(self) -> Dict[str, list]:
+        return _as_snapshot(self._counters, self._gauges, self._histograms)
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(self._dir, f'metrics_{self._pid}_{self._token}.json')
+
+    def _changed_locked(self) -> None:
+        """Merkt die Änderung vor; geschrieben wird gebündelt nach ``flush_interval`` Sekunden."""
+        self._dirty = True
+        if not self._dir or self._timer is not None:
+            return
+        self._timer = threading.Timer(self._flush_interval, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _write_snapshot_locked(self) -> None:
+        path = self._snapshot_path()
+        try:
+            if self._lock_fd is None:
+                # Vor dem ersten Snapshot sperren, damit andere Prozesse ihn nie für verwaist halten
+                self._lock_fd = os.open(_lock_path(path), os.O_WRONLY | os.O_CREAT, 0o644)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            _write_json(path, self._snapshot())
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Metriken konnten nicht nach {path} geschrieben werden: {e}")
+
+    def _collect_snapshots(self, own_path: str) -> List[Tuple[bool, Dict[str, list]]]:
+        """(lebt, Snapshot) der anderen Prozesse und das Aggregat; beendete Prozesse wandern ins Aggregat."""
+        aggregate_path = os.path.join(self._dir, AGGREGATE_FILE)
+        snapshots: List[Tuple[bool, Dict[str, list]]] = []
+        with open(os.path.join(self._dir, MERGE_LOCK_FILE), 'a') as lock_file:
+            # Nur ein Prozess übernimmt beendete Snapshots, sonst würden sie doppelt gezählt
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            aggregate = _read_json(aggregate_path) or _as_snapshot({}, {}, {})
+            exited = []
+            for path in glob.glob(os.path.join(self._dir, 'metrics_*_*.json')):
+                if path == own_path:
+                    continue
+                alive = _process_alive(path)
+                snapshot = _read_json(path)
+                if snapshot is None:
+                    continue
+                if alive:
+                    snapshots.append((True, snapshot))
+                else:
+                    exited.append((path, snapshot))
+            if exited:
+                counters: Dict[Tuple[str, _Labels], float] = {}
+                histograms: Dict[Tuple[str, _Labels], list] = {}
+                for snapshot in [aggregate] + [snapshot for _path, snapshot in exited]:
+                    _accumulate(snapshot, counters, None, histograms)
+                merged = _as_snapshot(counters, {}, histograms)
+                try:
+                    _write_json(aggregate_path, merged)
+                except OSError as e:
+                    logger.warning(f"Metrik-Aggregat {aggregate_path} konnte nicht geschrieben werden: {e}")
+                    snapshots += [(False, snapshot) for _path, snapshot in exited]
+                else:
+                    aggregate = merged
+                    for path, _snapshot in exited:
+                        for stale in (path, _lock_path(path)):
+                            try:
+                                os.remove(stale)
+                            except FileNotFoundError:
+                                pass
+                    logger.info(f"Metriken: {len(exited)} Snapshot(s) beendeter Prozesse ins Aggregat übernommen.")
+        snapshots.append((False, aggregate))
+        return snapshots
+
+
+# Prozessweite Registry (Web-Worker bzw. CLI-Prozess)
+metrics = Metrics()
@@ -0,0 +1,329 @@
+import errno
+import fcntl
+import glob
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from .metrics import metrics
+from .storage import FALLBACK_MARKER_DIR, PdfStorage, fallback_marker
+
+logger = logging.getLogger(__name__)
+
+
+def _fsync_dir(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Outbox:
+    """Durable local spool for PDFs that still have to be uploaded to the SMB share.
+
+    ``enqueue()`` writes the PDF with fsync and an atomic rename into ``directory``
+    and returns at once; a background thread drains the spool in batches through
+    ``PdfStorage.upload_file()`` (one SMB session for all files) and backs off
+    exponentially while the share is unreachable.  A file the share rejects (e.g.
+    name or permissions) only backs off itself; after ``max_attempts`` failed
+    uploads it is moved to ``directory/failed/`` so it cannot hold up the queue.
+    Local fallbacks in
+    ``fallback_dir`` are picked up as well, but only those flagged by a marker in
+    ``fallback_dir/fallback/`` (written by ``PdfStorage`` when an upload fails);
+    with ``legacy_fallbacks`` every other PDF there is treated as a fallback too,
+    for fallbacks of versions without markers.  Only one process drains at a time: the
+    thread first takes an exclusive ``flock`` on ``.drain.lock`` and keeps it until
+    ``stop()``; the other gunicorn workers retry in every interval, so a new drainer
+    takes over when that worker exits.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        storage: PdfStorage,
+        config: Dict[str, Any],
+        fallback_dir: Optional[str] = 'pdfs',
+        legacy_fallbacks: bool = False,
+        batch_size: int = 10,
+        poll_interval: float = 1.0,
+        backoff_initial: float = 5.0,
+        backoff_max: float = 300.0,
+        max_attempts: int = 5,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.storage = storage
+        self.config = config
+        self.fallback_dir = fallback_dir
+        self.legacy_fallbacks = legacy_fallbacks
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self.failed_dir = os.path.join(directory, 'failed')
+        self._failures = 0
+        self._next_attempt = 0.0
+        # Pfad -> (Fehlversuche, frühester nächster Versuch) für Dateien, die der Share ablehnt
+        self._file_failures: Dict[str, Tuple[int, float]] = {}
+        self._lock_file: Optional[IO] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Spool --------------------------------------------------------------
+    def enqueue(self, filename: str, data: bytes) -> str:
+        """Legt *data* dauerhaft als *filename* in den Spool und gibt den Dateinamen zurück.
+
+        Ein gleichnamiger, noch nicht hochgeladener Eintrag wird ersetzt (wie beim
+        Überschreiben auf dem Share).
+        """
+        filename = os.path.basename(filename)
+        path = os.path.join(self.directory, filename)
+        part_path = os.path.join(self.directory, f".{filename}.{uuid.uuid4().hex}.part")
+        try:
+            with open(part_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(part_path, path)
+        except BaseException:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
+        _fsync_dir(self.directory)
+        logger.info(f"PDF in Outbox abgelegt: {filename}")
+        self._wake.set()
+        return filename
+
+    def pending(self) -> List[str]:
+        """Pfade aller noch hochzuladenden PDFs (Spool und markierte lokale Fallbacks), älteste zuerst."""
+        paths = glob.glob(os.path.join(self.directory, '*.pdf'))
+        if self.fallback_dir:
+            paths += self._fallbacks()
+        entries = []
+        for path in paths:
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue  # zwischenzeitlich hochgeladen
+        return [path for _mtime, path in sorted(entries)]
+
+    def _fallbacks(self) -> List[str]:
+        paths = []
+        for marker in glob.glob(os.path.join(self.fallback_dir, FALLBACK_MARKER_DIR, '*.pdf')):
+            path = os.path.join(self.fallback_dir, os.path.basename(marker))
+            if os.path.exists(path):
+                paths.append(path)
+            else:
+                _remove(marker)  # PDF wurde inzwischen manuell entfernt
+        if self.legacy_fallbacks:
+            marked = set(paths)
+            paths += [path for path in glob.glob(os.path.join(self.fallback_dir, '*.pdf'))
+                      if path not in marked and not os.path.basename(path).startswith('temp_')]
+        return paths
+
+    def drain_once(self) -> int:
+        """Lädt bis zu ``batch_size`` fällige PDFs hoch und gibt die Zahl der erfolgreichen Uploads zurück.
+
+        Lehnt der Share eine Datei ab, wird nur diese zurückgestellt und mit der
+        nächsten weitergemacht.  Bei einem Verbindungsfehler wird abgebrochen und die
+        Exception weitergereicht; bereits hochgeladene Dateien sind dann schon aus dem
+        Spool entfernt.
+        """
+        uploaded = 0
+        for path in self._due(self.pending())[:self.batch_size]:
+            try:
+                local_file = open(path, 'rb')
+            except FileNotFoundError:
+                continue  # inzwischen ersetzt oder entfernt
+            try:
+                with local_file:
+                    self.storage.upload_file(local_file, os.path.basename(path), self.config)
+                    inode = os.fstat(local_file.fileno()).st_ino
+            except Exception as e:
+                metrics.inc('formflow_outbox_uploads_total', result='error')
+                if _is_connection_error(e):
+                    raise
+                self._file_failed(path, e)
+                continue
+            self._file_failures.pop(path, None)
+            if self._remove_uploaded(path, inode) and self._is_fallback(path):
+                _remove(fallback_marker(path))
+            metrics.inc('formflow_outbox_uploads_total', result='ok')
+            uploaded += 1
+        return uploaded
+
+    def _due(self, pending: List[str]) -> List[str]:
+        """*pending* ohne Dateien, die nach einem eigenen Fehlschlag noch zurückgestellt sind."""
+        now = time.monotonic()
+        return [path for path in pending if self._file_failures.get(path, (0, 0.0))[1] <= now]
+
+    def _file_failed(self, path: str, error: Exception) -> None:
+        attempts = self._file_failures.get(path, (0, 0.0))[0] + 1
+        if attempts >= self.max_attempts:
+            self._file_failures.pop(path, None)
+            self._quarantine(path, error)
+            return
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** (attempts - 1))
+        self._file_failures[path] = (attempts, time.monotonic() + delay)
+        logger.warning(f"Outbox: {os.path.basename(path)} nicht hochgeladen ({error}), "
+                       f"Versuch {attempts}/{self.max_attempts}, nächster in {delay:.0f}s.")
+
+    def _quarantine(self, path: str, error: Exception) -> None:
+        """Verschiebt eine dauerhaft abgelehnte Datei nach ``failed/``, damit sie die Outbox nicht blockiert."""
+        os.makedirs(self.failed_dir, exist_ok=True)
+        target = os.path.join(self.failed_dir, os.path.basename(path))
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(target)
+            target = f"{stem}_{uuid.uuid4().hex[:8]}{ext}"
+        try:
+            shutil.move(path, target)
+        except FileNotFoundError:
+            return  # inzwischen ersetzt oder entfernt
+        if self._is_fallback(path):
+            _remove(fallback_marker(path))
+        metrics.inc('formflow_outbox_quarantined_total')
+        logger.error(f"Outbox: {os.path.basename(path)} nach {self.max_attempts} Versuchen nicht hochgeladen "
+                     f"({error}), verschoben nach {target}.")
+
+    @staticmethod
+    def _remove_uploaded(path: str, inode: int) -> bool:
+        # Wurde der Eintrag während des Uploads durch eine neuere Fassung ersetzt, bleibt diese liegen
+        try:
+            if os.stat(path).st_ino != inode:
+                return False
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _is_fallback(self, path: str) -> bool:
+        return bool(self.fallback_dir) and os.path.dirname(path) == os.path.normpath(self.fallback_dir)
+
+    # --- Hintergrund-Thread -------------------------------------------------
+    def start(self) -> None:
+        """Startet den Uploader-Thread (idempotent)."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-uploader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Beendet den Uploader-Thread und gibt die Drainer-Rolle ab."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # gibt den flock frei
+            self._lock_file = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set() or not self._is_drainer():
+                continue
+            try:
+                self._tick()
+            except Exception:
+                logger.exception("Outbox: unerwarteter Fehler im Uploader.")
+
+    def _tick(self) -> None:
+        pending = self.pending()
+        self._report(pending)
+        # Zustand entfernter oder ersetzter Dateien vergessen
+        self._file_failures = {path: state for path, state in self._file_failures.items() if path in pending}
+        if not pending or time.monotonic() < self._next_attempt:
+            return
+        try:
+            uploaded = self.drain_once()
+        except Exception as e:
+            self._failures += 1
+            delay = min(self.backoff_max, self.backoff_initial * 2 ** (self._failures - 1))
+            self._next_attempt = time.monotonic() + delay
+            logger.warning(f"Outbox: SMB-Upload fehlgeschlagen ({e}), {len(pending)} PDF(s) warten, "
+                           f"nächster Versuch in {delay:.0f}s.")
+            return
+        if self._failures:
+            logger.info(f"Outbox: SMB wieder erreichbar nach {self._failures} Fehlversuch(en).")
+        self._failures = 0
+        self._next_attempt = 0.0
+        if uploaded:
+            logger.info(f"Outbox: {uploaded} PDF(s) hochgeladen.")
+        if len(self._due(pending)) > self.batch_size:
+            self._wake.set()  # nächsten Stapel ohne Wartezeit hochladen
+        self._report(self.pending())
+
+    def _is_drainer(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(os.path.join(self.directory, '.drain.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Outbox: Prozess {os.getpid()} lädt den Spool {self.directory} hoch.")
+        return True
+
+    def _report(self, pending: List[str]) -> None:
+        oldest = 0.0
+        if pending:
+            try:
+                oldest = max(0.0, time.time() - os.path.getmtime(pending[0]))
+            except OSError:
+                pass
+        metrics.set_gauge('formflow_outbox_depth', len(pending))
+        metrics.set_gauge('formflow_outbox_oldest_seconds', oldest)
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """Fehler, die jeden Upload treffen (Netz, Server, Anmeldung, Konfiguration), nicht nur eine Datei."""
+    if isinstance(error, (ConnectionError, TimeoutError, socket.gaierror, RuntimeError)):
+        return True
+    if isinstance(error, OSError) and error.errno in (errno.EHOSTUNREACH, errno.ENETUNREACH):
+        return True
+    try:
+        from smbprotocol.exceptions import SMBAuthenticationError, SMBConnectionClosed  # noqa: PLC0415
+    except ImportError:
+        return False
+    return isinstance(error, (SMBAuthenticationError, SMBConnectionClosed))
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def create_outbox(config: Dict[str, Any], storage: PdfStorage) -> Optional[Outbox]:
+    """Erstellt die Upload-Outbox, sofern SMB und ``outbox`` aktiviert sind, sonst None."""
+    outbox_config = config.get('outbox', {})
+    if not config.get('smb', {}).get('enabled') or not outbox_config.get('enabled', True):
+        return None
+    return Outbox(
+        directory=outbox_config.get('spool_dir', 'pdfs/outbox'),
+        storage=storage,
+        config=config,
+        fallback_dir='pdfs' if outbox_config.get('reconcile_fallbacks', True) else None,
+        legacy_fallbacks=outbox_config.get('reconcile_legacy', False),
+        batch_size=outbox_config.get('batch_size', 10),
+        poll_interval=outbox_config.get('poll_interval', 1.0),
+        backoff_initial=outbox_config.get('backoff_initial', 5.0),
+        backoff_max=outbox_config.get('backoff_max', 300.0),
+        max_attempts=outbox_config.get('max_attempts', 5),
+    )
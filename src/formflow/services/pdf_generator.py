@@ -1,16 +1,54 @@
+import hashlib
+import json
 import os
 import logging
+import time
+import uuid
+from contextlib import nullcontext
 from datetime import date
-from typing import Dict, Any, Optional
-from weasyprint import HTML
+from typing import TYPE_CHECKING, ContextManager, Dict, Any, Optional, Tuple
 # Environment + FileSystemLoader is used instead of Template() directly so that
 # compiled templates are cached in memory and not re-parsed on every request.
 from jinja2 import Environment, FileSystemLoader, TemplateNotFound
 
+from . import tracing
+from .asset_fetcher import get_asset_fetcher
+from .memory import MemoryAccounting
+from .metrics import metrics
+from .render_cache import RenderCache
+from .render_pool import RenderPool
+from .render_slots import Admission, RenderSlots
+from .signature_service import prepare_signatures_for_pdf
+
+if TYPE_CHECKING:
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
 logger = logging.getLogger(__name__)
 
 _DEFAULT_PDF_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pdf_templates')
 
+# Kompilierte Stylesheets und die FontConfiguration gelten pro Prozess (Web-Worker
+# bzw. Render-Pool-Prozess) und werden über alle Render-Vorgänge hinweg geteilt.
+# WeasyPrint (samt Pango/fontconfig) wird erst beim ersten Rendern importiert.
+_MAX_COMPILED_STYLESHEETS = 32
+_compiled_stylesheets: Dict[str, Any] = {}
+_font_config: Optional["FontConfiguration"] = None
+
+# Ausgabeoptionen von write_pdf(), die über APP_PDF__* bzw. pdf_options im YAML steuerbar sind
+_PDF_OPTION_KEYS = ('optimize_images', 'jpeg_quality', 'dpi', 'full_fonts', 'pdf_variant')
+
+# HTML-Schnellvorschau: PDF-Templates verweisen per file:// auf statische Dateien,
+# der Browser lädt sie über die Flask-Static-Route. @page greift im Browser nicht,
+# daher wird eine A4-Seite per Bildschirm-CSS angedeutet.
+_PDF_STATIC_URL = 'file:///app/static/'
+_WEB_STATIC_URL = '/static/'
+_SCREEN_PAGE_CSS = (
+    '@media screen{html{background:#e9ecef}'
+    'body{box-sizing:border-box;width:210mm;min-height:297mm;max-width:100%;'
+    'margin:0 auto;padding:20mm 15mm;background:#fff}}'
+)
+
 
 class _FormatMap(dict):
     """A dict subclass that returns the placeholder unchanged for missing keys."""
@@ -30,29 +68,226 @@ def _resolve_signature_label(template_str: str, form_data: Dict[str, Any], date_
     return template_str.format_map(context)
 
 
+def _get_font_config() -> "FontConfiguration":
+    """Returns the process-wide FontConfiguration, creating it on first use."""
+    global _font_config
+    if _font_config is None:
+        from weasyprint.text.fonts import FontConfiguration  # noqa: PLC0415
+        _font_config = FontConfiguration()
+    return _font_config
+
+
+def _compile_stylesheet(css_text: str) -> "CSS":
+    """Return the parsed ``CSS`` object for *css_text*, compiled once per process."""
+    key = hashlib.sha256(css_text.encode('utf-8')).hexdigest()
+    stylesheet = _compiled_stylesheets.get(key)
+    if stylesheet is None:
+        if len(_compiled_stylesheets) >= _MAX_COMPILED_STYLESHEETS:
+            _compiled_stylesheets.clear()
+        from weasyprint import CSS  # noqa: PLC0415
+        stylesheet = CSS(string=css_text, font_config=_get_font_config(), url_fetcher=get_asset_fetcher())
+        _compiled_stylesheets[key] = stylesheet
+    return stylesheet
+
+
+def _pdf_options(form_def: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge the global ``pdf`` config with the form's ``pdf_options`` into write_pdf() options.
+
+    Unknown keys in the form definition are ignored with a warning.  Unset values
+    (``None`` or an empty ``pdf_variant``) are left out so WeasyPrint's defaults apply.
+    """
+    merged = {key: value for key, value in config.get('pdf', {}).items() if key in _PDF_OPTION_KEYS}
+    overrides = form_def.get('pdf_options') or {}
+    for key, value in overrides.items():
+        if key in _PDF_OPTION_KEYS:
+            merged[key] = value
+        else:
+            logger.warning(f"Unbekannte PDF-Option '{key}' in Formular {form_def.get('form_id', '?')} wird ignoriert.")
+    return {key: value for key, value in merged.items() if value not in (None, '')}
+
+
+def _write_pdf(
+    html_content: str, css_text: Optional[str] = None, options: Optional[Dict[str, Any]] = None
+) -> Tuple[bytes, float, float]:
+    """Rendert HTML mit WeasyPrint zu PDF-Bytes (auch im Render-Pool-Prozess genutzt).
+
+    Layout und Schreiben laufen getrennt, damit ihre Dauer gemessen werden kann;
+    gibt (PDF-Bytes, Layout-Sekunden, Schreib-Sekunden) zurück.
+    """
+    from weasyprint import DEFAULT_OPTIONS, HTML  # noqa: PLC0415
+
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    options['stylesheets'] = [_compile_stylesheet(css_text)] if css_text else None
+    started = time.perf_counter()
+    document = HTML(string=html_content, url_fetcher=get_asset_fetcher()).render(
+        font_config=_get_font_config(), **options
+    )
+    laid_out = time.perf_counter()
+    pdf_bytes = document.write_pdf(**options)
+    return pdf_bytes, laid_out - started, time.perf_counter() - laid_out
+
+
 class PdfGenerator:
     """Klasse zur Generierung von PDFs aus Formulardaten mittels WeasyPrint."""
     
-    def __init__(self, templates_dir: str = _DEFAULT_PDF_TEMPLATES_DIR):
+    def __init__(
+        self,
+        templates_dir: str = _DEFAULT_PDF_TEMPLATES_DIR,
+        render_pool: Optional[RenderPool] = None,
+        render_cache: Optional[RenderCache] = None,
+        memory: Optional[MemoryAccounting] = None,
+        render_slots: Optional[RenderSlots] = None,
+    ):
         self.templates_dir = templates_dir
+        # Optionaler Pool vorgewärmter Render-Prozesse; None = Rendering im aufrufenden Thread.
+        self.render_pool = render_pool
+        # Optionaler inhaltsadressierter PDF-Cache; None = jedes Mal neu rendern.
+        self.render_cache = render_cache
+        # Optionale Speichermessung je Rendering; None = keine Messung.
+        self.memory = memory
+        # Optionale prozessübergreifende Begrenzung gleichzeitiger Renderings; None = unbegrenzt.
+        self.render_slots = render_slots
         self._env = Environment(
             loader=FileSystemLoader(templates_dir),
             auto_reload=False,
         )
+        # (CSS-Dateiname, Farbkonfiguration) -> (mtime, gerenderter CSS-Text)
+        self._stylesheet_texts: Dict[Tuple[str, Tuple], Tuple[float, str]] = {}
 
     def generate(self, form_def: Dict[str, Any], form_data: Dict[str, Any], output_filename: str, config: Optional[Dict[str, Any]] = None) -> None:
         """
-        Generiert ein PDF basierend auf einem HTML-Template und WeasyPrint.
-        
+        Generiert ein PDF und schreibt es atomar nach *output_filename*.
+
         Args:
             form_def: Die YAML-Definition des Formulars als Dictionary.
             form_data: Die vom Benutzer eingegebenen Daten.
             output_filename: Der absolute oder relative Pfad, unter dem das PDF gespeichert werden soll.
             config: Globale Konfiguration (CI-Farben, Firmenname etc.)
         """
+        pdf_bytes = self.render(form_def, form_data, config)
+        part_filename = output_filename + '.part'
+        with open(part_filename, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(part_filename, output_filename)
+
+    def render(
+        self,
+        form_def: Dict[str, Any],
+        form_data: Dict[str, Any],
+        config: Optional[Dict[str, Any]] = None,
+        admission: Optional[Admission] = None,
+        document_id: Optional[str] = None,
+    ) -> bytes:
+        """
+        Generiert ein PDF basierend auf einem HTML-Template und WeasyPrint und gibt es als Bytes zurück.
+
+        Args:
+            form_def: Die YAML-Definition des Formulars als Dictionary.
+            form_data: Die vom Benutzer eingegebenen Daten.
+            config: Globale Konfiguration (CI-Farben, Firmenname etc.)
+            admission: Bereits reservierter Render-Slot bzw. Warteplatz (asynchrone Vorschau);
+                None = bei Bedarf selbst über ``render_slots`` reservieren.
+            document_id: Im PDF gedruckte Dokument-ID (z. B. die Vorschau-ID); None = neue UUID.
+                Mit Render-Cache ist die ID immer der Inhalts-Hash.
+
+        Raises:
+            RenderBusyError: Kein Render-Slot frei und die Warteschlange voll bzw. Wartezeit überschritten.
+        """
         if config is None:
             config = {}
-            
+        try:
+            template, date_today_str, css_text, pdf_options, render_key = self._prepare(form_def, form_data, config)
+            document_id = self._document_id(render_key, document_id)
+
+            def produce() -> bytes:
+                # Slot erst hier belegen: Treffer im Render-Cache brauchen keinen
+                with self._admission(admission):
+                    if self.memory is None:
+                        return self._render_pdf(
+                            template, form_def, form_data, config, date_today_str, document_id, css_text, pdf_options
+                        )
+                    with self.memory.track(form_def.get('form_id', '?')):
+                        return self._render_pdf(
+                            template, form_def, form_data, config, date_today_str, document_id, css_text, pdf_options
+                        )
+
+            if self.render_cache is not None:
+                return self.render_cache.get_or_create(render_key, produce)
+            return produce()
+        finally:
+            if admission is not None:
+                admission.release()
+
+    def _admission(self, admission: Optional[Admission]) -> ContextManager:
+        """Returns the given admission, a newly reserved one, or a no-op without render_slots."""
+        if admission is not None:
+            return admission
+        if self.render_slots is not None:
+            return self.render_slots.admit()
+        return nullcontext()
+
+    def _document_id(self, render_key: str, document_id: Optional[str]) -> str:
+        """Returns the document ID printed into the PDF.
+
+        Without render cache every document gets its own ID.  With the cache, identical
+        inputs must yield identical bytes, so the ID is the content hash instead.
+        """
+        if self.render_cache is not None:
+            return render_key
+        return document_id or uuid.uuid4().hex
+
+    def render_html(
+        self,
+        form_def: Dict[str, Any],
+        form_data: Dict[str, Any],
+        config: Optional[Dict[str, Any]] = None,
+        document_id: Optional[str] = None,
+    ) -> str:
+        """
+        Rendert das PDF-Template als eigenständiges HTML-Dokument für die Schnellvorschau.
+
+        Das Stylesheet wird inline eingebettet, statische Dateien werden über /static/
+        referenziert. Mit derselben *document_id* entspricht die Dokument-ID der des
+        späteren PDFs.
+        """
+        if config is None:
+            config = {}
+        template, date_today_str, css_text, _pdf_options, render_key = self._prepare(form_def, form_data, config)
+        html_content = self._render_html_content(template, form_def, form_data, config, date_today_str,
+                                                 self._document_id(render_key, document_id))
+        html_content = html_content.replace(_PDF_STATIC_URL, _WEB_STATIC_URL)
+        style = f"<style>{css_text or ''}{_SCREEN_PAGE_CSS}</style>"
+        if '</head>' in html_content:
+            return html_content.replace('</head>', style + '</head>', 1)
+        return style + html_content
+
+    def warm_up(self, config: Optional[Dict[str, Any]] = None) -> int:
+        """Compiles every PDF template and renders one small throwaway document per template.
+
+        Loads WeasyPrint, fontconfig and the compiled stylesheets into this process
+        (or a render-pool process) so that the first real preview does not pay for
+        it.  The render cache is bypassed.  Returns the number of templates rendered.
+        """
+        if config is None:
+            config = {}
+        _get_font_config()
+        rendered = 0
+        for template_name in self._env.list_templates(extensions=['html']):
+            form_def = {
+                'title': 'Warm-up',
+                'pdf_template': template_name,
+                'fields': [{'type': 'text', 'name': 'warm_up', 'label': 'Warm-up'}],
+            }
+            template, date_today_str, css_text, pdf_options, render_key = self._prepare(
+                form_def, {'warm_up': 'formflow'}, config
+            )
+            self._render_pdf(template, form_def, {'warm_up': 'formflow'}, config,
+                             date_today_str, render_key, css_text, pdf_options)
+            rendered += 1
+        return rendered
+
+    def _prepare(self, form_def: Dict[str, Any], form_data: Dict[str, Any], config: Dict[str, Any]) -> Tuple[Any, str, Optional[str], Dict[str, Any], str]:
+        """Resolves template, date, stylesheet, output options and render key for one document."""
         # Template-Name aus YAML lesen oder Standard verwenden
         template_name = form_def.get('pdf_template', 'default_pdf.html')
 
@@ -64,21 +299,122 @@ class PdfGenerator:
             template = self._env.get_template('default_pdf.html')
 
         date_today_str = date.today().strftime("%d.%m.%Y")
+        css_text = self._get_stylesheet_text(template.name, config)
+        pdf_options = _pdf_options(form_def, config)
+
+        # Gleiche Eingaben ergeben das gleiche PDF; mit Render-Cache ist das auch die Dokument-ID.
+        render_key = self._render_key(template, form_def, form_data, config, date_today_str, css_text, pdf_options)
+        return template, date_today_str, css_text, pdf_options, render_key
+
+    def _render_html_content(
+        self,
+        template,
+        form_def: Dict[str, Any],
+        form_data: Dict[str, Any],
+        config: Dict[str, Any],
+        date_today: str,
+        document_id: str,
+    ) -> str:
+        """Renders the Jinja PDF template to HTML."""
         resolved_fields = self._resolve_signature_labels(
-            form_def.get('fields', []), form_data, date_today_str
+            form_def.get('fields', []), form_data, date_today
         )
 
-        html_content = template.render(
+        return template.render(
             form_title=form_def.get('title', 'Formular'),
             fields=resolved_fields,
-            form_data=form_data,
-            date_today=date_today_str,
-            uuid=os.path.basename(output_filename).replace('temp_', '').replace('.pdf', ''),
+            form_data=prepare_signatures_for_pdf(form_def, form_data),
+            date_today=date_today,
+            uuid=document_id,
             config=config
         )
-        
-        # HTML zu PDF konvertieren
-        HTML(string=html_content).write_pdf(output_filename)
+
+    def _render_pdf(
+        self,
+        template,
+        form_def: Dict[str, Any],
+        form_data: Dict[str, Any],
+        config: Dict[str, Any],
+        date_today: str,
+        document_id: str,
+        css_text: Optional[str],
+        pdf_options: Optional[Dict[str, Any]] = None,
+    ) -> bytes:
+        """Renders the Jinja template and converts it to PDF bytes (inline or in the render pool)."""
+        with metrics.in_flight('formflow_pdf_renders_in_flight'):
+            with metrics.time('formflow_pdf_render_seconds', stage='jinja'), tracing.span('jinja'):
+                html_content = self._render_html_content(template, form_def, form_data, config, date_today, document_id)
+
+            # HTML zu PDF konvertieren
+            if self.render_pool is not None:
+                pdf_bytes, layout_seconds, write_seconds = self.render_pool.run(
+                    _write_pdf, html_content, css_text, pdf_options
+                )
+            else:
+                pdf_bytes, layout_seconds, write_seconds = _write_pdf(html_content, css_text, pdf_options)
+        metrics.observe('formflow_pdf_render_seconds', layout_seconds, stage='layout')
+        metrics.observe('formflow_pdf_render_seconds', write_seconds, stage='write')
+        tracing.record('layout', layout_seconds)
+        tracing.record('write', write_seconds)
+        metrics.observe('formflow_pdf_size_bytes', len(pdf_bytes))
+        return pdf_bytes
+
+    def _render_key(
+        self,
+        template,
+        form_def: Dict[str, Any],
+        form_data: Dict[str, Any],
+        config: Dict[str, Any],
+        date_today: str,
+        css_text: Optional[str],
+        pdf_options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Return a SHA-256 hex digest over everything that influences the PDF output."""
+        try:
+            template_mtime = os.path.getmtime(template.filename)
+        except (OSError, TypeError):
+            template_mtime = None
+        payload = json.dumps(
+            {
+                'template': template.name,
+                'template_mtime': template_mtime,
+                'css': css_text,
+                'form_def': form_def,
+                'form_data': form_data,
+                'config': config,
+                'date': date_today,
+                'pdf_options': pdf_options,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _get_stylesheet_text(self, template_name: str, config: Dict[str, Any]) -> Optional[str]:
+        """Return the rendered companion stylesheet ``<template>.css`` or None if absent.
+
+        The stylesheet is a Jinja template that only sees ``config.colors``, so its
+        output is fixed per deployment and cached per (template, colors).  The cache
+        entry is refreshed when the file's mtime changes.
+        """
+        css_name = os.path.splitext(template_name)[0] + '.css'
+        css_path = os.path.join(self.templates_dir, css_name)
+        try:
+            mtime = os.path.getmtime(css_path)
+        except OSError:
+            return None
+
+        colors = config.get('colors', {})
+        key = (css_name, tuple(sorted(colors.items())))
+        cached = self._stylesheet_texts.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(css_path, 'r', encoding='utf-8') as f:
+            css_text = self._env.from_string(f.read()).render(config={'colors': colors})
+        self._stylesheet_texts[key] = (mtime, css_text)
+        return css_text
 
     def _resolve_signature_labels(
         self,
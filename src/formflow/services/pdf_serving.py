@@ -0,0 +1,71 @@
+import hashlib
+import os
+from typing import Any, Dict
+
+from flask import Response, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+
+def content_etag(data: bytes) -> str:
+    """Strong ETag from the PDF bytes (the same preview always gets the same tag)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Strong ETag of a stored file; a replaced file (atomic rename) gets a new inode and tag."""
+    return f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def send_preview(pdf_bytes: bytes, download_name: str) -> Response:
+    """Liefert eine Vorschau aus dem Speicher mit Range-Support, ETag und 304.
+
+    Vorschauen werden nicht gecacht, sondern bei jedem Abruf per ETag revalidiert
+    (``private, no-cache``); unverändert antwortet der Server mit 304 ohne Body.
+    """
+    response = Response(pdf_bytes, mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+    response.set_etag(content_etag(pdf_bytes))
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(pdf_bytes))
+
+
+def send_document(directory: str, filename: str, serving_config: Dict[str, Any]) -> Response:
+    """Liefert ein gespeichertes PDF aus *directory* aus (Range, ETag/304).
+
+    Dateinamen enthalten nur die Minute, ein zweites Bestätigen mit denselben
+    Feldwerten ersetzt die Datei daher unter gleichem Namen.  Fertige Dokumente
+    werden deshalb nicht ``immutable`` gecacht, sondern per ETag revalidiert
+    (``no-cache``, unverändert 304 ohne Body); mit ``final_max_age`` darf der
+    Browser sie so viele Sekunden ohne Nachfrage zeigen.  Mit ``offload`` liefert der
+    Reverse-Proxy die Datei selbst aus (``X-Accel-Redirect`` für nginx,
+    ``X-Sendfile`` für Apache/lighttpd); Range, ETag und 304 übernimmt dann der Proxy.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    max_age = 0 if filename.startswith('temp_') else serving_config.get('final_max_age', 0)
+
+    offload = serving_config.get('offload', 'none')
+    if offload != 'none':
+        response = Response(mimetype='application/pdf')
+        if offload == 'x-accel-redirect':
+            response.headers['X-Accel-Redirect'] = serving_config.get('accel_prefix', '/protected-pdfs/') + filename
+        else:
+            response.headers['X-Sendfile'] = path
+        response.headers['Content-Disposition'] = f'inline; filename="{filename}"'
+    else:
+        response = send_file(path, mimetype='application/pdf', download_name=filename,
+                             etag=file_etag(os.stat(path)), conditional=True, max_age=max_age)
+    _set_cache_control(response, max_age)
+    return response
+
+
+def _set_cache_control(response: Response, max_age: int) -> None:
+    # PDFs enthalten personenbezogene Daten: nur im Browser cachen, nie in geteilten Caches
+    if max_age:
+        response.headers['Cache-Control'] = f'private, max-age={max_age}'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.expires = None
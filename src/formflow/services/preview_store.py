@@ -0,0 +1,221 @@
+import glob
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .janitor import Janitor
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewStore:
+    """Holds rendered preview PDFs in memory until they are confirmed or discarded.
+
+    The preview is served from here and, on confirm, the same bytes are handed to
+    ``PdfStorage`` – no temporary file is written to the shared ``pdfs/`` volume.
+    Entries are keyed by the preview's file id and expire after ``max_age_seconds``
+    (e.g. when the browser tab is closed without confirming).  With ``max_bytes``
+    the least recently used previews are evicted once the store holds more bytes;
+    the newest preview is always kept.
+    """
+
+    def __init__(self, max_age_seconds: int = 3600, max_bytes: int = 0) -> None:
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes  # 0 = unbegrenzt
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, file_id: str, data: bytes) -> None:
+        """Stores the PDF bytes of preview *file_id*."""
+        with self._lock:
+            self._pop(file_id)
+            self._entries[file_id] = (time.monotonic(), data)
+            self._size += len(data)
+            evicted = 0
+            while self.max_bytes and self._size > self.max_bytes and len(self._entries) > 1:
+                self._pop(next(iter(self._entries)))
+                evicted += 1
+            size = self._size
+        if evicted:
+            metrics.inc('formflow_preview_evictions_total', evicted, reason='budget')
+        metrics.set_gauge('formflow_preview_store_bytes', size)
+
+    def get(self, file_id: str) -> Optional[bytes]:
+        """Returns the PDF bytes of preview *file_id*, or None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(file_id)
+            if entry is not None:
+                self._entries.move_to_end(file_id)  # zuletzt genutzt
+        if entry is None or time.monotonic() - entry[0] > self.max_age_seconds:
+            return None
+        return entry[1]
+
+    def __contains__(self, file_id: str) -> bool:
+        return self.get(file_id) is not None
+
+    def discard(self, file_id: str) -> None:
+        """Removes preview *file_id* if present."""
+        with self._lock:
+            self._pop(file_id)
+
+    def cleanup(self, max_age_seconds: Optional[int] = None) -> None:
+        """Drops previews older than *max_age_seconds* (default: the store's max age)."""
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        now = time.monotonic()
+        with self._lock:
+            expired = [file_id for file_id, (created, _data) in self._entries.items() if now - created > max_age]
+            for file_id in expired:
+                self._pop(file_id)
+            size = self._size
+        if expired:
+            metrics.inc('formflow_preview_evictions_total', len(expired), reason='ttl')
+            logger.info(f"Cleanup: {len(expired)} verwaiste Vorschau(en) aus dem Speicher entfernt.")
+        metrics.set_gauge('formflow_preview_store_bytes', size)
+
+    def _pop(self, file_id: str) -> None:
+        entry = self._entries.pop(file_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+class TmpfsPreviewStore:
+    """Preview store backed by a directory, meant for a tmpfs such as ``/dev/shm``.
+
+    Unlike the in-memory store it is shared by all gunicorn workers (a preview
+    rendered by one worker can be served and confirmed by another) and survives
+    worker restarts, while still staying off the persistent ``pdfs/`` volume.  The
+    access time of a file marks its last use; when the directory exceeds
+    ``max_bytes``, the least recently used previews are deleted.  The directory is
+    shared, so ``formflow_preview_store_bytes`` (summed over workers) is not reported.
+    With a ``janitor`` every stored preview is registered in its expiry heap, so
+    expired previews are removed without listing the directory; ``cleanup()`` is
+    then only needed for previews of other (e.g. crashed) workers.
+    """
+
+    def __init__(self, directory: str, max_age_seconds: int = 3600, max_bytes: int = 0) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes  # 0 = unbegrenzt
+        self.janitor: Optional[Janitor] = None
+
+    def _path(self, file_id: str) -> str:
+        return os.path.join(self.directory, f"{os.path.basename(file_id)}.pdf")
+
+    def put(self, file_id: str, data: bytes) -> None:
+        """Stores the PDF bytes of preview *file_id* (atomically, visible to all workers)."""
+        path = self._path(file_id)
+        part_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.part")
+        with open(part_path, 'wb') as f:
+            f.write(data)
+        os.replace(part_path, path)
+        if self.janitor is not None:
+            self.janitor.track(path, self.max_age_seconds)
+        self._enforce_budget(keep=path)
+
+    def get(self, file_id: str) -> Optional[bytes]:
+        """Returns the PDF bytes of preview *file_id*, or None if unknown or expired."""
+        path = self._path(file_id)
+        try:
+            with open(path, 'rb') as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                if time.time() - mtime > self.max_age_seconds:
+                    return None
+                data = f.read()
+            os.utime(path, (time.time(), mtime))  # zuletzt genutzt (atime), unabhängig von noatime
+        except FileNotFoundError:
+            return None
+        return data
+
+    def __contains__(self, file_id: str) -> bool:
+        return self.get(file_id) is not None
+
+    def discard(self, file_id: str) -> None:
+        """Removes preview *file_id* if present."""
+        try:
+            os.remove(self._path(file_id))
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self, max_age_seconds: Optional[int] = None) -> None:
+        """Drops previews older than *max_age_seconds* (default: the store's max age)."""
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        now = time.time()
+        entries = self._entries()
+        expired = 0
+        for _atime, mtime, _size, path in entries:
+            if now - mtime > max_age and self._remove(path):
+                expired += 1
+        if expired:
+            metrics.inc('formflow_preview_evictions_total', expired, reason='ttl')
+            logger.info(f"Cleanup: {expired} verwaiste Vorschau(en) aus {self.directory} entfernt.")
+
+    def _entries(self) -> List[Tuple[float, float, int, str]]:
+        """(atime, mtime, size, path) aller Vorschauen, am längsten ungenutzte zuerst."""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.pdf')):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue  # von einem anderen Worker entfernt
+            entries.append((st.st_atime, st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def _enforce_budget(self, keep: str) -> None:
+        if not self.max_bytes:
+            return
+        entries = self._entries()
+        size = sum(entry[2] for entry in entries)
+        evicted = 0
+        for _atime, _mtime, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            if path != keep and self._remove(path):
+                size -= entry_size
+                evicted += 1
+        if evicted:
+            metrics.inc('formflow_preview_evictions_total', evicted, reason='budget')
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+
+def default_preview_directory() -> str:
+    """``/dev/shm/formflow-previews`` (RAM), ohne ``/dev/shm`` (z. B. macOS) im temp-Verzeichnis."""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'formflow-previews')
+
+
+def require_shared_store(preview_config: Dict[str, Any], workers: int) -> None:
+    """Lehnt den Speicher im Worker ab, wenn mehrere Worker laufen (gunicorn ``on_starting``).
+
+    Ohne gemeinsamen Speicher landen Statusabfrage, PDF-Abruf und Bestätigung oft
+    in einem anderen Worker als das Rendering und finden die Vorschau nicht.
+    """
+    if workers > 1 and preview_config.get('backend', 'tmpfs') == 'memory':
+        raise RuntimeError(
+            f"APP_PREVIEW__BACKEND=memory hält Vorschauen je Worker und funktioniert nicht mit {workers} Workern. "
+            "APP_PREVIEW__BACKEND=tmpfs verwenden oder WEB_CONCURRENCY=1 setzen."
+        )
+
+
+def create_preview_store(preview_config: Dict[str, Any]) -> Any:
+    """Erstellt den Vorschau-Speicher gemäß ``preview``-Konfiguration (tmpfs-Verzeichnis oder Speicher)."""
+    max_age = preview_config.get('ttl', 3600)
+    max_bytes = preview_config.get('max_mb', 0) * 1024 * 1024
+    if preview_config.get('backend', 'tmpfs') == 'tmpfs':
+        directory = preview_config.get('directory') or default_preview_directory()
+        return TmpfsPreviewStore(directory, max_age, max_bytes)
+    return PreviewStore(max_age, max_bytes)
@@ -0,0 +1,156 @@
+import fcntl
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """Content-addressed, disk-backed LRU cache for rendered PDFs.
+
+    Entries are stored as ``<key>.pdf`` in ``directory``; the atime of an entry is
+    its last access, so all Gunicorn workers sharing the directory also share the
+    LRU order.  The mtime is the time the PDF was rendered: the PDFs contain
+    personal data and signatures, so entries older than ``max_age_seconds`` are
+    neither served nor kept.  Concurrent renders of the same key are collapsed into
+    one (singleflight) via an exclusive ``flock`` on ``<key>.lock``, which works
+    across threads and processes alike.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age_seconds: int = 3600) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the cached PDF for *key* and marks it as recently used, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                if time.time() - mtime > self.max_age_seconds:
+                    return None
+                data = f.read()
+            os.utime(path, (time.time(), mtime))  # zuletzt genutzt (atime), unabhängig von noatime
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Stores *data* atomically under *key* and evicts old entries if over budget."""
+        if len(data) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            logger.warning(f"Render-Cache-Eintrag {key} konnte nicht geschrieben werden.", exc_info=True)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+
+    def get_or_create(self, key: str, producer: Callable[[], bytes]) -> bytes:
+        """Returns the cached PDF for *key* or renders it once via *producer*.
+
+        Identical requests that arrive while a render is running wait for it and
+        then read its result from the cache instead of rendering again.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self._key_lock(key):
+            data = self.get(key)
+            if data is not None:
+                logger.debug(f"Render-Cache: Ergebnis eines parallelen Renderings übernommen ({key[:12]}).")
+                return data
+            data = producer()
+            self.put(key, data)
+            return data
+
+    @contextmanager
+    def _key_lock(self, key: str) -> Iterator[None]:
+        lock_path = os.path.join(self.directory, f"{key}.lock")
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                # Waiters re-check the cache after acquiring, so removing the lock file
+                # while they hold the old inode cannot cause a duplicate render.
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def cleanup(self, max_age_seconds: Optional[int] = None) -> None:
+        """Deletes entries rendered more than *max_age_seconds* ago (default: the cache's max age)."""
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        now = time.time()
+        removed = 0
+        for entry in self._scan():
+            if now - entry.stat().st_mtime > max_age:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                removed += 1
+        if removed:
+            logger.info(f"Render-Cache: {removed} abgelaufene(s) PDF(s) gelöscht.")
+
+    def _scan(self) -> List[os.DirEntry]:
+        """Returns the ``.pdf`` entries of the cache directory that could be stat'ed."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith('.pdf'):
+                        continue
+                    try:
+                        entry.stat()
+                    except OSError:
+                        continue
+                    entries.append(entry)
+        except OSError:
+            pass
+        return entries
+
+    def _evict(self) -> None:
+        """Deletes least recently used entries until the cache fits into max_bytes."""
+        entries = []
+        total = 0
+        for entry in self._scan():
+            stat = entry.stat()
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _mtime, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+def create_render_cache(render_config: dict) -> Optional[RenderCache]:
+    """Erstellt den Render-Cache gemäß ``render``-Konfiguration oder None, wenn deaktiviert."""
+    max_mb = render_config.get('cache_size_mb', 0)
+    if not max_mb:
+        return None
+    return RenderCache(render_config.get('cache_dir', 'render_cache'), max_mb * 1024 * 1024,
+                       render_config.get('cache_ttl', 3600))
@@ -0,0 +1,89 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Abgeschlossene Jobs werden nur begrenzt lange nachgehalten (Status-Abfragen kommen zeitnah).
+_MAX_TRACKED_JOBS = 256
+
+
+class RenderJobs:
+    """Runs preview renders in background threads and tracks their status per job id.
+
+    The HTTP worker only submits the job and returns the preview page; the browser
+    polls the status endpoint until the PDF is ready.
+    """
+
+    PENDING = 'pending'
+    DONE = 'done'
+    ERROR = 'error'
+    UNKNOWN = 'unknown'
+
+    def __init__(self, max_workers: int = 2) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render-job')
+        self._jobs: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: str, func: Callable[..., Any], *args: Any) -> None:
+        """Schedules ``func(*args)`` as job *job_id*."""
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda f: self._log_failure(job_id, f))
+        with self._lock:
+            self._jobs[job_id] = future
+            while len(self._jobs) > _MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+
+    def status(self, job_id: str) -> str:
+        """Returns 'pending', 'done', 'error' or 'unknown' (job not tracked by this process)."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None:
+            return self.UNKNOWN
+        if not future.done():
+            return self.PENDING
+        if future.cancelled():
+            return self.ERROR
+        return self.ERROR if future.exception() is not None else self.DONE
+
+    def error(self, job_id: str) -> Optional[BaseException]:
+        """Returns the exception of a failed job, or None."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None or not future.done() or future.cancelled():
+            return None
+        return future.exception()
+
+    def wait(self, job_id: str, timeout: float) -> None:
+        """Blocks until job *job_id* has finished (successfully or not) or *timeout* expires."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None:
+            return
+        try:
+            future.result(timeout)
+        except FutureTimeoutError:
+            logger.warning(f"Render-Job {job_id} nach {timeout}s noch nicht abgeschlossen.")
+        except BaseException:
+            pass  # bereits in _log_failure protokolliert
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _log_failure(job_id: str, future: Future) -> None:
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            logger.error(f"Render-Job {job_id} fehlgeschlagen: {exc}", exc_info=exc)
+
+
+def create_render_jobs(render_config: dict) -> Optional[RenderJobs]:
+    """Erstellt den Hintergrund-Executor für asynchrone Vorschauen oder None (synchron)."""
+    if not render_config.get('async_preview', False):
+        return None
+    return RenderJobs(max_workers=max(render_config.get('pool_size', 0), 1) + 1)
@@ -0,0 +1,184 @@
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_WARMUP_HTML = "<!DOCTYPE html><html><body><p>formflow warm-up</p></body></html>"
+
+
+class RenderPoolBusyError(RuntimeError):
+    """Raised when all render processes are busy and the job queue is full."""
+
+
+class RenderTimeoutError(RenderPoolBusyError):
+    """Raised when a render job does not finish within the pool's timeout."""
+
+
+# Im Kindprozess: Queue, über die ein Job seinen Prozess meldet (siehe _run_job)
+_started: Any = None
+
+
+def _warm_up_worker(started: Any = None) -> None:
+    """Initialisiert einen Render-Prozess: WeasyPrint importieren und einmal rendern.
+
+    Der erste Render-Vorgang eines Prozesses lädt Pango, fontconfig und die
+    User-Agent-Stylesheets – das soll nicht der erste echte Request bezahlen.
+    """
+    global _started
+    _started = started
+    from weasyprint import HTML  # noqa: PLC0415
+
+    HTML(string=_WARMUP_HTML).write_pdf()
+
+
+def _run_job(token: int, start_deadline: float, func: Callable[..., Any], args: tuple) -> Any:
+    """Meldet dem Web-Worker, welcher Prozess Job *token* rendert, und führt ihn aus.
+
+    Kommt der Job erst nach *start_deadline* (``time.time()``) an die Reihe, wartet
+    niemand mehr auf ihn: er wird verworfen, statt einen Render-Prozess zu belegen.
+    """
+    if time.time() > start_deadline:
+        raise RenderTimeoutError("Render-Job nicht rechtzeitig gestartet, verworfen.")
+    if _started is not None:
+        _started.put((token, os.getpid()))
+    return func(*args)
+
+
+class RenderPool:
+    """Pool langlebiger, vorgewärmter Kindprozesse für das WeasyPrint-Rendering.
+
+    Die Anzahl gleichzeitig angenommener Jobs ist auf ``workers + queue_size``
+    begrenzt; darüber hinaus wird sofort ``RenderPoolBusyError`` ausgelöst,
+    statt Requests unbegrenzt warten zu lassen.  Braucht ein Job länger als
+    ``timeout``, wird der Render-Prozess beendet (der Pool startet einen neuen) und
+    ``RenderTimeoutError`` ausgelöst; erst danach wird der Platz wieder frei.  Ein
+    Job, der beim Timeout noch in der Warteschlange steht, behält seinen Platz, bis
+    ein Render-Prozess ihn abholt und wegen der überschrittenen Startfrist verwirft.
+    """
+
+    def __init__(self, workers: int, queue_size: int = 0, timeout: float = 110) -> None:
+        if workers < 1:
+            raise ValueError("RenderPool benötigt mindestens einen Worker.")
+        self.workers = workers
+        self.queue_size = max(queue_size, 0)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._started = None
+        self._pids: Dict[int, int] = {}
+        self._tokens = itertools.count()
+        # Jobs, deren Platz in _slots noch belegt ist (genau eine Freigabe je Job)
+        self._active: Set[int] = set()
+
+    def start(self) -> None:
+        """Startet die Kindprozesse (idempotent)."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            # forkserver: Kindprozesse erben keine Threads/Locks des Web-Workers.
+            context = multiprocessing.get_context("forkserver")
+            self._started = context.SimpleQueue()
+            self._pids = {}
+            self._pool = context.Pool(processes=self.workers, initializer=_warm_up_worker,
+                                      initargs=(self._started,))
+            atexit.register(self.close)
+            logger.info(f"Render-Pool gestartet: {self.workers} Prozess(e), Warteschlange {self.queue_size}.")
+
+    def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Führt ``func(*args)`` in einem Render-Prozess aus und wartet auf das Ergebnis.
+
+        ``func`` muss eine Funktion auf Modulebene sein (Pickle-Referenz).
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RenderPoolBusyError("Alle Render-Prozesse sind ausgelastet.")
+        token = next(self._tokens)
+        with self._lock:
+            self._active.add(token)
+        # Etwas vor dem Timeout: ein danach gestarteter Job hätte seinen Prozess noch nicht gemeldet
+        start_deadline = time.time() + self.timeout - min(1.0, self.timeout / 2)
+        try:
+            self.start()
+            result = self._pool.apply_async(
+                _run_job, (token, start_deadline, func, args),
+                callback=lambda _result: self._finish(token), error_callback=lambda _error: self._finish(token),
+            )
+        except BaseException:
+            self._finish(token)
+            raise
+        try:
+            return result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            if self._kill_job(token):
+                self._finish(token)  # der Pool liefert für den beendeten Prozess kein Ergebnis mehr
+            raise RenderTimeoutError(f"Render-Job nach {self.timeout} s abgebrochen.") from None
+
+    def _finish(self, token: int) -> None:
+        """Gibt den Platz von Job *token* frei (fertig, verworfen oder Prozess beendet)."""
+        self._job_pid(token)  # Eintrag verwerfen
+        with self._lock:
+            if token not in self._active:
+                return
+            self._active.discard(token)
+        self._slots.release()
+
+    def _job_pid(self, token: int) -> Optional[int]:
+        """Entnimmt den Prozess, der Job *token* rendert (None, falls noch nicht gestartet)."""
+        with self._lock:
+            while self._started is not None:
+                try:
+                    if self._started.empty():
+                        break
+                    started_token, pid = self._started.get()
+                except (OSError, EOFError, queue.Empty):
+                    break
+                self._pids[started_token] = pid
+            return self._pids.pop(token, None)
+
+    def _kill_job(self, token: int) -> bool:
+        """Beendet den Render-Prozess eines hängenden Jobs (der Pool ersetzt ihn); False, wenn er noch wartet."""
+        pid = self._job_pid(token)
+        if pid is None:
+            logger.warning("Render-Job hat das Timeout überschritten, bevor er gestartet wurde; "
+                           "er wird beim Start verworfen.")
+            return False
+        logger.warning(f"Render-Job hängt, beende Render-Prozess {pid}.")
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        return True
+
+    def close(self) -> None:
+        """Beendet die Kindprozesse."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            if pool is None:
+                return
+            self._started = None
+            active, self._active = self._active, set()
+        # Außerhalb der Sperre: terminate() wartet auf den Ergebnis-Thread, dessen Callbacks _finish() aufrufen
+        pool.terminate()
+        pool.join()
+        for _token in active:
+            self._slots.release()  # Ergebnisse beendeter Prozesse kommen nicht mehr
+
+
+def create_render_pool(render_config: dict) -> Optional[RenderPool]:
+    """Erstellt einen RenderPool gemäß ``render``-Konfiguration oder None (Inline-Rendering)."""
+    workers = render_config.get('pool_size', 0)
+    if not workers:
+        return None
+    return RenderPool(
+        workers=workers,
+        queue_size=render_config.get('queue_size', 0),
+        timeout=render_config.get('timeout', 110),
+    )
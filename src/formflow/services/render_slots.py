@@ -0,0 +1,165 @@
+import fcntl
+import logging
+import os
+import random
+import time
+from typing import List, Optional
+
+from .metrics import metrics
+from .render_pool import RenderPoolBusyError
+
+logger = logging.getLogger(__name__)
+
+_POLL_MIN_SECONDS = 0.01
+_POLL_MAX_SECONDS = 0.25
+
+
+class RenderBusyError(RenderPoolBusyError):
+    """Raised when no render slot and no place in the wait queue is free in time."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _try_lock(path: str) -> Optional[int]:
+    """Returns an fd holding an exclusive ``flock`` on *path*, or None if it is taken."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class RenderSlots:
+    """Cross-process limit on concurrent PDF renders with a short bounded wait queue.
+
+    Every render slot and every queue place is a lock file in ``directory``; holding
+    it means holding an exclusive ``flock`` on it.  All gunicorn workers (and their
+    threads) sharing the directory therefore share the limit, and the kernel
+    releases the locks of a crashed or OOM-killed worker.  ``admit()`` never blocks:
+    it hands out a slot or a queue place, or raises ``RenderBusyError`` at once.
+    """
+
+    def __init__(self, directory: str, slots: int, queue_size: int = 0,
+                 wait_timeout: float = 10, retry_after: int = 5, reserved: int = 0) -> None:
+        if slots < 1:
+            raise ValueError("RenderSlots benötigt mindestens einen Slot.")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self._slot_paths = [os.path.join(directory, f"slot_{i}.lock") for i in range(slots)]
+        self._queue_paths = [os.path.join(directory, f"queue_{i}.lock") for i in range(max(queue_size, 0))]
+        # Die letzten *reserved* Slots bleiben interaktiven Renderings vorbehalten (mindestens einer für Batches)
+        self._background_paths = self._slot_paths[:max(slots - max(reserved, 0), 1)]
+
+    def admit(self, wait_timeout: Optional[float] = None) -> "Admission":
+        """Reserviert einen Render-Slot oder einen Warteplatz, ohne zu blockieren.
+
+        Args:
+            wait_timeout: Maximale Wartezeit auf einen Slot beim Betreten der
+                Admission; None = ``self.wait_timeout``.
+        """
+        timeout = self.wait_timeout if wait_timeout is None else wait_timeout
+        fd = self._acquire_any(self._slot_paths)
+        if fd is not None:
+            return Admission(self, timeout, slot_fd=fd)
+        fd = self._acquire_any(self._queue_paths)
+        if fd is not None:
+            return Admission(self, timeout, queue_fd=fd)
+        metrics.inc('formflow_render_rejected_total', reason='queue_full')
+        raise RenderBusyError("Alle Render-Slots und Warteplätze sind belegt.", self.retry_after)
+
+    def try_admit_background(self) -> Optional["Admission"]:
+        """Reserviert einen Slot für Hintergrund-Renderings (Batch) oder gibt None zurück.
+
+        Nutzt weder Warteplätze noch die reservierten Slots, damit ein laufender
+        Batch Vorschauen nicht mit HTTP 503 abweist; der Aufrufer wartet selbst.
+        """
+        fd = self._acquire_any(self._background_paths)
+        if fd is None:
+            return None
+        return Admission(self, self.wait_timeout, slot_fd=fd)
+
+    def _acquire_any(self, paths: List[str]) -> Optional[int]:
+        # Zufälliger Startpunkt, damit nicht alle Worker zuerst um slot_0 konkurrieren
+        offset = random.randrange(len(paths)) if paths else 0
+        for path in paths[offset:] + paths[:offset]:
+            fd = _try_lock(path)
+            if fd is not None:
+                return fd
+        return None
+
+    def _wait_for_slot(self, timeout: float) -> int:
+        deadline = time.monotonic() + timeout
+        delay = _POLL_MIN_SECONDS
+        with metrics.time('formflow_render_admission_wait_seconds'):
+            while True:
+                fd = self._acquire_any(self._slot_paths)
+                if fd is not None:
+                    return fd
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.inc('formflow_render_rejected_total', reason='timeout')
+                    raise RenderBusyError(f"Kein Render-Slot innerhalb von {timeout}s frei geworden.", self.retry_after)
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, _POLL_MAX_SECONDS)
+
+
+class Admission:
+    """A reserved render slot or wait-queue place; entering it waits for a free slot.
+
+    May be created in one thread and entered in another (the request thread
+    reserves, the background render job waits).  ``release()`` is idempotent and
+    must be called when the admission is never entered, e.g. on a cache hit.
+    """
+
+    def __init__(self, slots: RenderSlots, wait_timeout: float,
+                 slot_fd: Optional[int] = None, queue_fd: Optional[int] = None) -> None:
+        self._slots = slots
+        self._wait_timeout = wait_timeout
+        self._slot_fd = slot_fd
+        self._queue_fd = queue_fd
+
+    def __enter__(self) -> "Admission":
+        if self._slot_fd is None:
+            try:
+                self._slot_fd = self._slots._wait_for_slot(self._wait_timeout)
+            except BaseException:
+                self.release()
+                raise
+        # Slot erhalten: Warteplatz für den Nächsten freigeben
+        self._close('_queue_fd')
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    def release(self) -> None:
+        """Gibt Slot und Warteplatz frei."""
+        self._close('_slot_fd')
+        self._close('_queue_fd')
+
+    def _close(self, attribute: str) -> None:
+        fd = getattr(self, attribute)
+        if fd is not None:
+            setattr(self, attribute, None)
+            os.close(fd)  # schließt den Deskriptor und gibt damit den flock frei
+
+
+def create_render_slots(render_config: dict) -> Optional[RenderSlots]:
+    """Erstellt die prozessübergreifende Render-Begrenzung oder None (unbegrenzt)."""
+    slots = render_config.get('max_concurrent', 0)
+    if not slots:
+        return None
+    return RenderSlots(
+        directory=render_config.get('slots_dir', 'render_slots'),
+        slots=slots,
+        queue_size=render_config.get('admission_queue', 0),
+        wait_timeout=render_config.get('admission_wait', 10),
+        retry_after=render_config.get('retry_after', 5),
+        reserved=render_config.get('preview_slots', 1),
+    )
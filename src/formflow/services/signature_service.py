@@ -0,0 +1,212 @@
+import base64
+import hashlib
+import io
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+# Kompakte Vektor-Kodierung aus form_handler.js:
+#   sig1:<breite>x<höhe>:x,y x,y x,y;x,y x,y
+# Koordinaten sind CSS-Pixel des Zeichenfelds, Striche durch ';' getrennt.
+SIGNATURE_PREFIX = 'sig1:'
+
+_SIZE_RE = re.compile(r'^(\d+(?:\.\d+)?)x(\d+(?:\.\d+)?)$')
+_STROKE_WIDTH = 2.5
+
+Point = Tuple[float, float]
+
+# Zielgröße für Raster-Unterschriften: die .signature-box im PDF-Template ist
+# 150 CSS-Pixel hoch; bei Druckauflösung entspricht das 150 * 300 / 96 Pixeln.
+_PRINT_DPI = 300
+_SIGNATURE_BOX_HEIGHT_CSS_PX = 150
+_MAX_HEIGHT = round(_SIGNATURE_BOX_HEIGHT_CSS_PX * _PRINT_DPI / 96)
+_MAX_WIDTH = _MAX_HEIGHT * 4
+_CROP_MARGIN = 4
+_INK_THRESHOLD = 160  # Graustufen darunter gelten als Tinte
+_MAX_NORMALIZED_CACHE = 128
+
+_normalized_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_normalized_cache_lock = threading.Lock()
+
+
+def is_vector_signature(value: Any) -> bool:
+    """True if *value* is a signature in the compact stroke encoding."""
+    return isinstance(value, str) and value.startswith(SIGNATURE_PREFIX)
+
+
+def parse_vector_signature(value: str) -> Optional[Tuple[float, float, List[List[Point]]]]:
+    """Parses the compact encoding into (width, height, strokes) or None if malformed."""
+    if not is_vector_signature(value):
+        return None
+    size, _, stroke_data = value[len(SIGNATURE_PREFIX):].partition(':')
+    size_match = _SIZE_RE.match(size)
+    if not size_match:
+        return None
+    width, height = float(size_match.group(1)), float(size_match.group(2))
+    if width <= 0 or height <= 0:
+        return None
+
+    strokes: List[List[Point]] = []
+    try:
+        for stroke in stroke_data.split(';'):
+            points = [
+                (float(x), float(y))
+                for x, y in (pair.split(',') for pair in stroke.split())
+            ]
+            if points:
+                strokes.append(points)
+    except ValueError:
+        return None
+    if not all(math.isfinite(c) for points in strokes for point in points for c in point):
+        return None
+    return width, height, strokes
+
+
+def _fmt(number: float) -> str:
+    return f"{number:.1f}".rstrip('0').rstrip('.')
+
+
+def _stroke_to_path(points: List[Point]) -> str:
+    """Glättet einen Strich mit quadratischen Bézierkurven durch die Punkt-Mittelpunkte."""
+    if len(points) == 1:
+        x, y = points[0]
+        # Einzelner Punkt: Linie der Länge 0 mit runden Enden ergibt einen Punkt
+        return f"M{_fmt(x)} {_fmt(y)}h0"
+    parts = [f"M{_fmt(points[0][0])} {_fmt(points[0][1])}"]
+    for (x1, y1), (x2, y2) in zip(points[1:-1], points[2:]):
+        parts.append(f"Q{_fmt(x1)} {_fmt(y1)} {_fmt((x1 + x2) / 2)} {_fmt((y1 + y2) / 2)}")
+    parts.append(f"L{_fmt(points[-1][0])} {_fmt(points[-1][1])}")
+    return ''.join(parts)
+
+
+def vector_signature_to_svg(value: str) -> Optional[str]:
+    """Renders a compact vector signature as a standalone SVG document, or None if invalid."""
+    parsed = parse_vector_signature(value)
+    if parsed is None:
+        return None
+    width, height, strokes = parsed
+    # Nach einem Resize des Zeichenfelds können Punkte außerhalb der gemeldeten Größe liegen
+    width = max([width] + [x + _STROKE_WIDTH for points in strokes for x, _y in points])
+    height = max([height] + [y + _STROKE_WIDTH for points in strokes for _x, y in points])
+    path_data = ''.join(_stroke_to_path(points) for points in strokes)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_fmt(width)}" height="{_fmt(height)}" '
+        f'viewBox="0 0 {_fmt(width)} {_fmt(height)}">'
+        f'<path d="{path_data}" fill="none" stroke="#000" stroke-width="{_STROKE_WIDTH}" '
+        f'stroke-linecap="round" stroke-linejoin="round"/></svg>'
+    )
+
+
+def signature_src(value: Any) -> Any:
+    """Returns an ``<img src>``-ready value: vector signatures become SVG data URLs.
+
+    PNG data URLs from older drafts and any other value are returned unchanged.
+    """
+    if not is_vector_signature(value):
+        return value
+    svg = vector_signature_to_svg(value)
+    if svg is None:
+        logger.warning("Ungültige Vektor-Unterschrift wird ignoriert.")
+        return ''
+    return 'data:image/svg+xml,' + quote(svg, safe='')
+
+
+def prepare_signatures_for_pdf(form_def: Dict[str, Any], form_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of *form_data* in which signature fields hold ``<img src>``-ready values."""
+    prepared = dict(form_data)
+    for field in form_def.get('fields', []):
+        if field.get('type') == 'signature' and field.get('name') in prepared:
+            prepared[field['name']] = signature_src(prepared[field['name']])
+    return prepared
+
+
+def _normalize_png_data_url(value: str) -> str:
+    """Crops, downscales and 1-bit-quantizes a raster signature data URL.
+
+    Returns the original value if it contains no ink or cannot be decoded.
+    """
+    # Lazy import: Pillow kommt als Abhängigkeit von WeasyPrint mit
+    from PIL import Image  # noqa: PLC0415
+
+    header, _, payload = value.partition(',')
+    if not header.endswith(';base64'):
+        return value
+    image = Image.open(io.BytesIO(base64.b64decode(payload)))
+    image.load()
+
+    # Auf Weiß komponieren, damit transparente und weiße Hintergründe gleich behandelt werden
+    rgba = image.convert('RGBA')
+    background = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+    gray = Image.alpha_composite(background, rgba).convert('L')
+    ink = gray.point(lambda v: 1 if v < _INK_THRESHOLD else 0)
+
+    bbox = ink.getbbox()
+    if bbox is None:
+        return value
+    left, top, right, bottom = bbox
+    ink = ink.crop((
+        max(left - _CROP_MARGIN, 0),
+        max(top - _CROP_MARGIN, 0),
+        min(right + _CROP_MARGIN, ink.width),
+        min(bottom + _CROP_MARGIN, ink.height),
+    ))
+
+    if ink.width > _MAX_WIDTH or ink.height > _MAX_HEIGHT:
+        scale = min(_MAX_WIDTH / ink.width, _MAX_HEIGHT / ink.height)
+        size = (max(round(ink.width * scale), 1), max(round(ink.height * scale), 1))
+        # Über Graustufen skalieren, damit dünne Striche nicht verschwinden
+        ink = ink.point(lambda v: 255 if v else 0).resize(size, Image.LANCZOS)
+        ink = ink.point(lambda v: 1 if v >= 96 else 0)
+
+    # Palettenbild: Index 0 = transparenter Hintergrund, Index 1 = schwarze Tinte
+    quantized = Image.new('P', ink.size, 0)
+    quantized.putpalette([255, 255, 255, 0, 0, 0])
+    quantized.paste(ink)
+    buffer = io.BytesIO()
+    quantized.save(buffer, format='PNG', optimize=True, transparency=0, bits=1)
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def normalize_signature(value: Any) -> Any:
+    """Normalizes a raster signature data URL; other values are returned unchanged.
+
+    Results are cached by the hash of the input, so repeated previews and draft
+    saves of the same signature are processed only once.
+    """
+    if not (isinstance(value, str) and value.startswith('data:image/')):
+        return value
+    key = hashlib.sha256(value.encode('utf-8')).digest()
+    with _normalized_cache_lock:
+        cached = _normalized_cache.get(key)
+        if cached is not None:
+            _normalized_cache.move_to_end(key)
+            return cached
+
+    try:
+        normalized = _normalize_png_data_url(value)
+    except Exception as e:
+        logger.warning(f"Unterschrift konnte nicht normalisiert werden ({e}), verwende Original.")
+        normalized = value
+    if len(normalized) >= len(value):
+        normalized = value
+
+    with _normalized_cache_lock:
+        _normalized_cache[key] = normalized
+        while len(_normalized_cache) > _MAX_NORMALIZED_CACHE:
+            _normalized_cache.popitem(last=False)
+    return normalized
+
+
+def normalize_signatures(form_def: Dict[str, Any], form_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of *form_data* with all raster signatures normalized."""
+    normalized = dict(form_data)
+    for field in form_def.get('fields', []):
+        if field.get('type') == 'signature' and field.get('name') in normalized:
+            normalized[field['name']] = normalize_signature(normalized[field['name']])
+    return normalized
@@ -0,0 +1,151 @@
+import logging
+import queue
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Größte Datenmenge pro Schreibaufruf; SMBRawIO.write() begrenzt zusätzlich auf die
+# ausgehandelte max_write_size und die verfügbaren Credits (SMB 3: bis zu 8 MB je Request).
+WRITE_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def write_all(remote_file, data: bytes) -> None:
+    """Writes *data* completely into an unbuffered SMB file (one request per negotiated write size)."""
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        offset += remote_file.write(view[offset:])
+
+
+class _PooledConnection:
+    """One SMB connection with its session and tree connects, owned by the pool."""
+
+    def __init__(self) -> None:
+        # Eigener Connection-Cache für smbclient: Session und Tree Connects dieses Eintrags
+        self.cache: Dict[str, Any] = {}
+        self.session = None
+        self.last_used = 0.0
+
+
+class SmbConnectionPool:
+    """Per-worker pool of SMB connections for concurrent uploads.
+
+    Each pooled entry is its own TCP connection with an authenticated session;
+    smbclient keeps the tree connect of the share on that session, so it is also
+    reused.  A connection that was idle for ``health_check_after`` seconds is
+    probed with an SMB2 ECHO before use and replaced if the probe fails, instead of
+    finding out through a failed write.  Up to ``size`` uploads run at the same
+    time; further callers wait for a free connection.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        username: str,
+        password: str,
+        port: int = 445,
+        size: int = 2,
+        health_check_after: float = 30.0,
+        timeout: float = 10.0,
+    ) -> None:
+        if size < 1:
+            raise ValueError("SmbConnectionPool benötigt mindestens eine Verbindung.")
+        self.server = server
+        self.username = username
+        self.password = password
+        self.port = port
+        self.size = size
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        # LIFO: die zuletzt genutzte (am ehesten noch lebendige) Verbindung zuerst
+        self._idle: "queue.LifoQueue[_PooledConnection]" = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(_PooledConnection())
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConnection]:
+        """Leiht eine verbundene, geprüfte Verbindung aus; bei einem Fehler im Block wird sie verworfen."""
+        try:
+            entry = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Keine freie SMB-Verbindung innerhalb von {self.timeout}s.") from None
+        try:
+            self._ensure_connected(entry)
+            yield entry
+        except BaseException:
+            self._discard(entry)
+            raise
+        else:
+            entry.last_used = time.monotonic()
+        finally:
+            self._idle.put(entry)
+
+    def write_file(self, remote_path: str, write_remote: Callable[[Any], None]) -> None:
+        """Öffnet *remote_path* ungepuffert zum Schreiben und lässt *write_remote* den Inhalt schreiben.
+
+        Scheitert der Upload auf einer wiederverwendeten Verbindung, wird er einmal
+        auf einer frischen Verbindung wiederholt.
+        """
+        import smbclient  # noqa: PLC0415
+
+        for attempt in (1, 2):
+            reused = False
+            try:
+                with self.connection() as entry:
+                    reused = entry.last_used > 0
+                    with smbclient.open_file(remote_path, mode='wb', buffering=0,
+                                             port=self.port, connection_cache=entry.cache) as remote_file:
+                        write_remote(remote_file)
+                return
+            except Exception as e:
+                if attempt == 2 or not reused:
+                    raise
+                logger.info(f"SMB-Upload über bestehende Verbindung fehlgeschlagen ({e}). Neuer Versuch mit frischer Verbindung.")
+
+    def close(self) -> None:
+        """Trennt alle Verbindungen (z. B. nach fork(), die Sockets gehören dem Elternprozess)."""
+        entries: List[_PooledConnection] = []
+        while True:
+            try:
+                entries.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for entry in entries:
+            self._discard(entry)
+            self._idle.put(entry)
+
+    def _ensure_connected(self, entry: _PooledConnection) -> None:
+        if entry.session is not None and not self._healthy(entry):
+            logger.info(f"SMB-Verbindung zu {self.server} antwortet nicht mehr, wird neu aufgebaut.")
+            self._discard(entry)
+        if entry.session is None:
+            import smbclient  # noqa: PLC0415
+
+            entry.session = smbclient.register_session(
+                self.server, username=self.username, password=self.password, port=self.port,
+                connection_timeout=self.timeout, connection_cache=entry.cache,
+            )
+            entry.last_used = 0.0
+
+    def _healthy(self, entry: _PooledConnection) -> bool:
+        connection = entry.session.connection
+        if not connection.transport.connected:
+            return False
+        if time.monotonic() - entry.last_used < self.health_check_after:
+            return True
+        try:
+            connection.echo(sid=entry.session.session_id, timeout=self.timeout)
+        except Exception as e:
+            logger.debug(f"SMB-Echo an {self.server} fehlgeschlagen: {e}")
+            return False
+        return True
+
+    @staticmethod
+    def _discard(entry: _PooledConnection) -> None:
+        import smbclient  # noqa: PLC0415
+
+        entry.session = None
+        entry.last_used = 0.0
+        smbclient.reset_connection_cache(fail_on_error=False, connection_cache=entry.cache)
@@ -1,78 +1,198 @@
 import glob
 import logging
 import os
-import shutil
+import threading
 import time
-from typing import Any, Dict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Optional, Tuple
+
+from .metrics import metrics
+from .storage_backends import StorageBackend, create_backends, create_smb_backend, write_atomic
+
+if TYPE_CHECKING:
+    from .outbox import Outbox
 
 logger = logging.getLogger(__name__)
 
+# Unterverzeichnis von pdfs/ mit einer leeren Marker-Datei je lokalem SMB-Fallback
+FALLBACK_MARKER_DIR = 'fallback'
+
+
+def fallback_marker(local_path: str) -> str:
+    """Path of the marker that flags *local_path* as a local fallback still to be uploaded."""
+    directory, name = os.path.split(local_path)
+    return os.path.join(directory, FALLBACK_MARKER_DIR, name)
+
+
+def _mark_fallback(local_path: str) -> None:
+    marker = fallback_marker(local_path)
+    try:
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        open(marker, 'w').close()
+    except OSError as e:
+        logger.warning(f"Fallback-Marker für {local_path} konnte nicht angelegt werden: {e}")
+
+
+def _smb_settings(smb_config: Dict[str, Any]) -> Tuple[str, str, str, str, str]:
+    """Returns (server, share, folder, username, password); raises RuntimeError if incomplete."""
+    server = smb_config.get('server')
+    share = smb_config.get('share')
+    folder = smb_config.get('folder', '')
+    username = smb_config.get('username')
+    password = smb_config.get('password')
+    if not (server and share and username and password):
+        raise RuntimeError("SMB ist aktiviert, aber Zugangsdaten/Pfade fehlen.")
+    return server, share, folder, username, password
+
 
 class PdfStorage:
-    """Handles PDF storage: local file system and SMB share uploads."""
+    """Handles PDF storage: local file system and SMB share uploads.
+
+    The primary target is the SMB share (an ``SmbBackend``, with outbox and local
+    fallback) or the local ``pdfs/`` directory.  Besides it every document is written to the additional
+    ``storage.targets`` (``configure_targets()``).  They run in parallel with the
+    primary upload, so the response waits for the slowest required target instead
+    of the sum of all targets.
+    """
 
     def __init__(self) -> None:
-        # SMB session is registered lazily on first use and reused for subsequent uploads.
-        self._smb_session_registered: bool = False
+        # Primärer SMB-Share samt Verbindungspool, beim ersten Upload angelegt und wiederverwendet
+        self._smb_backend: Optional[StorageBackend] = None
+        self._smb_backend_key: Optional[Tuple] = None
+        self._smb_backend_lock = threading.Lock()
+        # Optionale Outbox: bei aktivem SMB wird nur lokal gespoolt und im Hintergrund hochgeladen.
+        self.outbox: Optional["Outbox"] = None
+        # Zusätzliche Speicherziele (storage.targets), parallel zum primären Ziel beschrieben
+        self.targets: List[StorageBackend] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._max_workers = 4
+        self._wait_timeout = 30.0
+
+    def configure_targets(self, storage_config: Dict[str, Any]) -> None:
+        """Erstellt die zusätzlichen Speicherziele (pro Prozess, nach fork() erneut aufrufen)."""
+        self.targets = create_backends(storage_config)
+        self._max_workers = storage_config.get('max_workers', 4)
+        self._wait_timeout = storage_config.get('wait_timeout', 30.0)
+        # Threads überleben fork() nicht; der Executor wird beim ersten Schreiben neu angelegt
+        self._executor = None
+        for target in self.targets:
+            logger.info(f"Zusätzliches Speicherziel: {target.name} ({target.kind}, "
+                        f"{'erforderlich' if target.required else 'optional'})")
 
-    def store_pdf(self, temp_path: str, local_final: str, filename_parts: list[str], config: Dict[str, Any]) -> dict:
-        """Speichert ein PDF entweder lokal oder auf dem SMB-Share.
+    def store_pdf_bytes(self, pdf_bytes: bytes, local_final: str, filename_parts: list[str], config: Dict[str, Any]) -> dict:
+        """Speichert ein PDF direkt aus dem Speicher lokal oder auf dem SMB-Share.
 
-        Wenn SMB deaktiviert ist, wird einfach umbenannt.
-        Bei Netzwerk-Problemen wird lokal gespeichert und eine Warnung zurückgegeben.
+        Die Bytes werden ohne Umweg über eine temporäre Datei in das SMB-Handle
+        geschrieben bzw. atomar lokal abgelegt. Bei Netzwerk-Problemen wird lokal
+        gespeichert und eine Warnung zurückgegeben; mit Outbox wird das PDF nur in
+        den Spool gelegt und später hochgeladen.
 
         Returns:
-            dict mit 'stored_via' ('smb' oder 'local') und optional 'warning'.
+            dict mit 'stored_via' ('smb', 'outbox' oder 'local') und optional 'warning'
+            sowie 'targets' (Ergebnis je zusätzlichem Speicherziel).
         """
-        smb_config = config.get('smb', {})
-        if not smb_config.get('enabled'):
-            logger.info("SMB ist deaktiviert. Speichere PDF lokal.")
-            os.rename(temp_path, local_final)
-            return {"stored_via": "local", "filename": os.path.basename(local_final)}
+        pending = self._fan_out(pdf_bytes, filename_parts)
+        if self._outbox_enabled(config):
+            result = self._enqueue(pdf_bytes, filename_parts)
+            if result is not None:
+                return self._collect(pending, result)
 
-        # Lazy import: only load smbprotocol when SMB is actually used
-        import smbclient  # noqa: PLC0415
+        result = self._store(pdf_bytes, local_final, filename_parts, config)
+        return self._collect(pending, result)
 
-        logger.info("SMB ist aktiviert. Versuche Upload.")
+    def _fan_out(self, pdf_bytes: bytes, filename_parts: list[str]) -> Dict[Future, StorageBackend]:
+        """Startet das Schreiben auf alle zusätzlichen Speicherziele, bevor das primäre Ziel beschrieben wird."""
+        if not self.targets:
+            return {}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='storage')
+        filename = f"{'_'.join(filename_parts)}.pdf"
+        return {self._executor.submit(self._write_target, target, filename, pdf_bytes): target
+                for target in self.targets}
+
+    @staticmethod
+    def _write_target(target: StorageBackend, filename: str, pdf_bytes: bytes) -> str:
+        with metrics.time('formflow_storage_target_seconds', target=target.name) as labels:
+            try:
+                location = target.write(filename, pdf_bytes)
+            except Exception as e:
+                labels['result'] = 'error'
+                logger.warning(f"Speicherziel {target.name} fehlgeschlagen: {e}")
+                raise
+            labels['result'] = 'ok'
+        logger.info(f"PDF auf Speicherziel {target.name} gespeichert: {location}")
+        return location
 
-        server = smb_config.get('server')
-        share = smb_config.get('share')
-        folder = smb_config.get('folder', '')
-        username = smb_config.get('username')
-        password = smb_config.get('password')
+    def _collect(self, pending: Dict[Future, StorageBackend], result: dict) -> dict:
+        """Wartet höchstens ``storage.wait_timeout`` auf die erforderlichen Speicherziele und ergänzt *result*."""
+        if not pending:
+            return result
+        required = [future for future, target in pending.items() if target.required]
+        wait(required, timeout=self._wait_timeout)
+        targets: Dict[str, str] = {}
+        failed = []
+        for future, target in pending.items():
+            if not future.done():
+                # Optional oder zu langsam: läuft im Hintergrund weiter, das Ergebnis steht noch aus
+                targets[target.name] = 'pending'
+                if target.required:
+                    failed.append(target.name)
+            elif future.exception() is not None:
+                targets[target.name] = 'error'
+                if target.required:
+                    failed.append(target.name)
+            else:
+                targets[target.name] = 'ok'
+        result = {**result, 'targets': targets}
+        if failed:
+            message = f"Die Datei konnte nicht auf allen Speicherzielen abgelegt werden: {', '.join(failed)}"
+            result['warning'] = f"{result['warning']} {message}" if result.get('warning') else message
+        return result
 
-        if not (server and share and username and password):
-            raise RuntimeError("SMB ist aktiviert, aber Zugangsdaten/Pfade fehlen.")
+    def _outbox_enabled(self, config: Dict[str, Any]) -> bool:
+        return self.outbox is not None and bool(config.get('smb', {}).get('enabled'))
 
+    def _enqueue(self, pdf_bytes: bytes, filename_parts: list[str]) -> Optional[dict]:
+        """Legt das PDF in die Outbox; None, wenn der Spool nicht beschreibbar ist (dann direkter Upload)."""
         try:
-            # Register the SMB session lazily on first use; skip if already registered.
-            if not self._smb_session_registered:
-                smbclient.register_session(server, username=username, password=password)
-                self._smb_session_registered = True
+            with metrics.time('formflow_storage_seconds', backend='outbox'):
+                filename = self.outbox.enqueue(f"{'_'.join(filename_parts)}.pdf", pdf_bytes)
+        except OSError as e:
+            logger.warning(f"Outbox nicht beschreibbar ({e}). Lade PDF direkt hoch.")
+            return None
+        return {"stored_via": "outbox", "filename": filename}
 
-            folder_part = f"\\{folder}" if folder else ""
-            remote_path = fr"\\{server}\{share}{folder_part}\{'_'.join(filename_parts)}.pdf"
+    def _store(self, pdf_bytes: bytes, local_final: str, filename_parts: list[str], config: Dict[str, Any]) -> dict:
+        """Writes the primary target: the SMB share with local fallback, or *local_final*."""
+        backend = 'smb' if config.get('smb', {}).get('enabled') else 'local'
+        with metrics.time('formflow_storage_seconds', backend=backend) as labels:
+            result = self._store_timed(pdf_bytes, local_final, filename_parts, config)
+            # Lokale Ablage nach fehlgeschlagenem SMB-Upload (erkennbar an der Warnung)
+            labels['backend'] = 'fallback' if 'warning' in result else result['stored_via']
+        if 'warning' in result:
+            metrics.inc('formflow_smb_fallbacks_total')
+        return result
 
-            try:
-                with open(temp_path, 'rb') as local_file:
-                    with smbclient.open_file(remote_path, mode='wb') as remote_file:
-                        shutil.copyfileobj(local_file, remote_file, length=65536)
-            except Exception:
-                # Session may have expired or been disconnected; attempt to re-register once.
-                logger.info("SMB-Verbindung unterbrochen oder Session abgelaufen. Versuche erneute Session-Registrierung.")
-                self._smb_session_registered = False
-                smbclient.register_session(server, username=username, password=password)
-                self._smb_session_registered = True
-                with open(temp_path, 'rb') as local_file:
-                    with smbclient.open_file(remote_path, mode='wb') as remote_file:
-                        shutil.copyfileobj(local_file, remote_file, length=65536)
+    def _store_timed(self, pdf_bytes: bytes, local_final: str, filename_parts: list[str],
+                     config: Dict[str, Any]) -> dict:
+        smb_config = config.get('smb', {})
+        if not smb_config.get('enabled'):
+            logger.info("SMB ist deaktiviert. Speichere PDF lokal.")
+            write_atomic(local_final, pdf_bytes)
+            return {"stored_via": "local", "filename": os.path.basename(local_final)}
 
+        logger.info("SMB ist aktiviert. Versuche Upload.")
+        smb_backend = self._get_smb_backend(smb_config)
+
+        try:
+            remote_path = smb_backend.write(f"{'_'.join(filename_parts)}.pdf", pdf_bytes)
             logger.info(f"PDF erfolgreich auf SMB-Share gespeichert: {remote_path}")
-            os.remove(temp_path)
             return {"stored_via": "smb", "filename": os.path.basename(remote_path)}
         except Exception as e:
             logger.warning(f"SMB-Upload fehlgeschlagen ({e}). Speichere PDF lokal als Fallback.")
-            os.rename(temp_path, local_final)
+            write_atomic(local_final, pdf_bytes)
+            # Nur markierte PDFs lädt die Outbox später nach; pdfs/ bleibt sonst unangetastet
+            _mark_fallback(local_final)
             local_name = os.path.basename(local_final)
             return {
                 "stored_via": "local",
@@ -80,6 +200,51 @@ class PdfStorage:
                 "warning": f"Der SMB-Server konnte nicht erreicht werden. Die Datei wurde lokal gespeichert unter: {local_name}"
             }
 
+    def upload_file(self, local_file: BinaryIO, remote_name: str, config: Dict[str, Any]) -> str:
+        """Lädt die geöffnete Datei *local_file* als *remote_name* auf den SMB-Share hoch (ohne Fallback).
+
+        Wird vom Outbox-Uploader genutzt; Fehler werden an den Aufrufer weitergereicht.
+
+        Returns:
+            Der vollständige SMB-Pfad der hochgeladenen Datei.
+        """
+        smb_backend = self._get_smb_backend(config.get('smb', {}))
+        with metrics.time('formflow_storage_seconds', backend='smb'):
+            remote_path = smb_backend.write_file(remote_name, local_file)
+        logger.info(f"PDF erfolgreich auf SMB-Share gespeichert: {remote_path}")
+        return remote_path
+
+    def _get_smb_backend(self, smb_config: Dict[str, Any]) -> StorageBackend:
+        """Returns the primary SMB target for *smb_config*, (re)creating it when the settings change.
+
+        Raises:
+            RuntimeError: Zugangsdaten oder Pfade fehlen (kein lokaler Fallback).
+        """
+        _smb_settings(smb_config)
+        key = tuple(sorted((k, str(v)) for k, v in smb_config.items()))
+        with self._smb_backend_lock:
+            if self._smb_backend is None or self._smb_backend_key != key:
+                if self._smb_backend is not None:
+                    self._smb_backend.close()
+                self._smb_backend = create_smb_backend(smb_config)
+                self._smb_backend_key = key
+            return self._smb_backend
+
+    def close_targets(self) -> None:
+        """Beendet die Hintergrund-Threads und trennt die zusätzlichen Speicherziele."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for target in self.targets:
+            target.close()
+
+    def reset_smb(self) -> None:
+        """Vergisst den SMB-Share samt Pool, ohne die Verbindungen zu trennen (nach fork(): Sockets des Masters)."""
+        # Frisches Lock: ein im Master gehaltenes wäre im Kind für immer belegt
+        self._smb_backend_lock = threading.Lock()
+        self._smb_backend = None
+        self._smb_backend_key = None
+
     def cleanup_temp_files(self, max_age_seconds: int = 3600) -> None:
         """Löscht verwaiste temporäre PDFs, die älter als max_age_seconds sind.
 
@@ -97,4 +262,5 @@ class PdfStorage:
             except OSError as e:
                 logger.warning(f"Konnte temp-Datei nicht löschen {path}: {e}")
         if cleaned:
+            metrics.inc('formflow_temp_files_cleaned_total', cleaned)
             logger.info(f"Cleanup: {cleaned} verwaiste temp-Datei(en) gelöscht.")
@@ -0,0 +1,257 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import logging
+import os
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from .smb_pool import WRITE_CHUNK_SIZE, SmbConnectionPool, write_all
+
+logger = logging.getLogger(__name__)
+
+_EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Writes *data* to *path* via a temporary sibling file and an atomic rename."""
+    part_path = path + '.part'
+    with open(part_path, 'wb') as f:
+        f.write(data)
+    os.replace(part_path, path)
+
+
+def copy_to_remote(local_file: BinaryIO, remote_file) -> None:
+    """Copies a local file into an unbuffered SMB file in large writes instead of 64 KB chunks."""
+    while True:
+        chunk = local_file.read(WRITE_CHUNK_SIZE)
+        if not chunk:
+            return
+        write_all(remote_file, chunk)
+
+
+class StorageBackend(ABC):
+    """A storage target for finished PDFs.
+
+    Subclasses implement ``write()``; it must either store the complete document
+    or raise.  ``required`` targets are awaited before /confirm answers, optional
+    ones finish in the background.  Backends are used from several threads at once.
+    The primary SMB share (``PdfStorage``) is an ``SmbBackend`` as well.
+    """
+
+    kind = ''
+
+    def __init__(self, name: str = '', required: bool = True) -> None:
+        self.name = name or self.kind
+        self.required = required
+
+    @abstractmethod
+    def write(self, filename: str, data: bytes) -> str:
+        """Speichert *data* als *filename* und gibt den Speicherort (Pfad oder URL) zurück."""
+
+    def write_file(self, filename: str, local_file: BinaryIO) -> str:
+        """Speichert die geöffnete Datei *local_file* als *filename* (Standard: komplett einlesen)."""
+        local_file.seek(0)
+        return self.write(filename, local_file.read())
+
+    def close(self) -> None:
+        """Gibt Verbindungen frei (Standard: nichts zu tun)."""
+
+
+class LocalDirectoryBackend(StorageBackend):
+    """Local directory, e.g. an archive volume; files are replaced atomically."""
+
+    kind = 'local'
+
+    def __init__(self, directory: str, name: str = '', required: bool = True) -> None:
+        super().__init__(name, required)
+        if not directory:
+            raise ValueError("Speicherziel 'local' benötigt ein Verzeichnis (directory).")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def write(self, filename: str, data: bytes) -> str:
+        path = os.path.join(self.directory, os.path.basename(filename))
+        write_atomic(path, data)
+        return path
+
+
+class SmbBackend(StorageBackend):
+    """SMB share with its own connection pool (the primary share or an additional target)."""
+
+    kind = 'smb'
+
+    def __init__(self, server: str, share: str, username: str, password: str, folder: str = '',
+                 port: int = 445, timeout: float = 10.0, name: str = '', required: bool = True,
+                 pool_size: int = 2, health_check_after: float = 30.0) -> None:
+        super().__init__(name, required)
+        if not (server and share and username and password):
+            raise ValueError("Speicherziel 'smb' benötigt server, share, username und password.")
+        folder_part = f"\\{folder}" if folder else ""
+        self.base_path = fr"\\{server}\{share}{folder_part}"
+        self.pool = SmbConnectionPool(server, username, password, port=port, size=pool_size,
+                                      health_check_after=health_check_after, timeout=timeout)
+
+    def write(self, filename: str, data: bytes) -> str:
+        remote_path = self._remote_path(filename)
+        self.pool.write_file(remote_path, lambda remote_file: write_all(remote_file, data))
+        return remote_path
+
+    def write_file(self, filename: str, local_file: BinaryIO) -> str:
+        def copy(remote_file) -> None:
+            local_file.seek(0)  # auch beim zweiten Versuch über eine frische Verbindung
+            copy_to_remote(local_file, remote_file)
+
+        remote_path = self._remote_path(filename)
+        self.pool.write_file(remote_path, copy)
+        return remote_path
+
+    def _remote_path(self, filename: str) -> str:
+        return fr"{self.base_path}\{os.path.basename(filename)}"
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class _HttpBackend(StorageBackend):
+    """Shared HTTP PUT for WebDAV and S3 (stdlib only, no extra dependencies)."""
+
+    def __init__(self, timeout: float = 10.0, name: str = '', required: bool = True) -> None:
+        super().__init__(name, required)
+        self.timeout = timeout
+
+    def _put(self, url: str, data: bytes, headers: Dict[str, str]) -> None:
+        request = urllib.request.Request(url, data=data, headers=headers, method='PUT')
+        # HTTPError (4xx/5xx) wird an den Aufrufer weitergereicht
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class WebDavBackend(_HttpBackend):
+    """WebDAV collection (e.g. Nextcloud); the collection must already exist."""
+
+    kind = 'webdav'
+
+    def __init__(self, url: str, username: str = '', password: str = '', timeout: float = 10.0,
+                 name: str = '', required: bool = True) -> None:
+        super().__init__(timeout, name, required)
+        if not url:
+            raise ValueError("Speicherziel 'webdav' benötigt eine URL.")
+        self.url = url.rstrip('/')
+        self._headers = {'Content-Type': 'application/pdf'}
+        if username:
+            token = base64.b64encode(f"{username}:{password}".encode()).decode('ascii')
+            self._headers['Authorization'] = f"Basic {token}"
+
+    def write(self, filename: str, data: bytes) -> str:
+        url = f"{self.url}/{urllib.parse.quote(os.path.basename(filename))}"
+        self._put(url, data, self._headers)
+        return url
+
+
+def sign_v4(method: str, url: str, headers: Dict[str, str], payload_hash: str, region: str,
+            access_key: str, secret_key: str, service: str = 's3',
+            now: Optional[datetime.datetime] = None) -> Dict[str, str]:
+    """Signs a request with AWS Signature Version 4 and returns all headers to send.
+
+    *url* must already be URI-encoded; *payload_hash* is the hex SHA-256 of the body.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+    parts = urllib.parse.urlsplit(url)
+    signed = {key.lower(): ' '.join(str(value).split()) for key, value in headers.items()}
+    signed.update({'host': parts.netloc, 'x-amz-date': amz_date, 'x-amz-content-sha256': payload_hash})
+    names = sorted(signed)
+    query = '&'.join(sorted(
+        f"{urllib.parse.quote(k, safe='-_.~')}={urllib.parse.quote(v, safe='-_.~')}"
+        for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+    ))
+    canonical_request = '\n'.join([
+        method, parts.path or '/', query,
+        ''.join(f"{name}:{signed[name]}\n" for name in names),
+        ';'.join(names), payload_hash,
+    ])
+    scope = f"{amz_date[:8]}/{region}/{service}/aws4_request"
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    key = f"AWS4{secret_key}".encode()
+    for part in (amz_date[:8], region, service, 'aws4_request'):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    signed['authorization'] = (f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+                               f"SignedHeaders={';'.join(names)}, Signature={signature}")
+    return signed
+
+
+class S3Backend(_HttpBackend):
+    """S3-compatible object storage (AWS S3, MinIO, Ceph RGW) with path-style URLs."""
+
+    kind = 's3'
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = 'us-east-1', prefix: str = '', timeout: float = 10.0,
+                 name: str = '', required: bool = True) -> None:
+        super().__init__(timeout, name, required)
+        if not (endpoint and bucket and access_key and secret_key):
+            raise ValueError("Speicherziel 's3' benötigt endpoint, bucket, access_key und secret_key.")
+        self.endpoint = endpoint.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip('/')
+
+    def write(self, filename: str, data: bytes) -> str:
+        key = '/'.join(part for part in (self.prefix, os.path.basename(filename)) if part)
+        url = f"{self.endpoint}/{self.bucket}/{urllib.parse.quote(key, safe='/-_.~')}"
+        headers = sign_v4('PUT', url, {'Content-Type': 'application/pdf'},
+                          hashlib.sha256(data).hexdigest(), self.region, self.access_key, self.secret_key)
+        # urllib setzt Host selbst; doppelt gesendet würde die Signatur ungültig
+        headers.pop('host')
+        self._put(url, data, headers)
+        return f"s3://{self.bucket}/{key}"
+
+
+def create_backend(target: Dict[str, Any]) -> StorageBackend:
+    """Erstellt ein Speicherziel aus einem Eintrag von ``storage.targets``."""
+    kind = target.get('type')
+    common = {'name': target.get('name', ''), 'required': target.get('required', True)}
+    timeout = target.get('timeout', 10.0)
+    if kind == 'local':
+        return LocalDirectoryBackend(target.get('directory', ''), **common)
+    if kind == 'smb':
+        return SmbBackend(target.get('server', ''), target.get('share', ''), target.get('username', ''),
+                          target.get('password', ''), folder=target.get('folder', ''),
+                          port=target.get('port') or 445, timeout=timeout, **common)
+    if kind == 'webdav':
+        return WebDavBackend(target.get('url', ''), target.get('username', ''), target.get('password', ''),
+                             timeout=timeout, **common)
+    if kind == 's3':
+        return S3Backend(target.get('endpoint', ''), target.get('bucket', ''), target.get('access_key', ''),
+                         target.get('secret_key', ''), region=target.get('region', 'us-east-1'),
+                         prefix=target.get('prefix', ''), timeout=timeout, **common)
+    raise ValueError(f"Unbekannter Speicherziel-Typ: {kind}")
+
+
+def create_smb_backend(smb_config: Dict[str, Any]) -> SmbBackend:
+    """Erstellt das primäre SMB-Ziel gemäß ``smb``-Konfiguration."""
+    return SmbBackend(
+        smb_config.get('server', ''), smb_config.get('share', ''), smb_config.get('username', ''),
+        smb_config.get('password', ''), folder=smb_config.get('folder', ''),
+        port=smb_config.get('port', 445), timeout=smb_config.get('timeout', 10.0), name='smb',
+        pool_size=smb_config.get('pool_size', 2),
+        health_check_after=smb_config.get('health_check_after', 30.0),
+    )
+
+
+def create_backends(storage_config: Dict[str, Any]) -> List[StorageBackend]:
+    """Erstellt alle zusätzlichen Speicherziele gemäß ``storage``-Konfiguration."""
+    backends = [create_backend(target) for target in storage_config.get('targets', [])]
+    names = [backend.name for backend in backends]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Speicherziele brauchen eindeutige Namen: {names}")
+    return backends
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# W3C Trace Context: version-traceid-parentid-flags
+_TRACEPARENT_RE = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+_SPAN_KIND_INTERNAL = 1
+_SPAN_KIND_SERVER = 2
+_NOOP = nullcontext()
+
+
+class Span:
+    __slots__ = ('name', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes')
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    """The spans of one request; the first span is the request itself."""
+
+    def __init__(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> None:
+        match = _TRACEPARENT_RE.match(traceparent or '')
+        self.trace_id = match.group(1) if match else os.urandom(16).hex()
+        self.root = Span(name, match.group(2) if match else None, attributes)
+        self.spans: List[Span] = [self.root]
+        self._stack: List[Span] = [self.root]
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        current = Span(name, self._stack[-1].span_id, attributes)
+        self.spans.append(current)
+        self._stack.append(current)
+        try:
+            yield current
+        finally:
+            current.end_ns = time.time_ns()
+            self._stack.pop()
+
+    def record(self, name: str, seconds: float, **attributes: Any) -> None:
+        """Trägt eine anderswo gemessene Phase (z. B. im Render-Pool-Prozess) als abgeschlossenen Span ein."""
+        current = Span(name, self._stack[-1].span_id, attributes)
+        current.end_ns = time.time_ns()
+        current.start_ns = current.end_ns - int(seconds * 1e9)
+        self.spans.append(current)
+
+    def finish(self) -> None:
+        self.root.end_ns = time.time_ns()
+
+    def server_timing(self) -> str:
+        """Server-Timing-Header: eine Metrik je Span, die Anfrage selbst als ``total``."""
+        entries = [f'{span.name};dur={span.duration_ms:.1f}' for span in self.spans[1:]]
+        entries.append(f'total;dur={self.root.duration_ms:.1f}')
+        return ', '.join(entries)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Die Spans als OTLP/JSON-Dokument (ein ``resourceSpans``-Eintrag)."""
+        spans = []
+        for span in self.spans:
+            entry = {
+                'traceId': self.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': _SPAN_KIND_SERVER if span is self.root else _SPAN_KIND_INTERNAL,
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns or span.start_ns),
+                'attributes': [
+                    {'key': key, 'value': {'stringValue': str(value)}} for key, value in span.attributes.items()
+                ],
+            }
+            if span.parent_id:
+                entry['parentSpanId'] = span.parent_id
+            spans.append(entry)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'formflow'}}]},
+            'scopeSpans': [{'scope': {'name': 'formflow'}, 'spans': spans}],
+        }]}
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('formflow_trace', default=None)
+_export_lock = threading.Lock()
+
+
+def span(name: str, **attributes: Any):
+    """Kontextmanager für einen Span im aktuellen Request; ohne aktiven Trace ein No-op."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP
+    return trace.span(name, **attributes)
+
+
+def record(name: str, seconds: float, **attributes: Any) -> None:
+    """Trägt eine bereits gemessene Phase in den aktuellen Trace ein (ohne aktiven Trace ein No-op)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(name, seconds, **attributes)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Trace:
+    """Beginnt einen Trace für den aktuellen Request."""
+    trace = Trace(name, traceparent, **attributes)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace(export_file: str = '') -> Optional[Trace]:
+    """Beendet den aktuellen Trace und hängt ihn optional als JSON-Zeile an *export_file* an."""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    _current_trace.set(None)
+    trace.finish()
+    if export_file:
+        line = (json.dumps(trace.to_otlp(), separators=(',', ':')) + '\n').encode('utf-8')
+        try:
+            # Ein einzelnes write() mit O_APPEND, damit sich Zeilen mehrerer Worker nicht vermischen
+            with _export_lock:
+                fd = os.open(export_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+        except OSError as e:
+            logger.warning(f"Trace konnte nicht nach {export_file} geschrieben werden: {e}")
+    return trace
@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """Warms up a freshly started worker in a background thread.
+
+    Compiles all Jinja web templates, then lets the PdfGenerator compile its
+    templates and render one throwaway document per PDF template (imports
+    WeasyPrint, loads fontconfig).  ``ready`` turns True once this has finished –
+    also after a failure, so a broken warm-up never keeps a worker out of rotation.
+    """
+
+    def __init__(self) -> None:
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def start(self, app: Flask, pdf_generator, config: Dict[str, Any]) -> None:
+        """Startet den Warm-up im Hintergrund (idempotent)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self.run, args=(app, pdf_generator, config), name='warm-up', daemon=True
+        )
+        self._thread.start()
+
+    def run(self, app: Flask, pdf_generator, config: Dict[str, Any]) -> None:
+        """Führt den Warm-up synchron aus."""
+        started = time.monotonic()
+        try:
+            web_templates = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+            for name in web_templates:
+                app.jinja_env.get_template(name)
+            pdf_templates = pdf_generator.warm_up(config)
+            self.duration = time.monotonic() - started
+            logger.info(f"Warm-up abgeschlossen in {self.duration:.1f}s: {len(web_templates)} Web-Templates, "
+                        f"{pdf_templates} PDF-Template(s) gerendert.")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Warm-up fehlgeschlagen: {e}", exc_info=True)
+        finally:
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wartet auf das Ende des Warm-ups; True, wenn abgeschlossen."""
+        return self._done.wait(timeout)
@@ -1,3 +1,36 @@
+// Kompakte Vektor-Kodierung einer Unterschrift (statt PNG-Data-URL):
+//   sig1:<breite>x<höhe>:x,y x,y x,y;x,y x,y
+// Koordinaten in CSS-Pixeln des Zeichenfelds, Striche durch ';' getrennt.
+// Der Server rendert daraus ein SVG für das PDF.
+const SIGNATURE_PREFIX = 'sig1:';
+
+function encodeSignature(pad, canvas) {
+    const strokes = pad.toData()
+        .map(group => group.points.map(p => `${Math.round(p.x)},${Math.round(p.y)}`).join(' '))
+        .filter(stroke => stroke.length > 0);
+    return `${SIGNATURE_PREFIX}${canvas.offsetWidth}x${canvas.offsetHeight}:${strokes.join(';')}`;
+}
+
+function decodeSignature(value) {
+    const strokeData = value.slice(SIGNATURE_PREFIX.length).split(':')[1] || '';
+    return strokeData.split(';').filter(Boolean).map(stroke => ({
+        points: stroke.split(' ').map((pair, i) => {
+            const [x, y] = pair.split(',').map(Number);
+            // Zeitstempel künstlich gleichmäßig, damit die Strichbreite ruhig bleibt
+            return { x, y, pressure: 0.5, time: i * 16 };
+        }),
+    }));
+}
+
+function restoreSignature(pad, value) {
+    if (value.startsWith(SIGNATURE_PREFIX)) {
+        pad.fromData(decodeSignature(value));
+    } else {
+        // PNG-Data-URL aus älteren Entwürfen
+        pad.fromDataURL(value);
+    }
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     // Finde alle Canvas-Elemente, die als Signature-Pad dienen sollen
     const signatureCanvases = document.querySelectorAll('.signature-pad');
@@ -25,10 +58,10 @@ document.addEventListener('DOMContentLoaded', () => {
             if (vectorData) {
                 pad.fromData(vectorData);
                 if (hiddenInput) {
-                    hiddenInput.value = pad.toDataURL();
+                    hiddenInput.value = encodeSignature(pad, canvas);
                 }
             } else if (hiddenInput && hiddenInput.value) {
-                pad.fromDataURL(hiddenInput.value);
+                restoreSignature(pad, hiddenInput.value);
             }
         }
 
@@ -37,7 +70,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // Wenn wir vom "Bearbeiten" zurückkommen, Unterschrift wiederherstellen
         if (hiddenInput && hiddenInput.value) {
-            pad.fromDataURL(hiddenInput.value);
+            restoreSignature(pad, hiddenInput.value);
         }
 
         // Löschen-Button Logik
@@ -64,7 +97,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
                 // Unterschrift ins hidden input schreiben, falls neu gezeichnet
                 if (!pad.isEmpty()) {
-                    if (hiddenInput) hiddenInput.value = pad.toDataURL();
+                    if (hiddenInput) hiddenInput.value = encodeSignature(pad, canvas);
                 }
 
                 if (isRequired && !hiddenInput.value) {
@@ -47,16 +47,95 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    pdfjsLib.getDocument(pdfUrl).promise.then(doc => {
-        pdfDoc = doc;
-        if (loading) loading.style.display = 'none';
-        canvas.style.display = 'block';
-        if (nav) nav.style.display = 'flex';
-        renderPage(currentPage);
-    }).catch(err => {
-        if (loading) loading.textContent = 'Fehler beim Laden des PDFs.';
-        console.error('Fehler beim Laden des PDFs:', err);
-    });
+    function loadPdf() {
+        pdfjsLib.getDocument(pdfUrl).promise.then(doc => {
+            pdfDoc = doc;
+            if (loading) loading.style.display = 'none';
+            canvas.style.display = 'block';
+            if (nav) nav.style.display = 'flex';
+            renderPage(currentPage);
+        }).catch(err => {
+            if (loading) loading.textContent = 'Fehler beim Laden des PDFs.';
+            console.error('Fehler beim Laden des PDFs:', err);
+        });
+    }
+
+    // Asynchrone Vorschau: Render-Status abfragen, bis das PDF bereitsteht
+    const statusUrl = canvas.dataset.statusUrl;
+    const POLL_MAX_DELAY_MS = 2000;
+    const POLL_TIMEOUT_MS = 180000;
+    const UNKNOWN_MAX_ATTEMPTS = 15;
+    const pollStart = Date.now();
+    let unknownAttempts = 0;
+
+    function showError(message) {
+        if (loading) loading.textContent = message;
+    }
+
+    // Server ausgelastet: dieselben Eingaben nach Retry-After erneut zur Vorschau senden
+    function retryPreview(seconds, message) {
+        const editForm = document.getElementById('edit-form');
+        const retryUrl = canvas.dataset.retryUrl;
+        if (!editForm || !retryUrl) {
+            showError(message);
+            return;
+        }
+        let remaining = seconds;
+        const tick = () => {
+            if (remaining <= 0) {
+                editForm.action = retryUrl;
+                editForm.submit();
+                return;
+            }
+            showError(`${message} Neuer Versuch in ${remaining} s …`);
+            remaining -= 1;
+            setTimeout(tick, 1000);
+        };
+        tick();
+    }
+
+    function pollStatus(delay) {
+        fetch(statusUrl, { cache: 'no-store' })
+            .then(response => response.json())
+            .then(job => {
+                if (job.status === 'done') {
+                    loadPdf();
+                    return;
+                }
+                if (job.status === 'busy') {
+                    retryPreview(job.retry_after || 5, job.message || 'Der PDF-Generator ist ausgelastet.');
+                    return;
+                }
+                if (job.status === 'error') {
+                    showError(job.message || 'Das PDF konnte nicht erstellt werden.');
+                    return;
+                }
+                if (job.status === 'unknown' && ++unknownAttempts > UNKNOWN_MAX_ATTEMPTS) {
+                    showError('Die Vorschau ist nicht mehr verfügbar. Bitte erneut erstellen.');
+                    return;
+                }
+                if (Date.now() - pollStart > POLL_TIMEOUT_MS) {
+                    showError('Die Erstellung des PDFs dauert zu lange. Bitte später erneut versuchen.');
+                    return;
+                }
+                const nextDelay = Math.min(delay * 1.5, POLL_MAX_DELAY_MS);
+                setTimeout(() => pollStatus(nextDelay), delay);
+            })
+            .catch(err => {
+                console.error('Fehler beim Abfragen des Render-Status:', err);
+                if (Date.now() - pollStart > POLL_TIMEOUT_MS) {
+                    showError('Fehler beim Laden des PDFs.');
+                    return;
+                }
+                setTimeout(() => pollStatus(POLL_MAX_DELAY_MS), POLL_MAX_DELAY_MS);
+            });
+    }
+
+    if (statusUrl) {
+        pollStatus(250);
+    } else {
+        loadPdf();
+    }
 
     prevBtn.addEventListener('click', () => {
         if (currentPage > 1) {
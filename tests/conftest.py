@@ -9,9 +9,11 @@ from formflow.services.form_engine import FormEngine
 
 
 @pytest.fixture
-def config():
-    """Returns a default AppSettings config as a dict."""
-    return AppSettings().model_dump()
+def config(tmp_path):
+    """Returns a default AppSettings config as a dict; previews go to a per-test directory."""
+    settings = AppSettings().model_dump()
+    settings["preview"]["directory"] = str(tmp_path / "previews")
+    return settings
 
 
 @pytest.fixture
@@ -0,0 +1,81 @@
+"""Unit tests for the in-memory WeasyPrint URL fetcher."""
+import base64
+
+import pytest
+
+from formflow.services.asset_fetcher import AssetFetcher
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    """A static directory containing a logo file."""
+    directory = tmp_path / "static"
+    directory.mkdir()
+    (directory / "logo.png").write_bytes(b"\x89PNG logo")
+    return directory
+
+
+@pytest.fixture
+def fetcher(static_dir):
+    return AssetFetcher(static_dir=str(static_dir))
+
+
+class TestDataUrls:
+    def test_base64_data_url_decoded(self, fetcher):
+        """A base64 data URL returns the decoded bytes and its MIME type."""
+        url = "data:image/png;base64," + base64.b64encode(b"signature").decode()
+        response = fetcher.fetch(url)
+        assert response.read() == b"signature"
+        assert response.content_type == "image/png"
+
+    def test_percent_encoded_data_url_decoded(self, fetcher):
+        """A non-base64 data URL is percent-decoded."""
+        response = fetcher.fetch("data:image/svg+xml,%3Csvg%2F%3E")
+        assert response.read() == b"<svg/>"
+        assert response.content_type == "image/svg+xml"
+
+    def test_data_url_decoded_once(self, fetcher, mocker):
+        """Fetching the same data URL twice decodes it only once."""
+        url = "data:image/png;base64," + base64.b64encode(b"signature").decode()
+        spy = mocker.spy(base64, "b64decode")
+        fetcher.fetch(url)
+        fetcher.fetch(url)
+        assert spy.call_count == 1
+
+    def test_data_url_cache_is_bounded(self, static_dir):
+        """Only the most recently used data URLs are kept."""
+        fetcher = AssetFetcher(static_dir=str(static_dir), max_data_urls=2)
+        for i in range(3):
+            fetcher.fetch(f"data:text/plain,{i}")
+        assert len(fetcher._data_urls) == 2
+
+
+class TestStaticAssets:
+    def test_preloaded_asset_served_from_memory(self, fetcher, static_dir):
+        """After preload the asset is served even if the file disappears from disk."""
+        logo = static_dir / "logo.png"
+        assert fetcher.preload(str(logo))
+        logo.unlink()
+
+        response = fetcher.fetch(f"file://{logo}")
+
+        assert response.read() == b"\x89PNG logo"
+        assert response.content_type == "image/png"
+
+    def test_static_asset_cached_on_first_fetch(self, fetcher, static_dir):
+        """A static file that was not preloaded is cached on first use."""
+        logo = static_dir / "logo.png"
+        fetcher.fetch(f"file://{logo}")
+        assert str(logo) in fetcher._assets
+
+    def test_preload_outside_static_dir_rejected(self, fetcher, tmp_path):
+        """Files outside the static directory are never cached."""
+        other = tmp_path / "secret.txt"
+        other.write_text("x")
+        assert fetcher.preload(str(other)) is False
+
+    def test_path_traversal_not_cached(self, fetcher, static_dir, tmp_path):
+        """A file URL escaping the static directory via '..' is not served from the cache."""
+        (tmp_path / "outside.txt").write_text("x")
+        fetcher.fetch(f"file://{static_dir}/../outside.txt")
+        assert fetcher._assets == {}
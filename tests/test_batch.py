@@ -0,0 +1,304 @@
+"""Tests for bulk PDF generation: record parsing, batch rendering, API endpoint and CLI."""
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+
+from formflow.cli import formflow_cli
+from formflow.services.batch import detect_format, iter_batch, read_records, record_to_form_data
+from formflow.services.batch_jobs import BatchJobs
+from formflow.services.render_slots import RenderSlots
+
+
+BATCH_FORM = {
+    "form_id": "handover",
+    "title": "Übergabe",
+    "submit_button": "Vorschau anzeigen",
+    "fields": [
+        {"type": "text", "name": "user", "label": "Benutzer", "in_filename": True},
+        {"type": "select", "name": "accessories", "label": "Zubehör", "multiple": True,
+         "options": ["Netzteil", "Maus"]},
+    ],
+}
+
+
+# ---------------------------------------------------------------------------
+# Record parsing
+# ---------------------------------------------------------------------------
+
+class TestReadRecords:
+    def test_csv_header_defines_fields(self):
+        records = read_records(io.StringIO("user,accessories\nMax,Netzteil;Maus\n"), "csv")
+        assert records == [{"user": "Max", "accessories": "Netzteil;Maus"}]
+
+    def test_jsonl_skips_blank_lines(self):
+        records = read_records(io.StringIO('{"user": "Max"}\n\n{"user": "Erika"}\n'), "jsonl")
+        assert [r["user"] for r in records] == ["Max", "Erika"]
+
+    def test_invalid_jsonl_line_reported(self):
+        with pytest.raises(ValueError, match="Zeile 2"):
+            read_records(io.StringIO('{"user": "Max"}\nkein json\n'), "jsonl")
+
+    def test_detect_format(self):
+        assert detect_format("rollout.CSV") == "csv"
+        assert detect_format("rollout.jsonl") == "jsonl"
+        assert detect_format("rollout.txt") is None
+
+
+class TestRecordToFormData:
+    def test_multiselect_from_csv_cell(self):
+        """Multi-select values in a CSV cell are separated by semicolons."""
+        data = record_to_form_data(BATCH_FORM, {"user": "Max", "accessories": "Netzteil; Maus"})
+        assert data["accessories"] == ["Netzteil", "Maus"]
+
+    def test_missing_fields_become_empty(self):
+        data = record_to_form_data(BATCH_FORM, {})
+        assert data == {"user": "", "accessories": []}
+
+
+# ---------------------------------------------------------------------------
+# iter_batch
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def batch_engine(engine, cwd_tmp, mocker):
+    """Engine with the batch form and a stubbed WeasyPrint step."""
+    engine.forms = {"handover": BATCH_FORM}
+    (cwd_tmp / "pdfs").mkdir()
+    mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4")
+    return engine
+
+
+class TestIterBatch:
+    def test_each_record_stored(self, batch_engine, config, cwd_tmp):
+        """Every record is rendered and stored under its generated file name."""
+        records = [{"user": "Max"}, {"user": "Erika"}]
+        results = list(iter_batch(batch_engine, "handover", records, config, workers=2))
+
+        assert sorted(r["index"] for r in results) == [0, 1]
+        assert all(r["stored_via"] == "local" for r in results)
+        assert len(list((cwd_tmp / "pdfs").glob("*_handover_*.pdf"))) == 2
+
+    def test_duplicate_file_names_made_unique(self, batch_engine, config):
+        """Identical filename fields within one batch do not overwrite each other."""
+        results = list(iter_batch(batch_engine, "handover", [{"user": "Max"}, {"user": "Max"}], config))
+        assert len({r["filename"] for r in results}) == 2
+
+    def test_failed_record_does_not_stop_batch(self, batch_engine, config, mocker):
+        """A render error is reported for its record; the others are still produced."""
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render",
+                     side_effect=[RuntimeError("kaputt"), b"%PDF-1.4"])
+        results = list(iter_batch(batch_engine, "handover", [{"user": "A"}, {"user": "B"}], config))
+        assert sum("error" in r for r in results) == 1
+        assert sum(r.get("stored_via") == "local" for r in results) == 1
+
+    def test_busy_render_slots_fail_record_after_max_wait(self, batch_engine, config, tmp_path):
+        """Waiting for a render slot is bounded by batch.max_wait instead of retrying forever."""
+        slots = RenderSlots(str(tmp_path / "slots"), slots=1)
+        batch_engine.pdf_generator.render_slots = slots
+        config["batch"]["max_wait"] = 0.01
+        taken = slots.admit()
+        try:
+            results = list(iter_batch(batch_engine, "handover", [{"user": "Max"}], config))
+        finally:
+            taken.release()
+
+        assert "Render-Slot" in results[0]["error"]
+
+    def test_zip_mode_writes_archive_only(self, batch_engine, config, cwd_tmp):
+        """With a zip file the PDFs go into the archive instead of pdfs/."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            list(iter_batch(batch_engine, "handover", [{"user": "Max"}], config, zip_file=archive))
+
+        assert len(zipfile.ZipFile(buffer).namelist()) == 1
+        assert not list((cwd_tmp / "pdfs").glob("*.pdf"))
+
+
+# ---------------------------------------------------------------------------
+# BatchJobs
+# ---------------------------------------------------------------------------
+
+class TestBatchJobs:
+    def test_running_job_of_dead_worker_reported_aborted(self, tmp_path):
+        """A job whose worker died has lost its lock, even if the worker's PID is in use again."""
+        jobs = BatchJobs(str(tmp_path))
+        job_dir = tmp_path / "deadbeef"
+        job_dir.mkdir()
+        (job_dir / "job.lock").touch()
+        status = {"job_id": "deadbeef", "form_id": "handover", "status": "running", "zip": False,
+                  "total": 2, "done": 1, "failed": 0, "errors": [], "pid": os.getpid()}
+        (job_dir / "status.json").write_text(json.dumps(status))
+
+        assert jobs.status("deadbeef")["status"] == "aborted"
+
+    def test_running_job_holds_its_lock(self, tmp_path):
+        jobs = BatchJobs(str(tmp_path))
+        release = threading.Event()
+        job_id = jobs.start("handover", 1, lambda _archive: (release.wait() and []) or [])
+
+        assert jobs.status(job_id)["status"] == "running"
+        release.set()
+        deadline = time.monotonic() + 5
+        while jobs.status(job_id)["status"] == "running" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert jobs.status(job_id)["status"] == "done"
+
+    def test_cleanup_removes_only_finished_expired_jobs(self, tmp_path):
+        jobs = BatchJobs(str(tmp_path))
+        release = threading.Event()
+        finished = jobs.start("handover", 0, lambda _archive: [])
+        running = jobs.start("handover", 1, lambda _archive: (release.wait() and []) or [])
+        deadline = time.monotonic() + 5
+        while jobs.status(finished)["status"] == "running" and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        jobs.cleanup(max_age_seconds=-1)
+
+        assert jobs.status(finished) is None
+        assert jobs.status(running)["status"] == "running"
+        release.set()
+
+    def test_cleanup_removes_running_jobs_after_max_runtime(self, tmp_path):
+        jobs = BatchJobs(str(tmp_path), max_runtime_seconds=60)
+        release = threading.Event()
+        running = jobs.start("handover", 1, lambda _archive: (release.wait() and []) or [])
+        started = time.time() - 120
+        os.utime(tmp_path / running / "job.lock", (started, started))
+
+        jobs.cleanup()
+
+        assert jobs.status(running) is None
+        release.set()
+
+
+# ---------------------------------------------------------------------------
+# API endpoint and CLI
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def batch_app(app, batch_engine):
+    batch_engine.init_app(app)
+    # render() ist gestubbt und würde reservierte Slots nie freigeben
+    batch_engine.pdf_generator.render_slots = None
+    app.cli.add_command(formflow_cli)
+    return app
+
+
+def wait_for_job(client, response, timeout=5.0):
+    """Polls the status URL of a started batch until it is no longer running."""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(response.headers["Location"]).get_json()
+        if status["status"] != "running" or time.monotonic() > deadline:
+            return status
+        time.sleep(0.01)
+
+
+class TestBatchEndpoint:
+    def test_batch_runs_as_background_job(self, batch_app, cwd_tmp):
+        """The request only starts the job; progress is read from the status endpoint."""
+        client = batch_app.test_client()
+        response = client.post(
+            "/api/batch/handover", data='{"user": "Max"}\n{"user": "Erika"}\n',
+            content_type="application/x-ndjson",
+        )
+
+        assert response.status_code == 202
+        status = wait_for_job(client, response)
+        assert status["status"] == "done"
+        assert (status["done"], status["total"], status["failed"]) == (2, 2, 0)
+        assert len(list((cwd_tmp / "pdfs").glob("*_handover_*.pdf"))) == 2
+
+    def test_csv_upload_downloaded_as_zip(self, batch_app):
+        client = batch_app.test_client()
+        response = client.post(
+            "/api/batch/handover?zip=1",
+            data={"records": (io.BytesIO(b"user\nMax\nErika\n"), "rollout.csv")},
+            content_type="multipart/form-data",
+        )
+        assert wait_for_job(client, response)["status"] == "done"
+
+        download = client.get(response.get_json()["download_url"])
+        assert download.mimetype == "application/zip"
+        assert len(zipfile.ZipFile(io.BytesIO(download.data)).namelist()) == 2
+
+    def test_failed_records_listed_in_status(self, batch_app, mocker):
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render",
+                     side_effect=[RuntimeError("kaputt"), b"%PDF-1.4"])
+        client = batch_app.test_client()
+        response = client.post("/api/batch/handover", data='{"user": "A"}\n{"user": "B"}\n')
+
+        status = wait_for_job(client, response)
+        assert status["failed"] == 1
+        assert status["errors"][0]["error"] == "kaputt"
+
+    def test_unknown_job_returns_404(self, batch_app):
+        client = batch_app.test_client()
+        assert client.get("/api/batch/jobs/nope").status_code == 404
+        assert client.get("/api/batch/jobs/nope/download").status_code == 404
+
+    def test_unknown_form_returns_404(self, batch_app):
+        assert batch_app.test_client().post("/api/batch/nope", data="").status_code == 404
+
+    def test_invalid_records_return_400(self, batch_app):
+        response = batch_app.test_client().post(
+            "/api/batch/handover?format=jsonl", data="kein json\n",
+        )
+        assert response.status_code == 400
+
+
+class TestRenderBatchCommand:
+    def test_renders_all_records(self, batch_app, cwd_tmp):
+        (cwd_tmp / "rollout.jsonl").write_text('{"user": "Max"}\n{"user": "Erika"}\n', encoding="utf-8")
+
+        result = batch_app.test_cli_runner().invoke(
+            args=["formflow", "render-batch", "handover", "rollout.jsonl", "--workers", "1"]
+        )
+
+        assert result.exit_code == 0, result.output
+        assert "2 erzeugt, 0 fehlgeschlagen" in result.output
+        assert len(list((cwd_tmp / "pdfs").glob("*.pdf"))) == 2
+
+    def test_private_pool_bypasses_shared_render_slots(self, batch_app, cwd_tmp, tmp_path):
+        """The CLI renders with its own processes; busy web slots do not hold it back."""
+        slots = RenderSlots(str(tmp_path / "slots"), slots=1)
+        generator = batch_app.extensions["formflow"].pdf_generator
+        generator.render_slots = slots
+        (cwd_tmp / "rollout.jsonl").write_text('{"user": "Max"}\n', encoding="utf-8")
+        taken = slots.admit()
+        try:
+            result = batch_app.test_cli_runner().invoke(
+                args=["formflow", "render-batch", "handover", "rollout.jsonl", "--workers", "1"]
+            )
+        finally:
+            taken.release()
+
+        assert result.exit_code == 0, result.output
+        assert generator.render_slots is slots
+
+    def test_default_pool_capped_and_uses_shared_slots(self, batch_app, cwd_tmp, tmp_path, config, mocker):
+        """Without --workers the command stays within APP_RENDER__MAX_CONCURRENT and the shared slots."""
+        config["render"]["max_concurrent"] = 1
+        slots = RenderSlots(str(tmp_path / "slots"), slots=2, reserved=0)
+        admit = mocker.spy(slots, "try_admit_background")
+        batch_app.extensions["formflow"].pdf_generator.render_slots = slots
+        mocker.patch("formflow.cli.os.sched_getaffinity", return_value=set(range(16)))
+        pool_class = mocker.patch("formflow.cli.RenderPool")
+        pool_class.return_value.workers = 1
+        (cwd_tmp / "rollout.jsonl").write_text('{"user": "Max"}\n', encoding="utf-8")
+
+        result = batch_app.test_cli_runner().invoke(args=["formflow", "render-batch", "handover", "rollout.jsonl"])
+
+        assert result.exit_code == 0, result.output
+        pool_class.assert_called_once_with(workers=1)
+        admit.assert_called_once()
+
+    def test_unknown_form_is_usage_error(self, batch_app, cwd_tmp):
+        (cwd_tmp / "rollout.csv").write_text("user\nMax\n", encoding="utf-8")
+        result = batch_app.test_cli_runner().invoke(args=["formflow", "render-batch", "nope", "rollout.csv"])
+        assert result.exit_code == 2
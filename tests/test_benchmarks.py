@@ -0,0 +1,43 @@
+"""Tests for the benchmark runner (measurement and baseline comparison), not the benchmarks themselves."""
+from benchmarks import runner
+from benchmarks.cases import CASES, make_form
+
+
+def _document(**medians):
+    return {"results": {name: {"median": median} for name, median in medians.items()}}
+
+
+class TestCompare:
+    def test_flags_regression_beyond_threshold(self):
+        rows = runner.compare(_document(a=1.0, b=1.0), _document(a=1.25, b=1.05), threshold=0.1)
+        assert {row["name"]: row["status"] for row in rows} == {"a": "regression", "b": "ok"}
+
+    def test_improvement_new_and_missing_cases(self):
+        rows = runner.compare(_document(a=1.0, gone=1.0), _document(a=0.5, added=1.0), threshold=0.1)
+        assert {row["name"]: row["status"] for row in rows} == {
+            "a": "improvement", "gone": "missing", "added": "new",
+        }
+
+
+class TestMeasure:
+    def test_setup_is_called_per_iteration_and_not_timed(self):
+        calls = []
+
+        def case(workdir):
+            return (lambda: calls.append("setup")), (lambda prepared: calls.append("run"))
+
+        result = runner.measure(case, rounds=2, min_round_seconds=0)
+
+        assert result["iterations"] == 1
+        assert calls == ["setup", "run"] * 3  # warm-up + 2 rounds
+        assert result["min"] <= result["median"]
+
+    def test_draft_cases_run(self):
+        result = runner.measure(CASES["list_drafts[drafts=10]"], rounds=1, min_round_seconds=0)
+        assert result["median"] > 0
+
+
+def test_make_form_is_deterministic():
+    first = make_form(50, signatures=2, multiselect=True, long_text=True)
+    assert first == make_form(50, signatures=2, multiselect=True, long_text=True)
+    assert sum(field["type"] == "signature" for field in first[0]["fields"]) == 2
@@ -295,7 +295,7 @@ class TestListFormsWithDrafts:
 class TestPreviewAutosaveDraft:
     def test_preview_creates_draft_when_no_draft_id(self, client, tmp_path, mocker):
         """POST /preview/<form_id> without draft_id should create a new draft file."""
-        mocker.patch("formflow.services.pdf_generator.PdfGenerator.generate")
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4")
 
         client.post("/preview/test_form", data={"name": "AutoSave", "date": "2026-06-01"})
 
@@ -307,7 +307,7 @@ class TestPreviewAutosaveDraft:
 
     def test_preview_updates_draft_when_draft_id_given(self, client, tmp_path, mocker):
         """POST /preview/<form_id> with draft_id should update the existing draft."""
-        mocker.patch("formflow.services.pdf_generator.PdfGenerator.generate")
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4")
 
         drafts_dir = str(tmp_path / "drafts")
         draft_id = save_draft(drafts_dir, "test_form", {"name": "OldName", "date": "2026-01-01"})
@@ -327,7 +327,7 @@ class TestPreviewAutosaveDraft:
 
     def test_preview_includes_draft_id_in_response(self, client, tmp_path, mocker):
         """POST /preview/<form_id> should include the draft_id in the response HTML."""
-        mocker.patch("formflow.services.pdf_generator.PdfGenerator.generate")
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4")
 
         response = client.post("/preview/test_form", data={"name": "Test"})
         html = response.get_data(as_text=True)
@@ -344,16 +344,14 @@ class TestPreviewAutosaveDraft:
 # ---------------------------------------------------------------------------
 
 class TestConfirmDeletesDraft:
-    def test_confirm_deletes_draft_on_success(self, client, tmp_path, mocker):
+    def test_confirm_deletes_draft_on_success(self, client, engine, tmp_path, mocker):
         """POST /confirm/<form_id>/<file_id> should delete the draft after successful PDF save."""
         mocker.patch(
-            "formflow.services.form_engine.FormEngine._store_pdf",
+            "formflow.services.form_engine.FormEngine._store_pdf_bytes",
             return_value={"filename": "test.pdf"},
         )
 
-        pdfs_dir = tmp_path / "pdfs"
-        pdfs_dir.mkdir(exist_ok=True)
-        (pdfs_dir / "temp_abc123.pdf").write_bytes(b"%PDF-1.4")
+        engine.preview_store.put("abc123", b"%PDF-1.4")
 
         drafts_dir = str(tmp_path / "drafts")
         draft_id = save_draft(drafts_dir, "test_form", {"name": "WillBeDeleted"})
@@ -367,16 +365,14 @@ class TestConfirmDeletesDraft:
 
         assert not draft_path.exists()
 
-    def test_confirm_without_draft_id_does_not_crash(self, client, tmp_path, mocker):
+    def test_confirm_without_draft_id_does_not_crash(self, client, engine, mocker):
         """POST /confirm/<form_id>/<file_id> without draft_id should succeed without error."""
         mocker.patch(
-            "formflow.services.form_engine.FormEngine._store_pdf",
+            "formflow.services.form_engine.FormEngine._store_pdf_bytes",
             return_value={"filename": "test.pdf"},
         )
 
-        pdfs_dir = tmp_path / "pdfs"
-        pdfs_dir.mkdir(exist_ok=True)
-        (pdfs_dir / "temp_abc123.pdf").write_bytes(b"%PDF-1.4")
+        engine.preview_store.put("abc123", b"%PDF-1.4")
 
         response = client.post(
             "/confirm/test_form/abc123",
@@ -71,17 +71,13 @@ class TestEditFormRoute:
         response = client.post("/edit/no_such_form/abc123", data={"name": "X"})
         assert response.status_code == 404
 
-    def test_edit_deletes_temp_pdf(self, client, tmp_path):
-        """POST /edit should delete the temporary PDF file if it exists."""
-        pdfs_dir = tmp_path / "pdfs"
-        pdfs_dir.mkdir(exist_ok=True)
-        temp_file = pdfs_dir / "temp_abc123.pdf"
-        temp_file.touch()
-        assert temp_file.exists()
+    def test_edit_deletes_temp_pdf(self, client, engine):
+        """POST /edit should discard the in-memory preview PDF if it exists."""
+        engine.preview_store.put("abc123", b"%PDF-1.4")
 
         client.post("/edit/test_form/abc123", data={"name": "Test"})
 
-        assert not temp_file.exists()
+        assert "abc123" not in engine.preview_store
 
     def test_edit_does_not_redirect(self, client):
         """POST /edit/<form_id>/<file_id> should NOT redirect (3xx)."""
@@ -123,7 +119,7 @@ class TestEditFormRoute:
 class TestPreviewMultiSelect:
     def test_preview_stores_multiselect_as_list(self, client, tmp_path, mocker):
         """preview_form should store multi-select values as a list, not a joined string."""
-        mocker.patch("formflow.services.pdf_generator.PdfGenerator.generate")
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4 preview content")
 
         response = client.post(
             "/preview/test_form",
@@ -138,21 +134,17 @@ class TestPreviewMultiSelect:
         assert 'value="IT, Finance"' not in html
         assert 'value="Finance, IT"' not in html
 
-    def test_preview_pdf_is_accessible(self, client, tmp_path, mocker):
+    def test_preview_pdf_is_accessible(self, client, engine, mocker):
         """After POST /preview/<form_id>, the PDF referenced by the preview must be accessible via GET /pdf/temp_<uuid>.pdf."""
-        mocker.patch("formflow.services.pdf_generator.PdfGenerator.generate")
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4 preview content")
 
         # Intercept uuid generation so we know the filename in advance
         fixed_uuid = "deadbeef1234567890abcdef12345678"
         mocker.patch("formflow.routes.main.uuid.uuid4", return_value=mocker.Mock(hex=fixed_uuid))
 
-        # Pre-create the temp PDF that the (mocked) generator would have written
-        pdfs_dir = tmp_path / "pdfs"
-        pdfs_dir.mkdir(exist_ok=True)
-        (pdfs_dir / f"temp_{fixed_uuid}.pdf").write_bytes(b"%PDF-1.4 preview content")
-
         response = client.post("/preview/test_form", data={"name": "Test"})
         assert response.status_code == 200
+        engine.render_jobs.wait(fixed_uuid, 5)
 
         pdf_response = client.get(f"/pdf/temp_{fixed_uuid}.pdf")
         assert pdf_response.status_code == 200
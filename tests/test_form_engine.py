@@ -2,6 +2,7 @@ import pytest
 import time
 
 from formflow.config import AppSettings, ColorsConfig, SmbConfig
+from formflow.services.storage_backends import SmbBackend
 
 
 def test_sanitize_for_filename(engine):
@@ -45,34 +46,24 @@ def test_generate_filename_parts(engine, monkeypatch):
     # Expected: ['2026-01-30_08-00', 'my-form', 'Max_Mustermann', 'ITSupport']
     assert parts == ["2026-01-30_08-00", "my-form", "Max_Mustermann", "ITSupport"]
 
-def test_store_pdf_locally(engine, mocker, tmp_path):
+def test_store_pdf_locally(engine, tmp_path):
     """Tests that the PDF is stored locally when SMB is disabled."""
-    # Create a dummy temp file
-    temp_file = tmp_path / "temp.pdf"
-    temp_file.touch()
-
-    # Mock os.rename to track its call
-    mock_rename = mocker.patch("os.rename")
-
     # Provide a specific config for this test case
     engine.config = AppSettings(smb=SmbConfig(enabled=False)).model_dump()
 
-    result = engine._store_pdf(str(temp_file), "/path/to/final.pdf", [])
+    result = engine._store_pdf_bytes(b"PDF content", str(tmp_path / "final.pdf"), [])
 
-    # Assert that os.rename was called with the correct arguments
-    mock_rename.assert_called_once_with(str(temp_file), "/path/to/final.pdf")
+    assert (tmp_path / "final.pdf").read_bytes() == b"PDF content"
+    assert not (tmp_path / "final.pdf.part").exists()
     assert result["stored_via"] == "local"
     assert result["filename"] == "final.pdf"
 
-def test_store_pdf_smb_success(engine, mocker, tmp_path):
+def test_store_pdf_smb_success(engine, mocker):
     """Tests a successful PDF upload to an SMB share."""
-    # Create a dummy temp file
-    temp_file = tmp_path / "temp.pdf"
-    temp_file.write_text("PDF content")
-
     # Mock SMB functions
     mock_register = mocker.patch("smbclient.register_session")
     m = mocker.mock_open()
+    m.return_value.write.side_effect = len
     mock_smb_open = mocker.patch("smbclient.open_file", m)
 
     # Provide a specific config for this test case
@@ -87,14 +78,19 @@ def test_store_pdf_smb_success(engine, mocker, tmp_path):
     engine.config = AppSettings(smb=smb_config).model_dump()
 
     filename_parts = ["notebook_handover", "test-user", "12345"]
-    result = engine._store_pdf(str(temp_file), "", filename_parts)
+    result = engine._store_pdf_bytes(b"PDF content", "", filename_parts)
 
-    # Assert that the session was registered
-    mock_register.assert_called_once_with("smb-server", username="testuser", password="testpass")
+    # Assert that the session was registered on a pooled connection
+    mock_register.assert_called_once_with(
+        "smb-server", username="testuser", password="testpass", port=445,
+        connection_timeout=10.0, connection_cache=mocker.ANY,
+    )
 
-    # Assert that the file was opened on the SMB share with the correct path
+    # Assert that the file was opened unbuffered on the SMB share with the correct path
     expected_path = r"\\smb-server\pdfs\forms\notebook_handover_test-user_12345.pdf"
-    mock_smb_open.assert_called_once_with(expected_path, mode='wb')
+    mock_smb_open.assert_called_once_with(
+        expected_path, mode='wb', buffering=0, port=445, connection_cache=mocker.ANY,
+    )
 
     # Assert that content was written
     handle = m()
@@ -110,16 +106,12 @@ def test_store_pdf_smb_missing_config_raises_error(engine):
     engine.config = AppSettings(smb=SmbConfig(enabled=True)).model_dump()
 
     with pytest.raises(RuntimeError, match="SMB ist aktiviert, aber Zugangsdaten/Pfade fehlen."):
-        engine._store_pdf("/dummy/path.pdf", "", [])
+        engine._store_pdf_bytes(b"PDF content", "", [])
 
 def test_store_pdf_smb_fallback_on_connection_error(engine, mocker, tmp_path):
     """Tests that a failed SMB upload falls back to local storage with a warning."""
-    temp_file = tmp_path / "temp.pdf"
-    temp_file.write_text("PDF content")
-
     # Mock SMB to raise a connection error
     mocker.patch("smbclient.register_session", side_effect=ConnectionError("Connection refused"))
-    mock_rename = mocker.patch("os.rename")
 
     smb_config = SmbConfig(
         enabled=True,
@@ -131,9 +123,9 @@ def test_store_pdf_smb_fallback_on_connection_error(engine, mocker, tmp_path):
     )
     engine.config = AppSettings(smb=smb_config).model_dump()
 
-    result = engine._store_pdf(str(temp_file), "/path/to/fallback.pdf", ["test"])
+    result = engine._store_pdf_bytes(b"PDF content", str(tmp_path / "fallback.pdf"), ["test"])
 
-    mock_rename.assert_called_once_with(str(temp_file), "/path/to/fallback.pdf")
+    assert (tmp_path / "fallback.pdf").read_bytes() == b"PDF content"
     assert result["stored_via"] == "local"
     assert "warning" in result
     assert "SMB-Server" in result["warning"]
@@ -202,7 +194,7 @@ def test_cleanup_temp_files_handles_oserror(engine, tmp_path, monkeypatch, caplo
         engine._cleanup_temp_files(max_age_seconds=3600)
 
     assert any("Konnte temp-Datei nicht löschen" in r.message for r in caplog.records)
-def test_store_pdf_smb_session_reused(engine, mocker, tmp_path):
+def test_store_pdf_smb_session_reused(engine, mocker):
     """Tests that the SMB session is registered only once across multiple uploads."""
     smb_config = SmbConfig(
         enabled=True,
@@ -216,21 +208,20 @@ def test_store_pdf_smb_session_reused(engine, mocker, tmp_path):
 
     mock_register = mocker.patch("smbclient.register_session")
     m = mocker.mock_open()
+    m.return_value.write.side_effect = len
     mocker.patch("smbclient.open_file", m)
 
     for i in range(3):
-        temp_file = tmp_path / f"temp{i}.pdf"
-        temp_file.write_text("PDF content")
-        engine._store_pdf(str(temp_file), "", [f"file{i}"])
+        engine._store_pdf_bytes(b"PDF content", "", [f"file{i}"])
 
     # register_session should only be called once regardless of upload count
-    mock_register.assert_called_once_with("smb-server", username="testuser", password="testpass")
-
-def test_store_pdf_smb_reregisters_on_session_expiry(engine, mocker, tmp_path):
-    """Tests that an expired session is re-registered once and the upload retried."""
-    temp_file = tmp_path / "temp.pdf"
-    temp_file.write_text("PDF content")
+    mock_register.assert_called_once()
+    assert mock_register.call_args.args == ("smb-server",)
+    # Der primäre Share ist ein SmbBackend wie die zusätzlichen SMB-Ziele
+    assert isinstance(engine._storage._smb_backend, SmbBackend)
 
+def test_store_pdf_smb_reregisters_on_session_expiry(engine, mocker):
+    """Tests that a failed upload over a reused connection is retried on a fresh session."""
     smb_config = SmbConfig(
         enabled=True,
         server="smb-server",
@@ -241,34 +232,26 @@ def test_store_pdf_smb_reregisters_on_session_expiry(engine, mocker, tmp_path):
     )
     engine.config = AppSettings(smb=smb_config).model_dump()
 
-    # Simulate a session that is already registered
-    engine._smb_session_registered = True
-
     mock_register = mocker.patch("smbclient.register_session")
     m = mocker.mock_open()
-    # First open_file call raises (simulating expired session), second succeeds
+    m.return_value.write.side_effect = len
+    # Second open_file call raises (simulating an expired session on the pooled connection)
     mock_smb_open = mocker.patch(
         "smbclient.open_file",
-        side_effect=[OSError("Session expired"), m.return_value]
+        side_effect=[m.return_value, OSError("Session expired"), m.return_value]
     )
-    m.return_value.__enter__ = lambda s: s
-    m.return_value.__exit__ = mocker.Mock(return_value=False)
-    m.return_value.write = mocker.Mock()
+    mocker.patch("smbclient.reset_connection_cache")
 
-    mocker.patch("os.remove")
+    engine._store_pdf_bytes(b"PDF content", "", ["first"])
+    result = engine._store_pdf_bytes(b"PDF content", "", ["refile"])
 
-    result = engine._store_pdf(str(temp_file), "", ["refile"])
-
-    # register_session should have been called once (for re-registration)
-    mock_register.assert_called_once_with("smb-server", username="testuser", password="testpass")
-    assert engine._smb_session_registered is True
+    # register_session: once for the first upload, once for the re-registration
+    assert mock_register.call_count == 2
+    assert mock_smb_open.call_count == 3
     assert result["stored_via"] == "smb"
 
-def test_store_pdf_smb_flag_reset_on_fallback(engine, mocker, tmp_path):
-    """Tests that _smb_session_registered is reset to False after a failed upload."""
-    temp_file = tmp_path / "temp.pdf"
-    temp_file.write_text("PDF content")
-
+def test_store_pdf_smb_session_not_pooled_on_fallback(engine, mocker, tmp_path):
+    """Tests that a failed registration leaves no session in the pool."""
     smb_config = SmbConfig(
         enabled=True,
         server="smb-server",
@@ -279,14 +262,13 @@ def test_store_pdf_smb_flag_reset_on_fallback(engine, mocker, tmp_path):
     )
     engine.config = AppSettings(smb=smb_config).model_dump()
 
-    mocker.patch("smbclient.register_session", side_effect=ConnectionError("refused"))
-    mocker.patch("os.rename")
+    mock_register = mocker.patch("smbclient.register_session", side_effect=ConnectionError("refused"))
 
-    assert engine._smb_session_registered is False
-    engine._store_pdf(str(temp_file), "/fallback.pdf", ["f"])
+    engine._store_pdf_bytes(b"PDF content", str(tmp_path / "fallback.pdf"), ["f"])
+    engine._store_pdf_bytes(b"PDF content", str(tmp_path / "fallback.pdf"), ["f"])
 
-    # Flag should remain False so the next call re-attempts registration
-    assert engine._smb_session_registered is False
+    # No session was pooled, so the next call re-attempts registration
+    assert mock_register.call_count == 2
 
 def test_colors_config_includes_bg_gray():
     """Tests that ColorsConfig includes the bg_gray field used by templates."""
@@ -0,0 +1,114 @@
+"""Tests for the HTML fast-preview mode (preview without WeasyPrint, PDF on confirm)."""
+import pytest
+
+from formflow.services.pdf_generator import PdfGenerator
+
+
+HTML_FORM = {
+    "form_id": "html_form",
+    "title": "Schnellvorschau",
+    "submit_button": "Vorschau anzeigen",
+    "preview_mode": "html",
+    "fields": [
+        {"type": "text", "name": "name", "label": "Name", "required": False, "placeholder": ""},
+    ],
+}
+
+PDF_FORM = dict(HTML_FORM, form_id="pdf_form", preview_mode="pdf")
+
+
+# ---------------------------------------------------------------------------
+# PdfGenerator.render_html
+# ---------------------------------------------------------------------------
+
+class TestRenderHtml:
+    CONFIG = {"company": {"name": "ACME", "logo_filename": "logo.png"}, "colors": {"primary": "#0056b3"}}
+
+    def test_field_values_rendered(self):
+        """The HTML preview shows the same values as the PDF."""
+        html = PdfGenerator().render_html(HTML_FORM, {"name": "Max Mustermann"}, self.CONFIG)
+        assert "Max Mustermann" in html
+
+    def test_stylesheet_inlined(self):
+        """The companion stylesheet is embedded, since the iframe cannot load pdf_templates/."""
+        html = PdfGenerator().render_html(HTML_FORM, {"name": "Max"}, self.CONFIG)
+        assert "<style>" in html
+        assert "#0056b3" in html
+
+    def test_static_urls_rewritten(self):
+        """file:///app/static/ references are served through the web static route."""
+        html = PdfGenerator().render_html(HTML_FORM, {"name": "Max"}, self.CONFIG)
+        assert "file:///app/static/" not in html
+        assert 'src="/static/logo.png"' in html
+
+
+# ---------------------------------------------------------------------------
+# Routes
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def client(app, engine):
+    """Client with one form in HTML and one in PDF preview mode."""
+    engine.forms = {"html_form": HTML_FORM, "pdf_form": PDF_FORM}
+    engine.init_app(app)
+    return app.test_client()
+
+
+class TestHtmlPreviewRoutes:
+    def test_preview_does_not_render_pdf(self, client, mocker):
+        """In HTML mode the preview is a sandboxed iframe and WeasyPrint is not called."""
+        render = mocker.patch("formflow.services.pdf_generator.PdfGenerator.render")
+
+        response = client.post("/preview/html_form", data={"name": "Max"})
+
+        html = response.get_data(as_text=True)
+        assert response.status_code == 200
+        assert "<iframe" in html
+        assert "sandbox" in html
+        assert "pdf-canvas" not in html
+        render.assert_not_called()
+
+    def test_pdf_mode_per_form_overrides_global(self, client, engine, mocker):
+        """A form with preview_mode: pdf keeps the PDF preview even if HTML is the global default."""
+        engine.config["render"]["preview_mode"] = "html"
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4")
+
+        response = client.post("/preview/pdf_form", data={"name": "Max"})
+
+        assert "pdf-canvas" in response.get_data(as_text=True)
+
+    def test_confirm_renders_pdf_from_submitted_data(self, client, mocker):
+        """Confirming an HTML preview renders the PDF once from the posted values and stores it."""
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4")
+        store = mocker.patch("formflow.services.form_engine.FormEngine._store_pdf_bytes",
+                             return_value={"filename": "test.pdf"})
+
+        response = client.post("/confirm/html_form/abc123", data={"name": "Max"})
+
+        assert response.status_code == 200
+        assert store.call_args.args[0] == b"%PDF-1.4"
+
+    def test_confirm_in_pdf_mode_uses_preview(self, client, engine, mocker):
+        """An available PDF preview is stored as is, without rendering again."""
+        render = mocker.patch("formflow.services.pdf_generator.PdfGenerator.render")
+        store = mocker.patch("formflow.services.form_engine.FormEngine._store_pdf_bytes",
+                             return_value={"filename": "test.pdf"})
+        engine.preview_store.put("abc123", b"%PDF-preview")
+
+        response = client.post("/confirm/pdf_form/abc123", data={"name": "Max"})
+
+        assert response.status_code == 200
+        assert store.call_args.args[0] == b"%PDF-preview"
+        render.assert_not_called()
+
+    def test_confirm_in_pdf_mode_renders_when_job_unknown_to_worker(self, client, engine, mocker):
+        """The preview job runs in another worker (or failed): confirm renders from the posted data."""
+        assert engine.render_jobs is not None
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4")
+        store = mocker.patch("formflow.services.form_engine.FormEngine._store_pdf_bytes",
+                             return_value={"filename": "test.pdf"})
+
+        response = client.post("/confirm/pdf_form/job-of-other-worker", data={"name": "Max"})
+
+        assert response.status_code == 200
+        assert store.call_args.args[0] == b"%PDF-1.4"
@@ -0,0 +1,39 @@
+"""Import-time budget: heavy dependencies must only be imported on first use."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), "..", "src")
+
+# Loaded lazily on first render / SMB upload / signature processing
+HEAVY_MODULES = ("weasyprint", "pydyf", "tinycss2", "cssselect2", "fontTools", "PIL", "smbclient", "smbprotocol")
+
+
+def _imported_modules(statement: str) -> dict:
+    """Runs *statement* under ``python -X importtime``; returns {module: cumulative µs}."""
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC_DIR))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@pytest.mark.parametrize("statement", [
+    "import formflow",
+    "from formflow.services.form_engine import FormEngine",
+    "from formflow import create_app",
+])
+def test_heavy_dependencies_not_imported(statement):
+    modules = _imported_modules(statement)
+    heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES)
+    assert heavy == [], f"{statement!r} imports {heavy}"
@@ -0,0 +1,170 @@
+"""Tests for the background janitor that expires temp PDFs and previews."""
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from formflow.config import JanitorConfig
+from formflow.services.janitor import Janitor, create_janitor
+
+FORM = {
+    "form_id": "test_form",
+    "title": "Testformular",
+    "fields": [{"type": "text", "name": "name", "label": "Name"}],
+}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable wall and monotonic clock for the janitor."""
+    now = {"time": 1_000_000.0}
+    monkeypatch.setattr("formflow.services.janitor.time.time", lambda: now["time"])
+    monkeypatch.setattr("formflow.services.janitor.time.monotonic", lambda: now["time"])
+    return now
+
+
+def _temp_file(path, mtime: float):
+    path.write_bytes(b"%PDF")
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Expiry heap
+# ---------------------------------------------------------------------------
+
+class TestSweep:
+    def test_removes_only_due_files(self, tmp_path, clock):
+        janitor = Janitor(max_age_seconds=100)
+        old = _temp_file(tmp_path / "temp_old.pdf", clock["time"])
+        janitor.track(str(old))
+        clock["time"] += 50
+        young = _temp_file(tmp_path / "temp_young.pdf", clock["time"])
+        janitor.track(str(young))
+
+        clock["time"] += 60
+        assert janitor.sweep() == 1
+
+        assert not old.exists()
+        assert young.exists()
+        assert len(janitor) == 1
+
+    def test_already_stored_file_is_skipped(self, tmp_path, clock):
+        janitor = Janitor(max_age_seconds=100)
+        janitor.track(str(tmp_path / "temp_gone.pdf"))
+        clock["time"] += 200
+
+        assert janitor.sweep() == 0
+        assert len(janitor) == 0
+
+    def test_rewritten_file_gets_new_deadline(self, tmp_path, clock):
+        janitor = Janitor(max_age_seconds=100)
+        path = tmp_path / "temp_doc.pdf"
+        janitor.track(str(path))
+        clock["time"] += 150
+        _temp_file(path, clock["time"] - 40)
+
+        assert janitor.sweep() == 0
+        assert path.exists()
+        clock["time"] += 61
+        assert janitor.sweep() == 1
+        assert not path.exists()
+
+    def test_only_due_entries_are_touched(self, tmp_path, clock, mocker):
+        """A sweep does not stat files whose deadline has not passed yet."""
+        janitor = Janitor(max_age_seconds=100)
+        for i in range(1000):
+            janitor.track(str(tmp_path / f"temp_{i}.pdf"))
+        getmtime = mocker.spy(os.path, "getmtime")
+
+        janitor.sweep()
+
+        getmtime.assert_not_called()
+
+
+class TestSchedule:
+    def test_scan_runs_only_every_scan_interval(self, clock, mocker):
+        scan = mocker.Mock()
+        task = mocker.Mock()
+        janitor = Janitor(max_age_seconds=100, scan_interval=3600, scan=scan, tasks=[task])
+
+        janitor.run_once()
+        clock["time"] += 3601
+        janitor.run_once()
+        janitor.run_once()
+
+        assert task.call_count == 3
+        task.assert_called_with(100)
+        scan.assert_called_once_with(100)
+
+    def test_thread_runs_on_interval(self, mocker):
+        task = mocker.Mock()
+        janitor = Janitor(interval=0.01, tasks=[task])
+        janitor.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not task.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            janitor.stop()
+        task.assert_called()
+
+    def test_created_from_settings(self):
+        janitor = create_janitor(JanitorConfig(max_age=600, interval=5).model_dump())
+        assert (janitor.max_age_seconds, janitor.interval, janitor.scan_interval) == (600, 5, 3600)
+
+
+# ---------------------------------------------------------------------------
+# FormEngine integration
+# ---------------------------------------------------------------------------
+
+class TestEngineJanitor:
+    def test_preview_does_not_scan_pdfs(self, app, engine, mocker):
+        engine.forms = {"test_form": FORM}
+        engine.init_app(app)
+        engine.render_jobs = None
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-stub")
+        scan = mocker.patch("formflow.services.storage.glob.glob")
+
+        response = app.test_client().post("/preview/test_form", data={"name": "Max"})
+
+        assert response.status_code == 200
+        assert not any("pdfs" in str(call) for call in scan.call_args_list)
+
+    def test_janitor_expires_previews(self, app, engine, clock):
+        """Stored previews are tracked in the expiry heap and removed without listing the directory."""
+        engine.init_app(app)
+        engine.preview_store.put("abc", b"%PDF")
+        path = engine.preview_store._path("abc")
+        _temp_file(Path(path), clock["time"])
+
+        assert len(engine.janitor) == 1
+        assert engine.janitor.sweep() == 0
+        clock["time"] += engine.preview_store.max_age_seconds + 1
+
+        assert engine.janitor.sweep() == 1
+        assert not os.path.exists(path)
+
+    def test_memory_previews_expire_every_interval(self, app, engine, config):
+        config["preview"]["backend"] = "memory"
+        engine.init_app(app)
+        engine.preview_store.put("abc", b"%PDF")
+        engine.preview_store.max_age_seconds = -1
+
+        engine.janitor.run_once()
+
+        assert not engine.preview_store._entries
+
+    def test_restarted_after_fork(self, app, engine, mocker):
+        engine.init_app(app)
+        janitor = engine.janitor
+
+        engine.prepare_fork()
+        assert janitor._thread is None
+        mocker.patch.object(engine, "_start_render_services")
+        engine.post_fork()
+
+        assert engine.janitor is not janitor
+        assert engine.janitor._thread.is_alive()
+        engine.janitor.stop()
@@ -0,0 +1,74 @@
+"""Tests for per-render memory accounting and the RSS ceiling."""
+import logging
+
+import pytest
+
+from formflow.services import memory as memory_module
+from formflow.services.memory import MemoryAccounting, create_memory_accounting
+from formflow.services.pdf_generator import PdfGenerator
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def rss(mocker):
+    """Patched current_rss(); tests set ``side_effect`` or ``return_value``."""
+    return mocker.patch.object(memory_module, "current_rss")
+
+
+class TestMemoryAccounting:
+    def test_current_rss_reads_proc(self):
+        value = memory_module.current_rss()
+        assert value is None or value > 0
+
+    def test_heaviest_renders_are_kept_and_logged(self, rss, caplog):
+        accounting = MemoryAccounting(keep_heaviest=2)
+        rss.side_effect = [100 * MB, 110 * MB, 110 * MB, 112 * MB, 112 * MB, 142 * MB]
+        caplog.set_level(logging.INFO, logger="formflow.services.memory")
+
+        for form_id in ("small", "tiny", "big"):
+            with accounting.track(form_id):
+                pass
+
+        assert [entry["form_id"] for entry in accounting.heaviest()] == ["big", "small"]
+        assert accounting.heaviest()[0]["rss_growth"] == 30 * MB
+        assert "Formular big +30.0 MB" in caplog.text
+
+    def test_tracemalloc_peak(self, rss):
+        accounting = MemoryAccounting(trace_allocations=True)
+        rss.side_effect = [100 * MB, 101 * MB]
+
+        with accounting.track("form"):
+            buffer = bytearray(4 * MB)
+            del buffer
+
+        assert accounting.heaviest()[0]["traced_peak"] >= 4 * MB
+
+    @pytest.mark.parametrize("max_rss_mb, current, expected", [
+        (0, 900 * MB, False),
+        (400, 300 * MB, False),
+        (400, 401 * MB, True),
+        (400, None, False),
+    ])
+    def test_over_limit(self, rss, max_rss_mb, current, expected):
+        rss.return_value = current
+        assert MemoryAccounting(max_rss_mb=max_rss_mb).over_limit() is expected
+
+    def test_created_from_config(self, config):
+        accounting = create_memory_accounting(config["memory"])
+        assert accounting.max_rss == 400 * MB
+        assert accounting.trace_allocations is False
+
+
+class TestPdfGeneratorIntegration:
+    def test_render_is_tracked_with_form_id(self, mocker):
+        generator = PdfGenerator()
+        generator.memory = mocker.MagicMock()
+        mocker.patch.object(generator, "_render_pdf", return_value=b"%PDF-stub")
+
+        generator.render({"form_id": "notebook", "fields": []}, {}, {})
+
+        generator.memory.track.assert_called_once_with("notebook")
+
+    def test_engine_sets_up_accounting(self, engine_with_app):
+        assert isinstance(engine_with_app.pdf_generator.memory, MemoryAccounting)
@@ -0,0 +1,183 @@
+"""Tests for the metrics registry and the /metrics endpoint."""
+import fcntl
+import json
+import os
+import time
+
+import pytest
+
+from formflow.services.metrics import Metrics
+from formflow.services.storage import PdfStorage
+
+
+@pytest.fixture
+def registry():
+    return Metrics()
+
+
+def _sample(text: str, line_prefix: str) -> str:
+    """Returns the value of the first exposition line starting with *line_prefix*."""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return line.rsplit(" ", 1)[1]
+    raise AssertionError(f"{line_prefix} not in output")
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+class TestRegistry:
+    def test_counter(self, registry):
+        registry.inc("formflow_smb_fallbacks_total")
+        registry.inc("formflow_smb_fallbacks_total", 2)
+        assert _sample(registry.render(), "formflow_smb_fallbacks_total") == "3"
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        registry.observe("formflow_draft_io_seconds", 0.003, operation="load")
+        registry.observe("formflow_draft_io_seconds", 0.2, operation="load")
+        registry.observe("formflow_draft_io_seconds", 120, operation="load")
+        text = registry.render()
+
+        assert _sample(text, 'formflow_draft_io_seconds_bucket{operation="load",le="0.005"}') == "1"
+        assert _sample(text, 'formflow_draft_io_seconds_bucket{operation="load",le="0.25"}') == "2"
+        assert _sample(text, 'formflow_draft_io_seconds_bucket{operation="load",le="+Inf"}') == "3"
+        assert _sample(text, 'formflow_draft_io_seconds_count{operation="load"}') == "3"
+
+    def test_in_flight_gauge(self, registry):
+        with registry.in_flight("formflow_pdf_renders_in_flight"):
+            assert _sample(registry.render(), "formflow_pdf_renders_in_flight") == "1"
+        assert _sample(registry.render(), "formflow_pdf_renders_in_flight") == "0"
+
+    def test_time_labels_can_be_set_inside_block(self, registry):
+        with registry.time("formflow_storage_seconds", backend="smb") as labels:
+            labels["backend"] = "fallback"
+        assert 'formflow_storage_seconds_count{backend="fallback"} 1' in registry.render()
+
+    def test_values_reset_after_fork(self, registry, monkeypatch):
+        """A forked worker does not report the master's values a second time."""
+        registry.inc("formflow_smb_fallbacks_total")
+        monkeypatch.setattr(os, "getpid", lambda: 999_999)
+        assert "\nformflow_smb_fallbacks_total " not in registry.render()
+
+
+def _other_process(directory, snapshot, name="metrics_4242_feedbeef"):
+    """Writes the snapshot of another process and returns the open lock file marking it as alive."""
+    (directory / f"{name}.json").write_text(json.dumps(snapshot))
+    lock_file = open(directory / f"{name}.lock", "w")
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    return lock_file
+
+
+class TestMultiprocess:
+    def test_snapshots_of_all_processes_are_summed(self, registry, tmp_path):
+        registry.configure(str(tmp_path))
+        registry.inc("formflow_smb_fallbacks_total")
+        registry.add_gauge("formflow_pdf_renders_in_flight", 1)
+        other_worker = {
+            "counters": [["formflow_smb_fallbacks_total", [], 4]],
+            "gauges": [["formflow_pdf_renders_in_flight", [], 2]],
+            "histograms": [],
+        }
+
+        with _other_process(tmp_path, other_worker):
+            text = registry.render()
+
+        assert _sample(text, "formflow_smb_fallbacks_total") == "5"
+        assert _sample(text, "formflow_pdf_renders_in_flight") == "3"
+
+    def test_gauges_of_exited_workers_are_dropped(self, registry, tmp_path):
+        """Counters of an exited worker are kept, its gauges are not."""
+        registry.configure(str(tmp_path))
+        exited = {
+            "counters": [["formflow_smb_fallbacks_total", [], 4]],
+            "gauges": [["formflow_pdf_renders_in_flight", [], 2]],
+            "histograms": [],
+        }
+        _other_process(tmp_path, exited).close()
+
+        text = registry.render()
+
+        assert _sample(text, "formflow_smb_fallbacks_total") == "4"
+        assert "\nformflow_pdf_renders_in_flight " not in text
+
+    def test_exited_workers_are_merged_into_the_aggregate(self, registry, tmp_path):
+        registry.configure(str(tmp_path))
+        exited = {
+            "counters": [["formflow_smb_fallbacks_total", [], 4]],
+            "gauges": [],
+            "histograms": [["formflow_draft_io_seconds", [["operation", "load"]], [1] + [0] * 13, 0.001, 1]],
+        }
+        _other_process(tmp_path, exited).close()
+        registry.render()
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["metrics_aggregate.json", "metrics_merge.lock"]
+        _other_process(tmp_path, exited, name="metrics_4243_0badcafe").close()
+        text = registry.render()
+        assert _sample(text, "formflow_smb_fallbacks_total") == "8"
+        assert _sample(text, 'formflow_draft_io_seconds_count{operation="load"}') == "2"
+
+    def test_reused_pid_does_not_overwrite_an_earlier_snapshot(self, registry, tmp_path):
+        """A new process with the PID of an exited one writes its own file."""
+        registry.configure(str(tmp_path))
+        exited = {"counters": [["formflow_smb_fallbacks_total", [], 4]], "gauges": [], "histograms": []}
+        _other_process(tmp_path, exited, name=f"metrics_{os.getpid()}_feedbeef").close()
+        registry.inc("formflow_smb_fallbacks_total")
+        registry.flush()
+
+        assert _sample(registry.render(), "formflow_smb_fallbacks_total") == "5"
+
+    def test_updates_are_written_on_flush(self, registry, tmp_path):
+        registry.configure(str(tmp_path), flush_interval=3600)
+        registry.inc("formflow_smb_fallbacks_total")
+        assert not list(tmp_path.glob("metrics_*.json"))
+
+        registry.flush()
+
+        (snapshot,) = tmp_path.glob("metrics_*.json")
+        assert json.loads(snapshot.read_text())["counters"] == [["formflow_smb_fallbacks_total", [], 1]]
+
+    def test_updates_are_written_after_flush_interval(self, registry, tmp_path):
+        registry.configure(str(tmp_path), flush_interval=0.01)
+        registry.inc("formflow_smb_fallbacks_total")
+
+        deadline = time.monotonic() + 5
+        while not list(tmp_path.glob("metrics_*.json")) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert list(tmp_path.glob("metrics_*.json"))
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+class TestInstrumentation:
+    def test_storage_fallback_is_counted(self, config, tmp_path, mocker):
+        registry = Metrics()
+        mocker.patch("formflow.services.storage.metrics", registry)
+        mock_smbclient = mocker.MagicMock()
+        mock_smbclient.register_session.side_effect = ConnectionError("offline")
+        mocker.patch.dict("sys.modules", {"smbclient": mock_smbclient})
+        config["smb"].update(enabled=True, server="srv", share="s", username="u", password="p")
+
+        PdfStorage().store_pdf_bytes(b"%PDF", str(tmp_path / "a.pdf"), ["a"], config)
+
+        text = registry.render()
+        assert _sample(text, "formflow_smb_fallbacks_total") == "1"
+        assert 'formflow_storage_seconds_count{backend="fallback"} 1' in text
+
+
+# ---------------------------------------------------------------------------
+# /metrics
+# ---------------------------------------------------------------------------
+
+class TestMetricsEndpoint:
+    def test_exposition_format(self, client, engine_with_app):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        assert "# TYPE formflow_pdf_render_seconds histogram" in response.get_data(as_text=True)
+
+    def test_disabled(self, client, engine_with_app, config):
+        config["metrics"]["enabled"] = False
+        assert client.get("/metrics").status_code == 404
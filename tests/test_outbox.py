@@ -0,0 +1,337 @@
+"""Tests for the durable SMB upload outbox and its background uploader."""
+import os
+import time
+
+import pytest
+
+from formflow.config import AppSettings, OutboxConfig, SmbConfig
+from formflow.services.metrics import metrics
+from formflow.services.outbox import Outbox, create_outbox
+from formflow.services.storage import PdfStorage, _mark_fallback, fallback_marker
+
+
+@pytest.fixture
+def smb_config():
+    return AppSettings(smb=SmbConfig(
+        enabled=True, server="smb-server", share="pdfs", folder="", username="testuser", password="testpass",
+    )).model_dump()
+
+
+@pytest.fixture
+def storage(mocker):
+    storage = PdfStorage()
+    mocker.patch.object(storage, "upload_file")
+    return storage
+
+
+@pytest.fixture
+def outbox(tmp_path, storage, smb_config):
+    fallback_dir = tmp_path / "pdfs"
+    fallback_dir.mkdir()
+    box = Outbox(str(tmp_path / "spool"), storage, smb_config, fallback_dir=str(fallback_dir),
+                 batch_size=2, poll_interval=0.01, backoff_initial=5, backoff_max=20)
+    yield box
+    box.stop()
+
+
+def _raise(error: Exception) -> None:
+    raise error
+
+
+def _touch(path, age: float) -> None:
+    path.write_bytes(b"%PDF-1.4")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+# ---------------------------------------------------------------------------
+# Spool
+# ---------------------------------------------------------------------------
+
+class TestSpool:
+    def test_enqueue_writes_file(self, outbox):
+        assert outbox.enqueue("doc.pdf", b"%PDF-data") == "doc.pdf"
+
+        assert os.listdir(outbox.directory) == ["doc.pdf"]
+        with open(os.path.join(outbox.directory, "doc.pdf"), "rb") as f:
+            assert f.read() == b"%PDF-data"
+
+    def test_enqueue_strips_directories(self, outbox):
+        assert outbox.enqueue("../escape.pdf", b"x") == "escape.pdf"
+        assert os.path.exists(os.path.join(outbox.directory, "escape.pdf"))
+
+    def test_pending_oldest_first_with_fallbacks(self, outbox, tmp_path):
+        """Spooled PDFs and marked local fallbacks are uploaded oldest first."""
+        _touch(tmp_path / "spool" / "new.pdf", age=10)
+        _touch(tmp_path / "pdfs" / "fallback.pdf", age=100)
+        _mark_fallback(str(tmp_path / "pdfs" / "fallback.pdf"))
+
+        assert [os.path.basename(p) for p in outbox.pending()] == ["fallback.pdf", "new.pdf"]
+
+    def test_unmarked_pdfs_left_alone(self, outbox, tmp_path):
+        """PDFs stored locally on purpose (the local archive) are never uploaded or deleted."""
+        _touch(tmp_path / "pdfs" / "archive.pdf", age=100)
+        assert outbox.pending() == []
+
+    def test_legacy_reconcile_is_opt_in(self, tmp_path, storage, smb_config):
+        """With legacy_fallbacks every PDF in pdfs/ except previews counts as a fallback."""
+        (tmp_path / "pdfs").mkdir()
+        box = Outbox(str(tmp_path / "spool"), storage, smb_config, fallback_dir=str(tmp_path / "pdfs"),
+                     legacy_fallbacks=True)
+        _touch(tmp_path / "pdfs" / "old.pdf", age=100)
+        _touch(tmp_path / "pdfs" / "temp_preview.pdf", age=200)
+
+        assert [os.path.basename(p) for p in box.pending()] == ["old.pdf"]
+
+    def test_marker_without_pdf_removed(self, outbox, tmp_path):
+        marker = fallback_marker(str(tmp_path / "pdfs" / "gone.pdf"))
+        _mark_fallback(str(tmp_path / "pdfs" / "gone.pdf"))
+
+        assert outbox.pending() == []
+        assert not os.path.exists(marker)
+
+    def test_fallbacks_ignored_when_disabled(self, tmp_path, storage, smb_config):
+        box = Outbox(str(tmp_path / "spool"), storage, smb_config, fallback_dir=None)
+        _touch(tmp_path / "old.pdf", age=100)
+        assert box.pending() == []
+
+
+# ---------------------------------------------------------------------------
+# Draining
+# ---------------------------------------------------------------------------
+
+class TestDrain:
+    def test_uploads_batch_and_removes_files(self, outbox, storage, tmp_path):
+        for name, age in (("a.pdf", 30), ("b.pdf", 20), ("c.pdf", 10)):
+            _touch(tmp_path / "spool" / name, age)
+
+        assert outbox.drain_once() == 2
+
+        uploaded = [call.args[1] for call in storage.upload_file.call_args_list]
+        assert uploaded == ["a.pdf", "b.pdf"]
+        assert os.listdir(outbox.directory) == ["c.pdf"]
+
+    def test_uploaded_fallback_and_marker_removed(self, outbox, storage, tmp_path):
+        fallback = tmp_path / "pdfs" / "doc.pdf"
+        _touch(fallback, age=10)
+        _mark_fallback(str(fallback))
+
+        assert outbox.drain_once() == 1
+
+        assert not fallback.exists()
+        assert not os.path.exists(fallback_marker(str(fallback)))
+
+    def test_error_keeps_remaining_files(self, outbox, storage, tmp_path):
+        _touch(tmp_path / "spool" / "a.pdf", 20)
+        _touch(tmp_path / "spool" / "b.pdf", 10)
+        storage.upload_file.side_effect = [None, ConnectionError("refused")]
+
+        with pytest.raises(ConnectionError):
+            outbox.drain_once()
+
+        assert os.listdir(outbox.directory) == ["b.pdf"]
+
+    def test_rejected_file_does_not_block_later_ones(self, outbox, storage, tmp_path):
+        """A file the share refuses is set aside; the files after it are still uploaded."""
+        outbox.batch_size = 3
+        _touch(tmp_path / "spool" / "bad.pdf", 30)
+        _touch(tmp_path / "spool" / "a.pdf", 20)
+        _touch(tmp_path / "spool" / "b.pdf", 10)
+        storage.upload_file.side_effect = lambda _file, name, _config: (
+            _raise(PermissionError(13, "Access denied")) if name == "bad.pdf" else None)
+
+        assert outbox.drain_once() == 2
+
+        assert os.listdir(outbox.directory) == ["bad.pdf"]
+        assert outbox._file_failures[str(tmp_path / "spool" / "bad.pdf")][0] == 1
+        assert outbox._next_attempt == 0.0
+
+    def test_rejected_file_backs_off_alone(self, outbox, storage, tmp_path, mocker):
+        now = mocker.patch("formflow.services.outbox.time.monotonic", return_value=1000.0)
+        _touch(tmp_path / "spool" / "bad.pdf", 30)
+        storage.upload_file.side_effect = PermissionError(13, "Access denied")
+        outbox._tick()
+        _touch(tmp_path / "spool" / "good.pdf", 10)
+        storage.upload_file.side_effect = None
+        storage.upload_file.reset_mock()
+
+        outbox._tick()
+
+        assert [call.args[1] for call in storage.upload_file.call_args_list] == ["good.pdf"]
+        now.return_value = 1005.0
+        outbox._tick()
+        assert outbox.pending() == []
+
+    def test_rejected_file_quarantined_after_max_attempts(self, outbox, storage, tmp_path, mocker):
+        now = mocker.patch("formflow.services.outbox.time.monotonic", return_value=1000.0)
+        outbox.max_attempts = 3
+        fallback = tmp_path / "pdfs" / "bad.pdf"
+        _touch(fallback, 30)
+        _mark_fallback(str(fallback))
+        storage.upload_file.side_effect = PermissionError(13, "Access denied")
+
+        for _ in range(3):
+            outbox.drain_once()
+            now.return_value += 60
+
+        assert outbox.pending() == []
+        assert os.listdir(outbox.failed_dir) == ["bad.pdf"]
+        assert not os.path.exists(fallback_marker(str(fallback)))
+        assert "\nformflow_outbox_quarantined_total " in metrics.render()
+
+    def test_entry_replaced_during_upload_is_kept(self, outbox, storage):
+        outbox.enqueue("doc.pdf", b"old")
+        storage.upload_file.side_effect = lambda *args: outbox.enqueue("doc.pdf", b"new")
+
+        outbox.drain_once()
+
+        with open(os.path.join(outbox.directory, "doc.pdf"), "rb") as f:
+            assert f.read() == b"new"
+
+    def test_backoff_doubles_until_max_and_resets(self, outbox, storage, mocker):
+        outbox.enqueue("doc.pdf", b"x")
+        storage.upload_file.side_effect = ConnectionError("refused")
+        now = mocker.patch("formflow.services.outbox.time.monotonic", return_value=1000.0)
+
+        delays = []
+        for _ in range(4):
+            outbox._tick()
+            delays.append(outbox._next_attempt - now.return_value)
+            now.return_value = outbox._next_attempt
+        assert delays == [5, 10, 20, 20]
+
+        storage.upload_file.side_effect = None
+        outbox._tick()
+        assert outbox._failures == 0
+        assert outbox.pending() == []
+
+    def test_no_attempt_during_backoff(self, outbox, storage, mocker):
+        outbox.enqueue("doc.pdf", b"x")
+        mocker.patch("formflow.services.outbox.time.monotonic", return_value=1000.0)
+        outbox._next_attempt = 1005.0
+
+        outbox._tick()
+
+        storage.upload_file.assert_not_called()
+
+    def test_depth_and_age_reported(self, outbox, tmp_path):
+        _touch(tmp_path / "spool" / "a.pdf", 60)
+        outbox._report(outbox.pending())
+
+        output = metrics.render()
+        assert "\nformflow_outbox_depth 1\n" in output
+        age = float(output.split("\nformflow_outbox_oldest_seconds ")[1].split("\n")[0])
+        assert 59 <= age < 120
+
+    def test_single_drainer(self, outbox, tmp_path, storage, smb_config):
+        """Only one process (here: instance) holds the drain lock; it is handed over on stop()."""
+        other = Outbox(outbox.directory, storage, smb_config)
+        assert outbox._is_drainer()
+        assert not other._is_drainer()
+        outbox.stop()
+        assert other._is_drainer()
+        other.stop()
+
+    def test_background_thread_uploads(self, outbox, storage):
+        outbox.start()
+        outbox.enqueue("doc.pdf", b"x")
+
+        deadline = time.monotonic() + 5
+        while outbox.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert outbox.pending() == []
+        storage.upload_file.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# PdfStorage integration
+# ---------------------------------------------------------------------------
+
+class TestStorageWithOutbox:
+    def test_store_returns_at_once(self, outbox, storage, smb_config, mocker):
+        smb_open = mocker.patch("smbclient.open_file")
+        storage.outbox = outbox
+
+        result = storage.store_pdf_bytes(b"%PDF", "pdfs/doc.pdf", ["form", "user"], smb_config)
+
+        assert result == {"stored_via": "outbox", "filename": "form_user.pdf"}
+        assert os.listdir(outbox.directory) == ["form_user.pdf"]
+        smb_open.assert_not_called()
+
+    def test_unwritable_spool_uploads_directly(self, outbox, smb_config, mocker):
+        storage = PdfStorage()
+        storage.outbox = outbox
+        mocker.patch.object(outbox, "enqueue", side_effect=OSError("disk full"))
+        mocker.patch("smbclient.register_session")
+        smb_open = mocker.patch("smbclient.open_file", mocker.mock_open())
+        smb_open.return_value.write.side_effect = len
+
+        result = storage.store_pdf_bytes(b"%PDF", "pdfs/doc.pdf", ["doc"], smb_config)
+
+        assert result["stored_via"] == "smb"
+        smb_open.assert_called_once()
+
+    def test_smb_fallback_marked_for_upload(self, outbox, smb_config, mocker, tmp_path):
+        """A PDF stored locally because the share was unreachable is flagged for the outbox."""
+        storage = PdfStorage()
+        mocker.patch("smbclient.register_session", side_effect=ConnectionError("refused"))
+        final = tmp_path / "pdfs" / "doc.pdf"
+
+        result = storage.store_pdf_bytes(b"%PDF", str(final), ["doc"], smb_config)
+
+        assert "warning" in result
+        assert os.path.exists(fallback_marker(str(final)))
+        assert outbox.pending() == [str(final)]
+
+    def test_local_storage_bypasses_outbox(self, outbox, storage, tmp_path):
+        storage.outbox = outbox
+        final = tmp_path / "doc.pdf"
+
+        result = storage.store_pdf_bytes(b"%PDF", str(final), ["doc"], AppSettings().model_dump())
+
+        assert result["stored_via"] == "local"
+        assert final.exists()
+
+    def test_upload_file_rewinds_on_retry(self, smb_config, mocker, tmp_path):
+        """The retry over a fresh connection uploads the whole file again, not the rest of it."""
+        storage = PdfStorage()
+        mocker.patch("smbclient.register_session")
+        written = []
+
+        class Remote:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def write(self, data):
+                written.append(bytes(data))
+                if len(written) == 2:
+                    raise OSError("Session expired")
+                return len(data)
+
+        mocker.patch("smbclient.open_file", return_value=Remote())
+        storage.store_pdf_bytes(b"earlier upload", "", ["earlier"], smb_config)  # Verbindung im Pool
+        local = tmp_path / "doc.pdf"
+        local.write_bytes(b"%PDF-complete")
+
+        with open(local, "rb") as f:
+            storage.upload_file(f, "doc.pdf", smb_config)
+
+        assert written[-1] == b"%PDF-complete"
+
+
+class TestCreateOutbox:
+    def test_none_without_smb(self, cwd_tmp):
+        assert create_outbox(AppSettings().model_dump(), PdfStorage()) is None
+
+    def test_none_when_disabled(self, cwd_tmp, smb_config):
+        smb_config["outbox"] = OutboxConfig(enabled=False).model_dump()
+        assert create_outbox(smb_config, PdfStorage()) is None
+
+    def test_created_in_pdfs_volume(self, cwd_tmp, smb_config):
+        box = create_outbox(smb_config, PdfStorage())
+        assert box.directory == "pdfs/outbox"
+        assert (cwd_tmp / "pdfs" / "outbox").is_dir()
@@ -1,7 +1,13 @@
 """Unit tests for helper classes and methods in formflow.pdf_generator."""
+from typing import get_args
+
 import pytest
+from pydantic import ValidationError
+
+from formflow.config import AppSettings, PdfVariant
+from formflow.services.form_engine import FormEngine
 
-from formflow.services.pdf_generator import _FormatMap, _resolve_signature_label, PdfGenerator
+from formflow.services.pdf_generator import _FormatMap, _pdf_options, _resolve_signature_label, PdfGenerator
 
 
 # ---------------------------------------------------------------------------
@@ -174,3 +180,183 @@ class TestResolveSIgnatureLabels:
         fields = [{"type": "signature", "name": "sig", "label": "U", "signature_label": "Am {date_today}"}]
         result = pdf_generator._resolve_signature_labels(fields, {}, "15.06.2026")
         assert result[0]["signature_label_resolved"] == "Am 15.06.2026"
+
+
+# ---------------------------------------------------------------------------
+# TestGetStylesheetText
+# ---------------------------------------------------------------------------
+
+class TestGetStylesheetText:
+    @pytest.fixture
+    def templates_dir(self, tmp_path):
+        """A PDF templates directory with one template and its companion stylesheet."""
+        (tmp_path / "custom.html").write_text("<p>{{ form_title }}</p>", encoding="utf-8")
+        (tmp_path / "custom.css").write_text(
+            "h1 { color: {{ config.colors.primary }}; }", encoding="utf-8"
+        )
+        return tmp_path
+
+    def test_missing_stylesheet_returns_none(self, templates_dir):
+        """A template without a companion .css file gets no extra stylesheet."""
+        generator = PdfGenerator(templates_dir=str(templates_dir))
+        assert generator._get_stylesheet_text("other.html", {}) is None
+
+    def test_stylesheet_rendered_with_colors(self, templates_dir):
+        """The companion stylesheet is rendered with config.colors."""
+        generator = PdfGenerator(templates_dir=str(templates_dir))
+        css = generator._get_stylesheet_text("custom.html", {"colors": {"primary": "#123456"}})
+        assert css == "h1 { color: #123456; }"
+
+    def test_stylesheet_cached_per_colors(self, templates_dir, mocker):
+        """The stylesheet file is read only once per colors configuration."""
+        generator = PdfGenerator(templates_dir=str(templates_dir))
+        config = {"colors": {"primary": "#123456"}}
+        generator._get_stylesheet_text("custom.html", config)
+        spy = mocker.spy(generator._env, "from_string")
+        generator._get_stylesheet_text("custom.html", config)
+        assert spy.call_count == 0
+
+    def test_different_colors_produce_different_css(self, templates_dir):
+        """Each colors configuration gets its own cache entry."""
+        generator = PdfGenerator(templates_dir=str(templates_dir))
+        css_a = generator._get_stylesheet_text("custom.html", {"colors": {"primary": "#aaaaaa"}})
+        css_b = generator._get_stylesheet_text("custom.html", {"colors": {"primary": "#bbbbbb"}})
+        assert css_a != css_b
+
+    def test_cache_invalidated_when_file_changes(self, templates_dir):
+        """A modified stylesheet (new mtime) is re-rendered."""
+        import os
+
+        generator = PdfGenerator(templates_dir=str(templates_dir))
+        config = {"colors": {"primary": "#123456"}}
+        generator._get_stylesheet_text("custom.html", config)
+
+        css_file = templates_dir / "custom.css"
+        css_file.write_text("h2 { color: {{ config.colors.primary }}; }", encoding="utf-8")
+        stat = os.stat(css_file)
+        os.utime(css_file, (stat.st_atime, stat.st_mtime + 10))
+
+        assert generator._get_stylesheet_text("custom.html", config) == "h2 { color: #123456; }"
+
+    def test_default_template_has_stylesheet(self):
+        """The bundled default_pdf.html ships its styles as default_pdf.css."""
+        generator = PdfGenerator()
+        css = generator._get_stylesheet_text("default_pdf.html", {"colors": {"primary": "#0056b3"}})
+        assert "@page" in css
+        assert "#0056b3" in css
+
+
+# ---------------------------------------------------------------------------
+# TestRenderCacheIntegration
+# ---------------------------------------------------------------------------
+
+class TestRenderCacheIntegration:
+    FORM_DEF = {"title": "Test", "fields": [{"type": "text", "name": "user", "label": "Benutzer"}]}
+
+    @pytest.fixture
+    def generator(self, tmp_path, mocker):
+        """PdfGenerator with a render cache and a stubbed WeasyPrint step."""
+        from formflow.services.render_cache import RenderCache
+
+        generator = PdfGenerator(render_cache=RenderCache(str(tmp_path / "cache"), 1024 * 1024))
+        mocker.patch.object(generator, "_render_pdf", return_value=b"%PDF-stub")
+        return generator
+
+    def test_identical_input_rendered_once(self, generator, tmp_path):
+        """Previewing the same data twice reuses the cached PDF."""
+        generator.generate(self.FORM_DEF, {"user": "Max"}, str(tmp_path / "a.pdf"))
+        generator.generate(self.FORM_DEF, {"user": "Max"}, str(tmp_path / "b.pdf"))
+        assert generator._render_pdf.call_count == 1
+        assert (tmp_path / "b.pdf").read_bytes() == b"%PDF-stub"
+
+    def test_changed_input_rendered_again(self, generator, tmp_path):
+        """Different form data produces a different cache key."""
+        generator.generate(self.FORM_DEF, {"user": "Max"}, str(tmp_path / "a.pdf"))
+        generator.generate(self.FORM_DEF, {"user": "Erika"}, str(tmp_path / "b.pdf"))
+        assert generator._render_pdf.call_count == 2
+
+    def test_document_id_is_content_hash_with_cache(self, generator, tmp_path):
+        """With the cache, identical input must give identical bytes, so the ID is the content hash."""
+        generator.render(self.FORM_DEF, {"user": "Max"}, document_id="a")
+        generator.render_cache.cleanup(-1)
+        generator.render(self.FORM_DEF, {"user": "Max"}, document_id="b")
+        first, second = (c.args[5] for c in generator._render_pdf.call_args_list)
+        assert first == second
+        assert len(first) == 64
+
+    def test_document_id_unique_without_cache(self, mocker):
+        """Without the cache every document gets its own ID, by default a fresh UUID."""
+        generator = PdfGenerator()
+        mocker.patch.object(generator, "_render_pdf", return_value=b"%PDF-stub")
+        generator.render(self.FORM_DEF, {"user": "Max"}, document_id="preview123")
+        generator.render(self.FORM_DEF, {"user": "Max"})
+        generator.render(self.FORM_DEF, {"user": "Max"})
+        ids = [c.args[5] for c in generator._render_pdf.call_args_list]
+        assert ids[0] == "preview123"
+        assert len(set(ids)) == 3
+
+    def test_expired_entry_rendered_again(self, generator):
+        """Cached PDFs contain personal data and are not served after cache_ttl."""
+        generator.render(self.FORM_DEF, {"user": "Max"})
+        generator.render_cache.max_age_seconds = -1
+        generator.render(self.FORM_DEF, {"user": "Max"})
+        assert generator._render_pdf.call_count == 2
+
+    def test_pdf_options_change_cache_key(self, generator, tmp_path):
+        """A form with different output options is not served the cached PDF of another profile."""
+        archived = dict(self.FORM_DEF, pdf_options={"pdf_variant": "pdf/a-3b"})
+        generator.generate(self.FORM_DEF, {"user": "Max"}, str(tmp_path / "a.pdf"))
+        generator.generate(archived, {"user": "Max"}, str(tmp_path / "b.pdf"))
+        assert generator._render_pdf.call_count == 2
+        assert generator._render_pdf.call_args.args[7] == {"pdf_variant": "pdf/a-3b"}
+
+
+# ---------------------------------------------------------------------------
+# TestPdfOptions
+# ---------------------------------------------------------------------------
+
+class TestPdfOptions:
+    CONFIG = {"pdf": {"optimize_images": True, "jpeg_quality": None, "dpi": 150,
+                      "full_fonts": False, "pdf_variant": ""}}
+
+    def test_global_options_used(self):
+        """Set global values are passed on; unset ones are left to WeasyPrint's defaults."""
+        assert _pdf_options({}, self.CONFIG) == {"optimize_images": True, "dpi": 150, "full_fonts": False}
+
+    def test_form_overrides_global_options(self):
+        """pdf_options in the form definition take precedence over the global config."""
+        form_def = {"pdf_options": {"dpi": 96, "pdf_variant": "pdf/a-3b"}}
+        options = _pdf_options(form_def, self.CONFIG)
+        assert options["dpi"] == 96
+        assert options["pdf_variant"] == "pdf/a-3b"
+
+    def test_unknown_form_option_ignored(self):
+        """Unknown keys are not forwarded to write_pdf()."""
+        assert _pdf_options({"pdf_options": {"zoom": 2}}, {}) == {}
+
+    def test_no_config(self):
+        """Without any configuration no options are passed."""
+        assert _pdf_options({}, {}) == {}
+
+    def test_unknown_variant_rejected_in_settings(self):
+        """A typo in APP_PDF__PDF_VARIANT fails at startup, not inside WeasyPrint on every render."""
+        with pytest.raises(ValidationError):
+            AppSettings(pdf={"pdf_variant": "pdf/a3b"})
+
+    def test_form_with_invalid_options_not_loaded(self, tmp_path):
+        """A form whose pdf_options are invalid is rejected when the forms are loaded."""
+        (tmp_path / "good.yaml").write_text("form_id: good\npdf_options:\n  pdf_variant: pdf/a-3b\n  dpi: '150'\n")
+        (tmp_path / "bad.yaml").write_text("form_id: bad\npdf_options:\n  pdf_variant: pdf/a3b\n")
+
+        engine = FormEngine(forms_dir=str(tmp_path))
+
+        assert list(engine.forms) == ["good"]
+        assert engine.forms["good"]["pdf_options"] == {"pdf_variant": "pdf/a-3b", "dpi": 150}
+
+    def test_variants_match_weasyprint(self):
+        """The accepted variants are exactly those of the installed WeasyPrint."""
+        try:
+            from weasyprint.pdf import VARIANTS
+        except (ImportError, OSError):
+            pytest.skip("WeasyPrint kann nicht geladen werden")
+        assert set(get_args(PdfVariant)) - {""} == set(VARIANTS)
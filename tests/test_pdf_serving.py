@@ -0,0 +1,130 @@
+"""Tests for /pdf/<filename>: Range requests, ETag/304, caching and reverse-proxy offloading."""
+import os
+
+import pytest
+
+from formflow.config import ServingConfig
+
+PDF = b"%PDF-1.4 " + bytes(range(256)) * 4
+
+
+@pytest.fixture
+def pdf_client(app, engine):
+    engine.init_app(app)
+    return app.test_client()
+
+
+@pytest.fixture
+def final_pdf(cwd_tmp):
+    path = cwd_tmp / "pdfs" / "2024-05-01_12-00_handover_Max.pdf"
+    path.write_bytes(PDF)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Vorschauen aus dem Speicher
+# ---------------------------------------------------------------------------
+
+class TestPreview:
+    def test_range_request(self, pdf_client, engine):
+        engine.preview_store.put("abc", PDF)
+
+        response = pdf_client.get("/pdf/temp_abc.pdf", headers={"Range": "bytes=0-99"})
+
+        assert response.status_code == 206
+        assert response.data == PDF[:100]
+        assert response.headers["Content-Range"] == f"bytes 0-99/{len(PDF)}"
+        assert response.headers["Accept-Ranges"] == "bytes"
+
+    def test_etag_revalidation(self, pdf_client, engine):
+        engine.preview_store.put("abc", PDF)
+        first = pdf_client.get("/pdf/temp_abc.pdf")
+
+        second = pdf_client.get("/pdf/temp_abc.pdf", headers={"If-None-Match": first.headers["ETag"]})
+
+        assert first.status_code == 200
+        assert not first.headers["ETag"].startswith("W/")
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        assert second.status_code == 304
+        assert second.data == b""
+
+    def test_changed_content_gets_new_etag(self, pdf_client, engine):
+        engine.preview_store.put("a", PDF)
+        engine.preview_store.put("b", PDF + b"x")
+        assert pdf_client.get("/pdf/temp_a.pdf").headers["ETag"] != pdf_client.get("/pdf/temp_b.pdf").headers["ETag"]
+
+
+# ---------------------------------------------------------------------------
+# Fertige Dokumente aus pdfs/
+# ---------------------------------------------------------------------------
+
+class TestFinalDocument:
+    def test_revalidated_by_default(self, pdf_client, final_pdf):
+        """File names can be reused within a minute, so final documents are never immutable."""
+        response = pdf_client.get(f"/pdf/{final_pdf.name}")
+
+        assert response.status_code == 200
+        assert response.data == PDF
+        assert response.headers["Cache-Control"] == "private, no-cache"
+
+    def test_conditional_and_range(self, pdf_client, final_pdf):
+        etag = pdf_client.get(f"/pdf/{final_pdf.name}").headers["ETag"]
+
+        assert pdf_client.get(f"/pdf/{final_pdf.name}", headers={"If-None-Match": etag}).status_code == 304
+        partial = pdf_client.get(f"/pdf/{final_pdf.name}", headers={"Range": "bytes=-16"})
+        assert partial.status_code == 206
+        assert partial.data == PDF[-16:]
+
+    def test_replaced_file_gets_new_etag(self, pdf_client, final_pdf):
+        etag = pdf_client.get(f"/pdf/{final_pdf.name}").headers["ETag"]
+        replacement = final_pdf.with_suffix(".part")
+        replacement.write_bytes(PDF)
+        os.replace(replacement, final_pdf)
+
+        assert pdf_client.get(f"/pdf/{final_pdf.name}", headers={"If-None-Match": etag}).status_code == 200
+
+    def test_legacy_temp_file_revalidated(self, pdf_client, cwd_tmp):
+        (cwd_tmp / "pdfs" / "temp_old.pdf").write_bytes(PDF)
+        response = pdf_client.get("/pdf/temp_old.pdf")
+        assert response.headers["Cache-Control"] == "private, no-cache"
+
+    def test_missing_file_404(self, pdf_client):
+        assert pdf_client.get("/pdf/missing.pdf").status_code == 404
+
+    def test_configured_max_age_without_immutable(self, pdf_client, config, final_pdf):
+        config["serving"] = ServingConfig(final_max_age=60).model_dump()
+        response = pdf_client.get(f"/pdf/{final_pdf.name}")
+        assert response.headers["Cache-Control"] == "private, max-age=60"
+
+
+class TestOffload:
+    def test_x_accel_redirect(self, pdf_client, config, final_pdf):
+        config["serving"] = ServingConfig(offload="x-accel-redirect").model_dump()
+
+        response = pdf_client.get(f"/pdf/{final_pdf.name}")
+
+        assert response.headers["X-Accel-Redirect"] == f"/protected-pdfs/{final_pdf.name}"
+        assert response.headers["Content-Type"] == "application/pdf"
+        assert response.headers["Cache-Control"] == "private, no-cache"
+        assert response.data == b""
+
+    def test_x_sendfile(self, pdf_client, config, final_pdf):
+        config["serving"] = ServingConfig(offload="x-sendfile").model_dump()
+
+        response = pdf_client.get(f"/pdf/{final_pdf.name}")
+
+        assert response.headers["X-Sendfile"] == str(final_pdf)
+        assert response.data == b""
+
+    def test_previews_never_offloaded(self, pdf_client, config, engine):
+        config["serving"] = ServingConfig(offload="x-accel-redirect").model_dump()
+        engine.preview_store.put("abc", PDF)
+
+        response = pdf_client.get("/pdf/temp_abc.pdf")
+
+        assert "X-Accel-Redirect" not in response.headers
+        assert response.data == PDF
+
+    def test_missing_file_not_offloaded(self, pdf_client, config):
+        config["serving"] = ServingConfig(offload="x-sendfile").model_dump()
+        assert pdf_client.get("/pdf/missing.pdf").status_code == 404
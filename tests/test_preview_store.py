@@ -0,0 +1,186 @@
+"""Unit tests for the preview stores (worker memory and tmpfs directory)."""
+import os
+import runpy
+import time
+
+import pytest
+
+from formflow.config import AppSettings, PreviewConfig
+from formflow.services.preview_store import (
+    PreviewStore,
+    TmpfsPreviewStore,
+    create_preview_store,
+    default_preview_directory,
+    require_shared_store,
+)
+
+GUNICORN_CONF = os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+
+
+class TestPreviewStore:
+    def test_put_and_get(self):
+        """Stored bytes are returned unchanged."""
+        store = PreviewStore()
+        store.put("abc", b"%PDF-1.4")
+        assert store.get("abc") == b"%PDF-1.4"
+        assert "abc" in store
+
+    def test_unknown_id_returns_none(self):
+        assert PreviewStore().get("missing") is None
+
+    def test_discard(self):
+        """A discarded preview is gone; discarding twice is harmless."""
+        store = PreviewStore()
+        store.put("abc", b"%PDF-1.4")
+        store.discard("abc")
+        store.discard("abc")
+        assert "abc" not in store
+
+    def test_expired_preview_not_returned(self, monkeypatch):
+        """Previews older than max_age_seconds are treated as missing."""
+        store = PreviewStore(max_age_seconds=60)
+        store.put("abc", b"%PDF-1.4")
+        now = time.monotonic()
+        monkeypatch.setattr("formflow.services.preview_store.time.monotonic", lambda: now + 61)
+        assert store.get("abc") is None
+
+    def test_cleanup_removes_only_old_entries(self, monkeypatch):
+        """cleanup() drops expired previews and keeps young ones."""
+        store = PreviewStore()
+        store.put("old", b"old")
+        now = time.monotonic()
+        monkeypatch.setattr("formflow.services.preview_store.time.monotonic", lambda: now + 100)
+        store.put("young", b"young")
+
+        store.cleanup(max_age_seconds=50)
+
+        assert "old" not in store
+        assert store.get("young") == b"young"
+
+    def test_lru_eviction_under_byte_budget(self):
+        """Over budget, the least recently used previews go first; reading counts as use."""
+        store = PreviewStore(max_bytes=10)
+        store.put("a", b"aaaa")
+        store.put("b", b"bbbb")
+        store.get("a")
+        store.put("c", b"cccc")
+
+        assert "b" not in store
+        assert store.get("a") == b"aaaa"
+        assert store.get("c") == b"cccc"
+
+    def test_newest_preview_kept_even_if_over_budget(self):
+        store = PreviewStore(max_bytes=4)
+        store.put("small", b"abc")
+        store.put("large", b"0123456789")
+
+        assert "small" not in store
+        assert store.get("large") == b"0123456789"
+
+    def test_replacing_entry_does_not_double_count(self):
+        store = PreviewStore(max_bytes=8)
+        store.put("a", b"aaaa")
+        store.put("a", b"AAAA")
+        store.put("b", b"bbbb")
+        assert store.get("a") == b"AAAA"
+        assert "b" in store
+
+
+class TestTmpfsPreviewStore:
+    def test_shared_between_instances(self, tmp_path):
+        """A preview put by one worker is served and discarded by another."""
+        worker_a = TmpfsPreviewStore(str(tmp_path))
+        worker_b = TmpfsPreviewStore(str(tmp_path))
+
+        worker_a.put("abc", b"%PDF-1.4")
+        assert worker_b.get("abc") == b"%PDF-1.4"
+
+        worker_b.discard("abc")
+        assert "abc" not in worker_a
+        assert os.listdir(tmp_path) == []
+
+    def test_expired_preview_not_returned_and_cleaned(self, tmp_path):
+        store = TmpfsPreviewStore(str(tmp_path), max_age_seconds=60)
+        store.put("old", b"old")
+        store.put("young", b"young")
+        old = time.time() - 120
+        os.utime(tmp_path / "old.pdf", (old, old))
+
+        assert store.get("old") is None
+        store.cleanup()
+
+        assert sorted(os.listdir(tmp_path)) == ["young.pdf"]
+
+    def test_lru_eviction_by_access_time(self, tmp_path):
+        store = TmpfsPreviewStore(str(tmp_path), max_bytes=10)
+        store.put("a", b"aaaa")
+        store.put("b", b"bbbb")
+        past = time.time() - 100
+        os.utime(tmp_path / "a.pdf", (past - 10, past))
+        os.utime(tmp_path / "b.pdf", (past - 20, past))
+        store.get("a")  # a zuletzt genutzt
+
+        store.put("c", b"cccc")
+
+        assert sorted(os.listdir(tmp_path)) == ["a.pdf", "c.pdf"]
+
+    def test_ids_cannot_escape_directory(self, tmp_path):
+        store = TmpfsPreviewStore(str(tmp_path / "previews"))
+        store.put("../escape", b"x")
+        assert not (tmp_path / "escape.pdf").exists()
+
+
+class TestCreatePreviewStore:
+    def test_shared_directory_by_default(self, tmp_path):
+        """All workers must see every preview, so the default store is the shared directory."""
+        preview = AppSettings().model_dump()["preview"]
+        assert preview["backend"] == "tmpfs"
+        store = create_preview_store(dict(preview, directory=str(tmp_path / "previews")))
+        assert isinstance(store, TmpfsPreviewStore)
+        assert (store.max_bytes, store.max_age_seconds) == (32 * 1024 * 1024, 3600)
+
+    def test_default_directory_in_ram(self, monkeypatch):
+        monkeypatch.setattr("formflow.services.preview_store.os.path.isdir", lambda path: path == "/dev/shm")
+        assert default_preview_directory() == "/dev/shm/formflow-previews"
+
+    def test_memory(self):
+        store = create_preview_store(PreviewConfig(backend="memory").model_dump())
+        assert isinstance(store, PreviewStore)
+
+    def test_memory_refused_with_several_workers(self):
+        memory = PreviewConfig(backend="memory").model_dump()
+        require_shared_store(memory, workers=1)
+        require_shared_store(PreviewConfig().model_dump(), workers=4)
+        with pytest.raises(RuntimeError, match="WEB_CONCURRENCY"):
+            require_shared_store(memory, workers=4)
+
+    def test_gunicorn_refuses_memory_store_with_several_workers(self, monkeypatch, tmp_path, mocker):
+        monkeypatch.setenv("APP_METRICS__MULTIPROCESS_DIR", str(tmp_path))
+        monkeypatch.setenv("APP_PREVIEW__BACKEND", "memory")
+        on_starting = runpy.run_path(GUNICORN_CONF)["on_starting"]
+        server = mocker.Mock()
+
+        server.cfg.workers = 1
+        on_starting(server)
+        server.cfg.workers = 4
+        with pytest.raises(RuntimeError):
+            on_starting(server)
+
+    def test_tmpfs(self, tmp_path):
+        config = PreviewConfig(backend="tmpfs", directory=str(tmp_path / "previews"), max_mb=1, ttl=60)
+        store = create_preview_store(config.model_dump())
+        assert isinstance(store, TmpfsPreviewStore)
+        assert (tmp_path / "previews").is_dir()
+        assert (store.max_bytes, store.max_age_seconds) == (1024 * 1024, 60)
+
+    def test_pdf_route_serves_from_tmpfs(self, app, engine, config, tmp_path):
+        """/pdf/temp_<id>.pdf is answered from the preview directory, not from pdfs/."""
+        config["preview"] = PreviewConfig(backend="tmpfs", directory=str(tmp_path / "shm")).model_dump()
+        engine.init_app(app)
+        TmpfsPreviewStore(str(tmp_path / "shm")).put("abc123", b"%PDF-preview")
+
+        response = app.test_client().get("/pdf/temp_abc123.pdf")
+
+        assert response.status_code == 200
+        assert response.data == b"%PDF-preview"
+        assert os.listdir(tmp_path / "pdfs") == []
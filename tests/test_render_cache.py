@@ -0,0 +1,125 @@
+"""Unit tests for the content-addressed render cache."""
+import os
+import threading
+import time
+
+import pytest
+
+from formflow.services.render_cache import RenderCache, create_render_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A render cache with a 1 KiB budget in a temporary directory."""
+    return RenderCache(str(tmp_path / "cache"), max_bytes=1024)
+
+
+class TestRenderCache:
+    def test_miss_returns_none(self, cache):
+        """An unknown key is a cache miss."""
+        assert cache.get("unknown") is None
+
+    def test_put_then_get_returns_bytes(self, cache):
+        """Stored bytes are returned unchanged."""
+        cache.put("abc", b"%PDF-1.7 test")
+        assert cache.get("abc") == b"%PDF-1.7 test"
+
+    def test_entry_larger_than_budget_not_stored(self, cache):
+        """An entry that alone exceeds the budget is not cached."""
+        cache.put("big", b"x" * 2048)
+        assert cache.get("big") is None
+
+    def test_least_recently_used_entry_evicted(self, cache):
+        """When the budget is exceeded, the entry with the oldest access is removed first."""
+        cache.put("old", b"a" * 400)
+        cache.put("used", b"b" * 400)
+        past = time.time() - 100
+        os.utime(cache._path("old"), (past, past))
+        os.utime(cache._path("used"), (past, past))
+        cache.get("used")  # refreshes atime
+
+        cache.put("new", b"c" * 400)
+
+        assert cache.get("old") is None
+        assert cache.get("used") is not None
+        assert cache.get("new") is not None
+
+    def test_expired_entry_not_served(self, cache):
+        """Entries rendered longer ago than max_age_seconds count as a miss, even when used."""
+        cache.put("abc", b"pdf")
+        past = time.time() - 7200
+        os.utime(cache._path("abc"), (time.time(), past))
+        assert cache.get("abc") is None
+
+    def test_cleanup_removes_expired_entries(self, cache):
+        """The janitor's cleanup deletes expired PDFs from disk."""
+        cache.put("old", b"a")
+        cache.put("fresh", b"b")
+        past = time.time() - 7200
+        os.utime(cache._path("old"), (past, past))
+
+        cache.cleanup()
+
+        assert not os.path.exists(cache._path("old"))
+        assert cache.get("fresh") == b"b"
+
+    def test_get_or_create_renders_once(self, cache):
+        """A second call for the same key is served from the cache."""
+        calls = []
+
+        def producer():
+            calls.append(1)
+            return b"pdf"
+
+        assert cache.get_or_create("k", producer) == b"pdf"
+        assert cache.get_or_create("k", producer) == b"pdf"
+        assert len(calls) == 1
+
+    def test_concurrent_identical_requests_share_one_render(self, cache):
+        """Requests for the same key that overlap in time trigger only one render."""
+        calls = []
+        started = threading.Event()
+
+        def producer():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return b"pdf"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_create("k", producer)))
+                   for _ in range(3)]
+        threads[0].start()
+        started.wait(1)
+        for t in threads[1:]:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == [b"pdf", b"pdf", b"pdf"]
+        assert len(calls) == 1
+
+    def test_lock_file_removed_after_render(self, cache):
+        """The per-key lock file does not accumulate in the cache directory."""
+        cache.get_or_create("k", lambda: b"pdf")
+        assert not os.path.exists(os.path.join(cache.directory, "k.lock"))
+
+
+class TestCreateRenderCache:
+    def test_disabled_by_default(self):
+        """The cache keeps personal data on disk and is therefore opt-in."""
+        from formflow.config import AppSettings
+
+        assert create_render_cache(AppSettings().model_dump()["render"]) is None
+
+    def test_disabled_with_zero_size(self, tmp_path):
+        """cache_size_mb=0 disables the cache."""
+        assert create_render_cache({"cache_size_mb": 0, "cache_dir": str(tmp_path)}) is None
+
+    def test_created_with_budget(self, tmp_path):
+        """A positive size creates the cache directory with the configured budget."""
+        directory = tmp_path / "renders"
+        cache = create_render_cache({"cache_size_mb": 2, "cache_dir": str(directory), "cache_ttl": 600})
+        assert cache.max_bytes == 2 * 1024 * 1024
+        assert cache.max_age_seconds == 600
+        assert directory.is_dir()
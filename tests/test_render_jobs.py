@@ -0,0 +1,134 @@
+"""Tests for asynchronous preview rendering and the preview status endpoint."""
+import threading
+
+import pytest
+
+from formflow.services.render_jobs import RenderJobs, create_render_jobs
+from formflow.services.render_pool import RenderPoolBusyError
+
+
+SIMPLE_FORM = {
+    "form_id": "test_form",
+    "title": "Testformular",
+    "submit_button": "Vorschau anzeigen",
+    "fields": [
+        {"type": "text", "name": "name", "label": "Name", "required": False, "placeholder": ""},
+    ],
+}
+
+
+@pytest.fixture
+def jobs():
+    """A RenderJobs executor that is shut down after the test."""
+    render_jobs = RenderJobs(max_workers=1)
+    yield render_jobs
+    render_jobs.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# RenderJobs
+# ---------------------------------------------------------------------------
+
+class TestRenderJobs:
+    def test_unknown_job(self, jobs):
+        """A job id that was never submitted is reported as unknown."""
+        assert jobs.status("nope") == RenderJobs.UNKNOWN
+
+    def test_pending_then_done(self, jobs):
+        """A running job is pending and becomes done once it returns."""
+        release = threading.Event()
+        jobs.submit("a", release.wait, 5)
+        assert jobs.status("a") == RenderJobs.PENDING
+        release.set()
+        jobs.wait("a", 5)
+        assert jobs.status("a") == RenderJobs.DONE
+
+    def test_failed_job_reports_error(self, jobs):
+        """An exception inside the job is reported as error and kept for inspection."""
+        def fail():
+            raise RenderPoolBusyError("busy")
+
+        jobs.submit("b", fail)
+        jobs.wait("b", 5)
+        assert jobs.status("b") == RenderJobs.ERROR
+        assert isinstance(jobs.error("b"), RenderPoolBusyError)
+
+    def test_wait_on_unknown_job_returns_immediately(self, jobs):
+        """wait() does not block for jobs this process does not know."""
+        jobs.wait("unknown", 5)
+
+
+class TestCreateRenderJobs:
+    def test_disabled(self):
+        """async_preview=False keeps synchronous rendering."""
+        assert create_render_jobs({"async_preview": False}) is None
+
+    def test_enabled(self):
+        """async_preview=True creates a background executor."""
+        render_jobs = create_render_jobs({"async_preview": True, "pool_size": 2})
+        assert isinstance(render_jobs, RenderJobs)
+        render_jobs.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Routes
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def client(app, engine):
+    """Client with a simple form and asynchronous previews enabled (default config)."""
+    engine.forms = {"test_form": SIMPLE_FORM}
+    engine.init_app(app)
+    return app.test_client()
+
+
+class TestAsyncPreviewRoutes:
+    def test_preview_returns_status_url(self, client, mocker):
+        """The preview page is returned at once and points the viewer to the status endpoint."""
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-1.4")
+        mocker.patch("formflow.routes.main.uuid.uuid4", return_value=mocker.Mock(hex="job123"))
+
+        response = client.post("/preview/test_form", data={"name": "Max"})
+
+        assert response.status_code == 200
+        assert 'data-status-url="/preview/status/job123"' in response.get_data(as_text=True)
+
+    def test_status_done_when_pdf_exists(self, client, engine):
+        """A finished preview PDF is reported as done with its URL."""
+        engine.preview_store.put("job123", b"%PDF-1.4")
+
+        response = client.get("/preview/status/job123")
+
+        assert response.get_json() == {"status": "done", "pdf_url": "/pdf/temp_job123.pdf"}
+
+    def test_status_pending_while_rendering(self, client, mocker):
+        """While the background render runs, the status is pending."""
+        release = threading.Event()
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render",
+                     side_effect=lambda *args, **kwargs: release.wait(5) and b"%PDF-1.4")
+        mocker.patch("formflow.routes.main.uuid.uuid4", return_value=mocker.Mock(hex="job456"))
+        client.post("/preview/test_form", data={"name": "Max"})
+
+        try:
+            assert client.get("/preview/status/job456").get_json() == {"status": "pending"}
+        finally:
+            release.set()
+
+    def test_status_error_when_render_fails(self, client, engine, mocker):
+        """A failed render is reported as error with a user-facing message."""
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render",
+                     side_effect=RuntimeError("kaputt"))
+        mocker.patch("formflow.routes.main.uuid.uuid4", return_value=mocker.Mock(hex="job789"))
+        client.post("/preview/test_form", data={"name": "Max"})
+        engine.render_jobs.wait("job789", 5)
+
+        body = client.get("/preview/status/job789").get_json()
+
+        assert body["status"] == "error"
+        assert body["message"]
+
+    def test_status_unknown_job_returns_404(self, client):
+        """A job id that is neither running nor rendered returns 404."""
+        response = client.get("/preview/status/doesnotexist")
+        assert response.status_code == 404
+        assert response.get_json()["status"] == "unknown"
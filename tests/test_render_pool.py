@@ -0,0 +1,132 @@
+"""Unit tests for the optional WeasyPrint render pool."""
+import multiprocessing
+import queue
+import time
+
+import pytest
+
+from formflow.config import AppSettings, RenderConfig
+from formflow.services.render_pool import (
+    RenderPool, RenderPoolBusyError, RenderTimeoutError, _run_job, create_render_pool,
+)
+
+
+class TestCreateRenderPool:
+    def test_pool_disabled_by_default(self):
+        """With the default configuration no pool is created (inline rendering)."""
+        config = AppSettings().model_dump()
+        assert create_render_pool(config["render"]) is None
+
+    def test_pool_created_with_configured_size(self):
+        """A positive pool_size creates a pool with the configured limits."""
+        render_config = RenderConfig(pool_size=2, queue_size=3, timeout=30).model_dump()
+        pool = create_render_pool(render_config)
+        assert isinstance(pool, RenderPool)
+        assert pool.workers == 2
+        assert pool.queue_size == 3
+        assert pool.timeout == 30
+
+    def test_pool_is_not_started_on_creation(self):
+        """Child processes are only spawned by start() or the first job."""
+        pool = create_render_pool({"pool_size": 1})
+        assert pool._pool is None
+
+
+class TestRenderPool:
+    def test_zero_workers_rejected(self):
+        """A pool without workers is a configuration error."""
+        with pytest.raises(ValueError):
+            RenderPool(workers=0)
+
+    def test_run_raises_busy_when_queue_full(self):
+        """When all worker and queue slots are taken, run() fails fast."""
+        pool = RenderPool(workers=1, queue_size=1)
+        assert pool._slots.acquire(blocking=False)
+        assert pool._slots.acquire(blocking=False)
+        with pytest.raises(RenderPoolBusyError):
+            pool.run(len, "abc")
+
+    def test_close_without_start_is_noop(self):
+        """close() on a never-started pool does nothing."""
+        pool = RenderPool(workers=1)
+        pool.close()
+        assert pool._pool is None
+
+    def test_timeout_kills_render_process_and_frees_slot(self, mocker):
+        """A hung job raises the busy error subtype and its render process is killed."""
+        pool = RenderPool(workers=1, timeout=0.01)
+        pool._pool = mocker.Mock()
+        pool._pool.apply_async.return_value.get.side_effect = multiprocessing.TimeoutError
+        pool._started = queue.Queue()
+        pool._started.put((0, 4242))
+        kill = mocker.patch("formflow.services.render_pool.os.kill")
+
+        with pytest.raises(RenderTimeoutError):
+            pool.run(len, "abc")
+
+        kill.assert_called_once()
+        assert kill.call_args.args[0] == 4242
+        assert pool._slots.acquire(blocking=False)
+        assert pool._pids == {}
+
+    def test_timeout_before_start_kills_nothing(self, mocker):
+        """A job still waiting in the queue has no process to kill."""
+        pool = RenderPool(workers=1, timeout=0.01)
+        pool._pool = mocker.Mock()
+        pool._pool.apply_async.return_value.get.side_effect = multiprocessing.TimeoutError
+        pool._started = queue.Queue()
+        kill = mocker.patch("formflow.services.render_pool.os.kill")
+
+        with pytest.raises(RenderPoolBusyError):
+            pool.run(len, "abc")
+
+        kill.assert_not_called()
+
+    def test_queued_job_keeps_its_slot_until_dropped(self, mocker):
+        """With one worker, a job that times out in the queue is not orphaned beyond the pool's limit."""
+        pool = RenderPool(workers=1, queue_size=1, timeout=0.01)
+        pool._pool = mocker.Mock()
+        pool._pool.apply_async.return_value.get.side_effect = multiprocessing.TimeoutError
+        pool._started = queue.Queue()
+        assert pool._slots.acquire(blocking=False)  # der eine Render-Prozess ist belegt
+
+        with pytest.raises(RenderTimeoutError):
+            pool.run(len, "abc")
+
+        with pytest.raises(RenderPoolBusyError):
+            pool.run(len, "abc")
+        # Der Render-Prozess holt den Job ab und verwirft ihn (Startfrist überschritten)
+        job_args = pool._pool.apply_async.call_args_list[0].args[1]
+        time.sleep(0.02)
+        with pytest.raises(RenderTimeoutError):
+            _run_job(*job_args)
+        pool._pool.apply_async.call_args_list[0].kwargs["error_callback"](RenderTimeoutError())
+        assert pool._slots.acquire(blocking=False)
+        assert pool._pids == {}
+
+    def test_expired_job_is_not_run(self, mocker):
+        func = mocker.Mock()
+        with pytest.raises(RenderTimeoutError):
+            _run_job(1, time.time() - 1, func, ())
+        func.assert_not_called()
+
+    def test_finished_job_releases_slot_once(self, mocker):
+        pool = RenderPool(workers=1, timeout=5)
+        pool._pool = mocker.Mock()
+        pool._started = queue.Queue()
+        pool._started.put((0, 4242))
+
+        def apply_async(func, args, callback, error_callback):
+            callback("ok")
+            result = mocker.Mock()
+            result.get.return_value = "ok"
+            return result
+
+        pool._pool.apply_async.side_effect = apply_async
+
+        assert pool.run(len, "abc") == "ok"
+        pool._finish(0)
+
+        assert pool._pids == {}
+        assert pool._slots.acquire(blocking=False)
+        assert not pool._slots.acquire(blocking=False)
@@ -0,0 +1,228 @@
+"""Tests for the cross-worker render admission control (slots, wait queue, HTTP 503)."""
+import fcntl
+import threading
+import time
+
+import pytest
+
+from formflow.config import AppSettings, RenderConfig
+from formflow.services.pdf_generator import PdfGenerator
+from formflow.services.render_slots import Admission, RenderBusyError, RenderSlots, create_render_slots
+
+SIMPLE_FORM = {
+    "form_id": "test_form",
+    "title": "Testformular",
+    "fields": [{"type": "text", "name": "name", "label": "Name"}],
+}
+
+
+@pytest.fixture
+def slots(tmp_path):
+    """One render slot and one wait-queue place."""
+    return RenderSlots(str(tmp_path / "slots"), slots=1, queue_size=1, wait_timeout=0.2, retry_after=7)
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+class TestCreateRenderSlots:
+    def test_enabled_by_default(self, cwd_tmp):
+        """The default configuration limits renders across all workers."""
+        render_slots = create_render_slots(AppSettings().model_dump()["render"])
+        assert isinstance(render_slots, RenderSlots)
+        assert (cwd_tmp / "render_slots").is_dir()
+
+    def test_zero_disables_limit(self, cwd_tmp):
+        """max_concurrent=0 means unlimited (no admission control)."""
+        assert create_render_slots(RenderConfig(max_concurrent=0).model_dump()) is None
+
+    def test_zero_slots_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            RenderSlots(str(tmp_path), slots=0)
+
+
+# ---------------------------------------------------------------------------
+# RenderSlots / Admission
+# ---------------------------------------------------------------------------
+
+class TestRenderSlots:
+    def test_slot_then_queue_then_busy(self, slots):
+        """admit() hands out the slot, then the queue place, then fails fast with retry_after."""
+        first = slots.admit()
+        second = slots.admit()
+        try:
+            with pytest.raises(RenderBusyError) as excinfo:
+                slots.admit()
+            assert excinfo.value.retry_after == 7
+        finally:
+            first.release()
+            second.release()
+
+    def test_release_frees_slot(self, slots):
+        with slots.admit():
+            pass
+        with slots.admit():
+            pass
+
+    def test_queued_admission_waits_for_slot(self, slots):
+        """A queued render starts as soon as the running one releases its slot."""
+        running = slots.admit()
+        queued = slots.admit(wait_timeout=5)
+        timer = threading.Timer(0.1, running.release)
+        timer.start()
+        try:
+            started = time.monotonic()
+            with queued:
+                assert time.monotonic() - started >= 0.05
+        finally:
+            timer.cancel()
+            running.release()
+
+    def test_wait_timeout_frees_queue_place(self, slots):
+        """A render that waited too long is rejected and gives its queue place back."""
+        running = slots.admit()
+        try:
+            with pytest.raises(RenderBusyError):
+                with slots.admit():
+                    pass
+            slots.admit().release()  # Warteplatz wieder frei
+        finally:
+            running.release()
+
+    def test_slots_shared_via_lock_files(self, slots):
+        """A slot locked through another file description (another worker) counts as taken."""
+        holders = []
+        for name in ("slot_0.lock", "queue_0.lock"):
+            f = open(f"{slots.directory}/{name}", "a")
+            fcntl.flock(f, fcntl.LOCK_EX)
+            holders.append(f)
+        try:
+            with pytest.raises(RenderBusyError):
+                slots.admit()
+        finally:
+            for f in holders:
+                f.close()
+        slots.admit().release()
+
+    def test_release_is_idempotent(self, slots):
+        admission = slots.admit()
+        admission.release()
+        admission.release()
+
+    def test_background_admission_leaves_reserved_slot_and_queue(self, tmp_path):
+        """Batch renders never take the reserved slot or a queue place from previews."""
+        slots = RenderSlots(str(tmp_path / "slots"), slots=2, queue_size=1, reserved=1)
+        batch = slots.try_admit_background()
+        try:
+            assert batch is not None
+            assert slots.try_admit_background() is None
+            preview, queued = slots.admit(), slots.admit()
+            preview.release()
+            queued.release()
+        finally:
+            batch.release()
+
+    def test_background_admission_with_single_slot(self, tmp_path):
+        """With one slot in total a batch still gets to render."""
+        slots = RenderSlots(str(tmp_path / "slots"), slots=1, reserved=1)
+        admission = slots.try_admit_background()
+        assert admission is not None
+        admission.release()
+
+
+# ---------------------------------------------------------------------------
+# PdfGenerator integration
+# ---------------------------------------------------------------------------
+
+class TestPdfGeneratorAdmission:
+    def test_render_takes_and_releases_slot(self, slots, mocker):
+        generator = PdfGenerator(render_slots=slots)
+        admit = mocker.spy(slots, "admit")
+        mocker.patch.object(generator, "_render_pdf", return_value=b"%PDF-stub")
+
+        generator.render(SIMPLE_FORM, {"name": "Max"}, {})
+
+        admit.assert_called_once()
+        slots.admit().release()  # Slot wieder frei
+
+    def test_render_busy_raises(self, slots, mocker):
+        generator = PdfGenerator(render_slots=slots)
+        render_pdf = mocker.patch.object(generator, "_render_pdf", return_value=b"%PDF-stub")
+        held = [slots.admit(), slots.admit()]
+        try:
+            with pytest.raises(RenderBusyError):
+                generator.render(SIMPLE_FORM, {"name": "Max"}, {})
+        finally:
+            for admission in held:
+                admission.release()
+        render_pdf.assert_not_called()
+
+    def test_given_admission_released_on_cache_hit(self, slots, mocker):
+        """A reserved admission is released even if the render cache answers without rendering."""
+        generator = PdfGenerator(render_slots=slots)
+        generator.render_cache = mocker.Mock(get_or_create=mocker.Mock(return_value=b"%PDF-cached"))
+        admission = slots.admit()
+
+        assert generator.render(SIMPLE_FORM, {"name": "Max"}, {}, admission) == b"%PDF-cached"
+
+        assert isinstance(admission, Admission)
+        slots.admit().release()
+        slots.admit().release()
+
+
+# ---------------------------------------------------------------------------
+# Routes
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def full_client(app, engine):
+    """Client whose render slots and wait queue are all taken by other workers."""
+    engine.forms = {"test_form": SIMPLE_FORM}
+    engine.init_app(app)
+    render_slots = engine.pdf_generator.render_slots
+    held = []
+    while True:
+        try:
+            held.append(render_slots.admit())
+        except RenderBusyError:
+            break
+    yield app.test_client()
+    for admission in held:
+        admission.release()
+
+
+class TestBusyResponses:
+    @pytest.mark.parametrize("async_preview", [True, False])
+    def test_preview_returns_503_with_retry_after(self, full_client, engine, mocker, async_preview):
+        """A full queue is answered at once with 503, Retry-After and an auto-resubmitting page."""
+        if not async_preview:
+            engine.render_jobs = None
+        render_pdf = mocker.patch("formflow.services.pdf_generator.PdfGenerator._render_pdf")
+
+        response = full_client.post("/preview/test_form", data={"name": "Max"})
+
+        html = response.get_data(as_text=True)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+        assert 'action="/preview/test_form"' in html
+        assert 'name="name" value="Max"' in html
+        assert 'name="draft_id" value=""' not in html  # Entwurf ist bereits gespeichert
+        render_pdf.assert_not_called()
+
+    def test_status_reports_busy_job(self, app, engine, mocker):
+        """A background render that got no slot in time reports busy with Retry-After."""
+        engine.forms = {"test_form": SIMPLE_FORM}
+        engine.init_app(app)
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render",
+                     side_effect=RenderBusyError("busy", retry_after=3))
+        mocker.patch("formflow.routes.main.uuid.uuid4", return_value=mocker.Mock(hex="job1"))
+        client = app.test_client()
+        client.post("/preview/test_form", data={"name": "Max"})
+        engine.render_jobs.wait("job1", 5)
+
+        response = client.get("/preview/status/job1")
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+        assert response.get_json()["status"] == "busy"
@@ -0,0 +1,201 @@
+"""Unit tests for signature handling: vector encoding, SVG conversion and raster normalization."""
+import base64
+import io
+from urllib.parse import unquote
+
+import pytest
+
+from formflow.services import signature_service
+from formflow.services.signature_service import (
+    is_vector_signature,
+    normalize_signature,
+    normalize_signatures,
+    parse_vector_signature,
+    prepare_signatures_for_pdf,
+    signature_src,
+    vector_signature_to_svg,
+)
+
+
+class TestParseVectorSignature:
+    def test_parses_size_and_strokes(self):
+        """Size and stroke points are parsed from the compact encoding."""
+        width, height, strokes = parse_vector_signature("sig1:300x150:10,10 20,20;30,30")
+        assert (width, height) == (300, 150)
+        assert strokes == [[(10, 10), (20, 20)], [(30, 30)]]
+
+    def test_empty_signature_has_no_strokes(self):
+        """An encoding without stroke data yields an empty stroke list."""
+        assert parse_vector_signature("sig1:300x150:") == (300, 150, [])
+
+    def test_malformed_size_rejected(self):
+        """An invalid size section makes the signature invalid."""
+        assert parse_vector_signature("sig1:abc:1,1") is None
+
+    def test_malformed_point_rejected(self):
+        """A point that is not an x,y pair makes the signature invalid."""
+        assert parse_vector_signature("sig1:300x150:1,2,3") is None
+
+    def test_non_finite_coordinates_rejected(self):
+        """NaN or infinite coordinates are rejected."""
+        assert parse_vector_signature("sig1:300x150:1,nan") is None
+
+    def test_png_data_url_is_not_vector(self):
+        """A PNG data URL is not treated as a vector signature."""
+        assert not is_vector_signature("data:image/png;base64,AAAA")
+        assert parse_vector_signature("data:image/png;base64,AAAA") is None
+
+
+class TestVectorSignatureToSvg:
+    def test_svg_has_viewbox_of_canvas(self):
+        """The SVG uses the canvas size as its coordinate system."""
+        svg = vector_signature_to_svg("sig1:300x150:10,10 20,20")
+        assert svg.startswith("<svg")
+        assert 'viewBox="0 0 300 150"' in svg
+
+    def test_one_path_segment_per_stroke(self):
+        """Each stroke starts a new subpath."""
+        svg = vector_signature_to_svg("sig1:300x150:10,10 20,20;30,30 40,40")
+        assert svg.count("M") == 2
+
+    def test_single_point_stroke_is_drawn_as_dot(self):
+        """A single tap is rendered as a zero-length line with round caps."""
+        svg = vector_signature_to_svg("sig1:300x150:50,50")
+        assert "M50 50h0" in svg
+
+    def test_points_outside_canvas_enlarge_viewbox(self):
+        """Points beyond the reported size (after a resize) are not clipped."""
+        svg = vector_signature_to_svg("sig1:100x50:10,10 200,80")
+        assert 'viewBox="0 0 202.5 82.5"' in svg
+
+    def test_invalid_signature_returns_none(self):
+        assert vector_signature_to_svg("sig1:bad") is None
+
+
+class TestSignatureSrc:
+    def test_vector_signature_becomes_svg_data_url(self):
+        """Vector signatures are turned into percent-encoded SVG data URLs."""
+        src = signature_src("sig1:300x150:10,10 20,20")
+        assert src.startswith("data:image/svg+xml,")
+        assert unquote(src[len("data:image/svg+xml,"):]).startswith("<svg")
+
+    def test_png_data_url_unchanged(self):
+        """PNG data URLs from older drafts are passed through."""
+        assert signature_src("data:image/png;base64,AAAA") == "data:image/png;base64,AAAA"
+
+    def test_invalid_vector_signature_becomes_empty(self):
+        """A malformed vector signature is dropped instead of breaking the PDF."""
+        assert signature_src("sig1:bad") == ""
+
+
+class TestPrepareSignaturesForPdf:
+    FORM_DEF = {"fields": [
+        {"type": "text", "name": "user"},
+        {"type": "signature", "name": "sig"},
+    ]}
+
+    def test_only_signature_fields_converted(self):
+        """Non-signature fields keep their value, even if it looks like a signature."""
+        data = {"user": "sig1:1x1:", "sig": "sig1:300x150:1,1"}
+        prepared = prepare_signatures_for_pdf(self.FORM_DEF, data)
+        assert prepared["user"] == "sig1:1x1:"
+        assert prepared["sig"].startswith("data:image/svg+xml,")
+
+    def test_original_form_data_not_mutated(self):
+        """The caller's form_data (used for drafts and the cache key) stays compact."""
+        data = {"sig": "sig1:300x150:1,1"}
+        prepare_signatures_for_pdf(self.FORM_DEF, data)
+        assert data == {"sig": "sig1:300x150:1,1"}
+
+
+# ---------------------------------------------------------------------------
+# Raster signature normalization
+# ---------------------------------------------------------------------------
+
+def _png_data_url(size, line=None, mode="RGBA", background=(0, 0, 0, 0)):
+    """Builds a PNG data URL with an optional black line drawn on it."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new(mode, size, background)
+    if line:
+        ImageDraw.Draw(image).line(line, fill="black", width=8)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def _decode(data_url):
+    from PIL import Image
+
+    return Image.open(io.BytesIO(base64.b64decode(data_url.split(",", 1)[1])))
+
+
+@pytest.fixture(autouse=True)
+def clear_normalized_cache():
+    """Isolates tests from the module-level normalization cache."""
+    signature_service._normalized_cache.clear()
+    yield
+    signature_service._normalized_cache.clear()
+
+
+class TestNormalizeSignature:
+    def test_whitespace_is_cropped(self):
+        """Transparent margins around the strokes are trimmed."""
+        url = _png_data_url((1200, 400), line=(300, 200, 600, 220))
+        image = _decode(normalize_signature(url))
+        assert image.width < 400
+        assert image.height < 100
+
+    def test_result_is_palette_png_with_transparency(self):
+        """The output is a 1-bit palette PNG with a transparent background."""
+        url = _png_data_url((1200, 400), line=(100, 100, 1100, 300))
+        image = _decode(normalize_signature(url))
+        assert image.mode == "P"
+        assert image.info.get("transparency") == 0
+
+    def test_tall_signature_downscaled_to_print_box(self):
+        """Signatures taller than the PDF box at print DPI are scaled down."""
+        url = _png_data_url((800, 2000), line=(400, 10, 400, 1990))
+        image = _decode(normalize_signature(url))
+        assert image.height <= signature_service._MAX_HEIGHT
+
+    def test_white_background_treated_like_transparent(self):
+        """An opaque white background is cropped as well."""
+        url = _png_data_url((1200, 400), line=(300, 200, 600, 220), mode="RGB", background="white")
+        image = _decode(normalize_signature(url))
+        assert image.width < 400
+
+    def test_blank_signature_unchanged(self):
+        """An image without ink is returned unchanged."""
+        url = _png_data_url((100, 100))
+        assert normalize_signature(url) == url
+
+    def test_invalid_data_url_unchanged(self):
+        """Undecodable input is kept as is instead of raising."""
+        assert normalize_signature("data:image/png;base64,@@@") == "data:image/png;base64,@@@"
+
+    def test_vector_signature_unchanged(self):
+        """Vector signatures are already compact and are not touched."""
+        assert normalize_signature("sig1:300x150:1,1") == "sig1:300x150:1,1"
+
+    def test_result_cached_by_input(self, mocker):
+        """Normalizing the same signature twice processes it only once."""
+        url = _png_data_url((1200, 400), line=(300, 200, 600, 220))
+        spy = mocker.spy(signature_service, "_normalize_png_data_url")
+        normalize_signature(url)
+        normalize_signature(url)
+        assert spy.call_count == 1
+
+
+class TestNormalizeSignatures:
+    def test_only_signature_fields_normalized(self):
+        """Only fields of type signature are processed; the input dict is not mutated."""
+        url = _png_data_url((1200, 400), line=(300, 200, 600, 220))
+        form_def = {"fields": [{"type": "text", "name": "note"}, {"type": "signature", "name": "sig"}]}
+        data = {"note": url, "sig": url}
+
+        result = normalize_signatures(form_def, data)
+
+        assert result["note"] == url
+        assert len(result["sig"]) < len(url)
+        assert data["sig"] == url
@@ -0,0 +1,153 @@
+"""Tests for the per-worker SMB connection pool and unbuffered large writes."""
+import threading
+
+import pytest
+
+from formflow.config import SmbConfig
+from formflow.services.smb_pool import SmbConnectionPool, write_all
+from formflow.services.storage_backends import create_smb_backend
+
+
+@pytest.fixture
+def smb(mocker):
+    """Patched smbclient: every registration returns a new, connected session."""
+    register = mocker.patch("smbclient.register_session",
+                            side_effect=lambda *args, **kwargs: mocker.MagicMock())
+    open_file = mocker.patch("smbclient.open_file", mocker.mock_open())
+    open_file.return_value.write.side_effect = len
+    reset = mocker.patch("smbclient.reset_connection_cache")
+    return mocker.Mock(register=register, open_file=open_file, reset=reset)
+
+
+@pytest.fixture
+def pool():
+    return SmbConnectionPool("smb-server", "user", "secret", size=2, health_check_after=30, timeout=0.1)
+
+
+# ---------------------------------------------------------------------------
+# write_all
+# ---------------------------------------------------------------------------
+
+class TestWriteAll:
+    def test_loops_over_partial_writes(self):
+        """SMBRawIO.write() sends at most max_write_size per call; the rest follows in further requests."""
+        chunks = []
+
+        class Raw:
+            def write(self, data):
+                chunks.append(bytes(data[:4]))
+                return min(len(data), 4)
+
+        write_all(Raw(), b"0123456789")
+
+        assert chunks == [b"0123", b"4567", b"89"]
+
+
+# ---------------------------------------------------------------------------
+# Pool
+# ---------------------------------------------------------------------------
+
+class TestSmbConnectionPool:
+    def test_session_reused_across_uploads(self, pool, smb):
+        for _ in range(3):
+            pool.write_file(r"\\smb-server\pdfs\doc.pdf", lambda f: write_all(f, b"%PDF"))
+
+        smb.register.assert_called_once()
+        assert smb.register.call_args.kwargs["port"] == 445
+        assert smb.open_file.call_args.kwargs["buffering"] == 0
+
+    def test_lifo_keeps_warm_connection(self, pool, smb):
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            assert second is first
+
+    def test_concurrent_uploads_use_separate_connections(self, pool, smb):
+        with pool.connection() as first, pool.connection() as second:
+            assert first is not second
+            assert first.cache is not second.cache
+        assert smb.register.call_count == 2
+
+    def test_exhausted_pool_times_out(self, pool, smb):
+        with pool.connection(), pool.connection():
+            with pytest.raises(TimeoutError):
+                with pool.connection():
+                    pass
+
+    def test_waiting_caller_gets_released_connection(self, smb):
+        pool = SmbConnectionPool("smb-server", "user", "secret", size=1, timeout=5)
+        with pool.connection() as held:
+            got = []
+            waiter = threading.Thread(target=lambda: got.append(pool.connection().__enter__()))
+            waiter.start()
+        waiter.join(5)
+        assert got == [held]
+
+    def test_idle_connection_probed_with_echo(self, pool, smb, mocker):
+        now = mocker.patch("formflow.services.smb_pool.time.monotonic", return_value=1000.0)
+        with pool.connection() as entry:
+            pass
+        now.return_value = 1031.0
+
+        with pool.connection():
+            pass
+
+        entry.session.connection.echo.assert_called_once()
+        smb.register.assert_called_once()
+
+    def test_failed_echo_reconnects(self, pool, smb, mocker):
+        now = mocker.patch("formflow.services.smb_pool.time.monotonic", return_value=1000.0)
+        with pool.connection() as entry:
+            pass
+        entry.session.connection.echo.side_effect = OSError("timed out")
+        now.return_value = 1031.0
+
+        with pool.connection():
+            pass
+
+        smb.reset.assert_called_once_with(fail_on_error=False, connection_cache=entry.cache)
+        assert smb.register.call_count == 2
+
+    def test_closed_transport_reconnects_without_echo(self, pool, smb):
+        with pool.connection() as entry:
+            pass
+        session = entry.session
+        session.connection.transport.connected = False
+
+        with pool.connection():
+            pass
+
+        session.connection.echo.assert_not_called()
+        assert smb.register.call_count == 2
+
+    def test_error_discards_connection(self, pool, smb):
+        with pytest.raises(RuntimeError):
+            with pool.connection() as entry:
+                raise RuntimeError("boom")
+        assert entry.session is None
+        smb.reset.assert_called_once()
+
+    def test_retry_on_reused_connection_only(self, pool, smb):
+        """A failure on a fresh connection is not retried; on a reused one it is retried once."""
+        smb.open_file.side_effect = OSError("refused")
+        with pytest.raises(OSError):
+            pool.write_file(r"\\smb-server\pdfs\doc.pdf", lambda f: None)
+        assert smb.open_file.call_count == 1
+
+        smb.open_file.side_effect = None
+        pool.write_file(r"\\smb-server\pdfs\doc.pdf", lambda f: None)
+        smb.open_file.side_effect = [OSError("Session expired"), smb.open_file.return_value]
+        pool.write_file(r"\\smb-server\pdfs\doc.pdf", lambda f: None)
+
+        assert smb.open_file.call_count == 4
+
+
+class TestCreateSmbBackend:
+    def test_configured_from_settings(self):
+        """The primary share's pool is built from the smb settings."""
+        backend = create_smb_backend(SmbConfig(
+            enabled=True, server="nas", share="pdfs", folder="formulare", username="u", password="p",
+            port=1445, pool_size=4,
+        ).model_dump())
+        assert backend.base_path == r"\\nas\pdfs\formulare"
+        assert (backend.pool.server, backend.pool.port, backend.pool.size) == ("nas", 1445, 4)
@@ -0,0 +1,93 @@
+"""Tests for request tracing: spans, Server-Timing header and the OTLP JSON lines exporter."""
+import json
+
+import pytest
+
+from formflow.services import tracing
+
+FORM = {
+    "form_id": "test_form",
+    "title": "Testformular",
+    "fields": [{"type": "text", "name": "name", "label": "Name"}],
+}
+
+
+# ---------------------------------------------------------------------------
+# Trace / span
+# ---------------------------------------------------------------------------
+
+class TestTrace:
+    def test_span_without_trace_is_noop(self):
+        """Outside a traced request span() costs nothing and records nothing."""
+        assert tracing.span("jinja") is tracing.span("layout")
+        with tracing.span("jinja"):
+            pass
+        tracing.record("layout", 0.1)
+
+    def test_nested_spans_and_server_timing(self):
+        trace = tracing.start_trace("main.preview_form")
+        with tracing.span("render"):
+            with tracing.span("jinja"):
+                pass
+            tracing.record("layout", 0.25)
+        tracing.end_trace()
+
+        render, jinja, layout = trace.spans[1:]
+        assert jinja.parent_id == render.span_id
+        assert layout.parent_id == render.span_id
+        assert "layout;dur=250.0" in trace.server_timing()
+        assert trace.server_timing().endswith(f"total;dur={trace.root.duration_ms:.1f}")
+
+    def test_incoming_traceparent_is_continued(self):
+        trace = tracing.Trace("main.confirm_form", "00-" + "a" * 32 + "-" + "b" * 16 + "-01")
+        assert trace.trace_id == "a" * 32
+        assert trace.root.parent_id == "b" * 16
+
+    def test_end_trace_exports_otlp_json_line(self, tmp_path):
+        export_file = tmp_path / "traces.jsonl"
+        tracing.start_trace("main.list_forms")
+        with tracing.span("draft_list", count=2):
+            pass
+        tracing.end_trace(str(export_file))
+
+        document = json.loads(export_file.read_text())
+        spans = document["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert [span["name"] for span in spans] == ["main.list_forms", "draft_list"]
+        assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+        assert spans[1]["attributes"] == [{"key": "count", "value": {"stringValue": "2"}}]
+
+
+# ---------------------------------------------------------------------------
+# Routes
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def client(app, engine):
+    engine.forms = {"test_form": FORM}
+    engine.init_app(app)
+    return app.test_client()
+
+
+class TestServerTimingHeader:
+    def test_disabled_by_default(self, client):
+        assert "Server-Timing" not in client.get("/forms").headers
+
+    def test_preview_stages(self, client, engine, config, mocker):
+        config["tracing"]["enabled"] = True
+        engine.render_jobs = None  # render within the request
+        mocker.patch("formflow.services.pdf_generator.PdfGenerator.render", return_value=b"%PDF-stub")
+
+        response = client.post("/preview/test_form", data={"name": "Max"})
+
+        names = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+        assert names == ["signatures", "draft_save", "render", "template", "total"]
+
+    def test_draft_routes_are_traced(self, client, config, tmp_path):
+        config["tracing"]["enabled"] = True
+        config["tracing"]["export_file"] = str(tmp_path / "traces.jsonl")
+
+        response = client.post("/draft/test_form", data={"name": "Max"})
+
+        assert response.headers["Server-Timing"].startswith("signatures;dur=")
+        assert "draft_save;dur=" in response.headers["Server-Timing"]
+        assert (tmp_path / "traces.jsonl").read_text().count("\n") == 1
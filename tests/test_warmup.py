@@ -0,0 +1,126 @@
+"""Tests for the background warm-up and the readiness endpoint."""
+import threading
+
+import pytest
+
+from formflow.services.pdf_generator import PdfGenerator
+from formflow.services.warmup import WarmUp
+
+
+# ---------------------------------------------------------------------------
+# WarmUp
+# ---------------------------------------------------------------------------
+
+class TestWarmUp:
+    def test_ready_after_run(self, app, mocker):
+        """Warm-up compiles the web templates and asks the generator to warm up."""
+        generator = mocker.Mock()
+        generator.warm_up.return_value = 1
+        get_template = mocker.spy(app.jinja_env, "get_template")
+        warmup = WarmUp()
+
+        warmup.run(app, generator, {})
+
+        assert warmup.ready
+        assert warmup.error is None
+        generator.warm_up.assert_called_once_with({})
+        get_template.assert_any_call("preview.html")
+
+    def test_ready_even_if_warm_up_fails(self, app, mocker):
+        """A failing warm-up is logged but does not keep the worker out of rotation."""
+        generator = mocker.Mock()
+        generator.warm_up.side_effect = OSError("fontconfig fehlt")
+        warmup = WarmUp()
+
+        warmup.run(app, generator, {})
+
+        assert warmup.ready
+        assert "fontconfig" in warmup.error
+
+    def test_start_runs_in_background(self, app, mocker):
+        """start() returns immediately; wait() blocks until warm-up is done."""
+        release = threading.Event()
+        generator = mocker.Mock()
+        generator.warm_up.side_effect = lambda config: release.wait(5) and 1
+        warmup = WarmUp()
+
+        warmup.start(app, generator, {})
+        assert not warmup.ready
+        release.set()
+
+        assert warmup.wait(5)
+
+
+class TestPdfGeneratorWarmUp:
+    def test_renders_each_html_template_once(self, mocker):
+        """One throwaway document per PDF template; the companion .css is not a template."""
+        generator = PdfGenerator()
+        mocker.patch("formflow.services.pdf_generator._get_font_config")
+        render_pdf = mocker.patch.object(generator, "_render_pdf", return_value=b"%PDF-stub")
+
+        assert generator.warm_up({}) == 1
+        assert render_pdf.call_args.args[0].name == "default_pdf.html"
+
+
+# ---------------------------------------------------------------------------
+# /ready
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def client(app, engine):
+    engine.init_app(app)
+    return app.test_client()
+
+
+class TestReadyEndpoint:
+    def test_ready_without_warm_up(self, client):
+        """Without a warm-up the worker is ready at once."""
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.get_json() == {"status": "ready"}
+
+    def test_not_ready_while_warming_up(self, client, engine, mocker):
+        engine.warmup = mocker.Mock(ready=False)
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.get_json()["status"] == "warming_up"
+
+    def test_start_warm_up_respects_config(self, engine, config, app):
+        """APP_RENDER__WARM_UP=false skips the warm-up."""
+        config["render"]["warm_up"] = False
+        engine.init_app(app)
+        engine.start_warm_up()
+        assert engine.warmup is None
+
+
+# ---------------------------------------------------------------------------
+# gunicorn preload_app: prepare_fork / post_fork
+# ---------------------------------------------------------------------------
+
+class TestForkHooks:
+    def test_prepare_fork_waits_and_stops_render_services(self, app, engine, mocker):
+        """The master finishes warm-up and drops processes/threads that cannot survive fork()."""
+        engine.init_app(app)
+        engine.warmup = mocker.Mock()
+        pool = engine.pdf_generator.render_pool = mocker.Mock()
+        jobs = engine.render_jobs = mocker.Mock()
+
+        engine.prepare_fork()
+
+        engine.warmup.wait.assert_called_once_with()
+        pool.close.assert_called_once_with()
+        jobs.shutdown.assert_called_once_with()
+        assert engine.pdf_generator.render_pool is None
+        assert engine.render_jobs is None
+
+    def test_post_fork_rebuilds_per_process_state(self, app, engine, mocker):
+        engine.init_app(app)
+        engine._storage._smb_backend = mocker.Mock()
+        engine.preview_store.put("abc", b"%PDF-master")
+        start = mocker.patch.object(engine, "_start_render_services")
+
+        engine.post_fork()
+
+        assert engine._storage._smb_backend is None
+        assert "abc" in engine.preview_store  # geteiltes Verzeichnis, übersteht den Worker-Start
+        start.assert_called_once_with(engine.config["render"])